@@ -49,6 +49,14 @@ def main():
     else:
         logger.warning(f"Icône de l'application introuvable: {icon_path}")
 
+    # Fermer proprement les sessions SFTP du pool à la sortie
+    from worker.sftp_pool import sftp_pool
+    app.aboutToQuit.connect(sftp_pool.close_all)
+
+    # Sauvegarder les dates d'accès du cache de fichiers (ordre LRU) à la sortie
+    from app.services.file_cache import file_cache
+    app.aboutToQuit.connect(file_cache.flush)
+
     # Créer et afficher la fenêtre immédiatement avec le loader interne
     window = MainWindow()
     window.show()
@@ -4,7 +4,7 @@ Modèles de données pour l'application
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable
 from enum import Enum
 
 
@@ -31,7 +31,7 @@ class FileType(Enum):
     XLS = "xls"
 
 
-@dataclass
+@dataclass(slots=True)
 class FileRecord:
     """Représente un fichier de commande fournisseur"""
     id: str
@@ -54,6 +54,7 @@ class FileRecord:
     error_message: Optional[str] = None
     created_at: datetime = field(default_factory=datetime.utcnow)
     updated_at: datetime = field(default_factory=datetime.utcnow)
+    content_hash: Optional[str] = None
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'FileRecord':
@@ -87,9 +88,15 @@ class FileRecord:
             processed_at=datetime.fromisoformat(data['processed_at']) if data.get('processed_at') else None,
             error_message=data.get('error_message'),
             created_at=datetime.fromisoformat(data['created_at']),
-            updated_at=datetime.fromisoformat(data['updated_at'])
+            updated_at=datetime.fromisoformat(data['updated_at']),
+            content_hash=data.get('content_hash')
         )
 
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['FileRecord']:
+        """Crée les instances d'une réponse Supabase (liste de lignes)"""
+        return [cls.from_dict(row) for row in rows]
+
     def to_dict(self) -> Dict[str, Any]:
         """Convertit en dictionnaire pour Supabase"""
         return {
@@ -103,6 +110,7 @@ class FileRecord:
             'transformed_path': self.transformed_path,
             'row_count': self.row_count,
             'file_size': self.file_size,
+            'content_hash': self.content_hash,
             'locked_by': self.locked_by,
             'locked_at': self.locked_at.isoformat() if self.locked_at else None,
             'processed_by': self.processed_by,
@@ -121,7 +129,7 @@ class FileRecord:
         return self.status in [FileStatus.PENDING, FileStatus.ERROR] and not self.is_locked
 
 
-@dataclass
+@dataclass(slots=True)
 class Supplier:
     """Représente un fournisseur"""
     id: str
@@ -153,8 +161,13 @@ class Supplier:
             updated_at=datetime.fromisoformat(data['updated_at'])
         )
 
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['Supplier']:
+        """Crée les instances d'une réponse Supabase (liste de lignes)"""
+        return [cls.from_dict(row) for row in rows]
 
-@dataclass
+
+@dataclass(slots=True)
 class ProcessingHistoryEntry:
     """Représente une entrée d'historique"""
     id: str
@@ -181,3 +194,8 @@ class ProcessingHistoryEntry:
             details=data.get('details', {}),
             created_at=datetime.fromisoformat(data['created_at'])
         )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['ProcessingHistoryEntry']:
+        """Crée les instances d'une réponse Supabase (liste de lignes)"""
+        return [cls.from_dict(row) for row in rows]
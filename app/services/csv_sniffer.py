@@ -0,0 +1,192 @@
+"""
+Détection de l'encodage, du séparateur et de l'en-tête des fichiers CSV
+Le début du fichier est inspecté une seule fois et le résultat (plan de lecture)
+est mémorisé par fournisseur: les fichiers suivants du même fournisseur sont lus
+directement, sans nouvelle détection.
+"""
+
+import csv
+import io
+import threading
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Optional, Dict
+import pandas as pd
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class ReadPlan:
+    """Paramètres de lecture d'un fichier CSV"""
+    encoding: str = 'utf-8'
+    sep: str = ';'
+    has_header: bool = False
+    columns: int = field(default=0, compare=False)  # Colonnes lues sur l'échantillon (non mémorisé si < 2)
+
+    def read_csv_kwargs(self, **overrides) -> dict:
+        """Arguments pour pd.read_csv (header déduit du plan sauf si fourni)"""
+        kwargs = {
+            'sep': self.sep,
+            'encoding': self.encoding,
+            'header': 0 if self.has_header else None
+        }
+        kwargs.update(overrides)
+        return kwargs
+
+
+class CSVSniffer:
+    """Détecte et mémorise les plans de lecture CSV"""
+
+    SAMPLE_SIZE = 8 * 1024
+    # Séparateurs essayés dans l'ordre: ';' (exports fournisseurs) est prioritaire
+    DELIMITERS = ';,\t|'
+
+    def __init__(self):
+        self._plans: Dict[str, ReadPlan] = {}
+        self._lock = threading.Lock()
+
+    # ==================== DÉTECTION ====================
+
+    def sniff(self, file_path: str) -> ReadPlan:
+        """Inspecte le début du fichier et retourne son plan de lecture"""
+        with open(file_path, 'rb') as f:
+            sample = f.read(self.SAMPLE_SIZE)
+
+        plan = self.sniff_sample(sample)
+        logger.debug(f"Plan de lecture détecté pour {file_path}: {plan}")
+        return plan
+
+    def sniff_sample(self, sample: bytes) -> ReadPlan:
+        """Plan de lecture déduit des premiers octets d'un fichier (SAMPLE_SIZE au plus)"""
+        sample = sample[:self.SAMPLE_SIZE]
+        encoding = self.detect_encoding(sample)
+        text = sample.decode(encoding, errors='ignore')
+
+        # Ne garder que des lignes complètes pour le Sniffer
+        if len(sample) == self.SAMPLE_SIZE and '\n' in text:
+            text = text[:text.rindex('\n')]
+
+        sep, columns = self.detect_delimiter(text)
+        has_header = False
+        if columns >= 2:
+            try:
+                has_header = _FixedDelimiterSniffer(sep).has_header(text)
+            except csv.Error:
+                pass
+
+        return ReadPlan(encoding=encoding, sep=sep, has_header=has_header, columns=columns)
+
+    def detect_delimiter(self, text: str) -> tuple:
+        """
+        Séparateur et nombre de colonnes d'un échantillon
+
+        ';' est retenu dès qu'il donne un nombre de colonnes constant (au moins 2): une virgule
+        décimale ou dans un libellé ('12,50', 'Dupont, Jean') ne doit pas l'emporter.
+        Un autre séparateur n'est accepté que si ';' ne convient pas.
+        """
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not lines:
+            return ';', 0
+
+        for delimiter in self.DELIMITERS:
+            counts = {len(row) for row in csv.reader(io.StringIO('\n'.join(lines)), delimiter=delimiter)}
+            if len(counts) == 1 and min(counts) >= 2:
+                return delimiter, min(counts)
+
+        # Aucun séparateur régulier: ';' par défaut, colonnes les plus fréquentes
+        counts = Counter(len(row) for row in csv.reader(io.StringIO('\n'.join(lines)), delimiter=';'))
+        return ';', counts.most_common(1)[0][0]
+
+    @staticmethod
+    def detect_encoding(sample: bytes) -> str:
+        """Détermine l'encodage d'un échantillon (BOM, puis validité UTF-8, sinon latin-1)"""
+        if sample.startswith(b'\xef\xbb\xbf'):
+            return 'utf-8-sig'
+
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            # Caractère multi-octets coupé en fin d'échantillon: ce n'est pas une erreur
+            if e.start >= len(sample) - 3 and e.reason == 'unexpected end of data':
+                return 'utf-8'
+            return 'latin-1'
+
+    # ==================== PLANS PAR FOURNISSEUR ====================
+
+    def plan_for(self, file_path: str, supplier_key: Optional[str] = None) -> ReadPlan:
+        """Retourne le plan mémorisé du fournisseur, ou le détecte sur ce fichier"""
+        if supplier_key:
+            with self._lock:
+                plan = self._plans.get(supplier_key)
+            if plan is not None:
+                return plan
+
+        plan = self.sniff(file_path)
+        self._remember(supplier_key, plan)
+        return plan
+
+    def _remember(self, supplier_key: Optional[str], plan: ReadPlan):
+        """Mémorise le plan du fournisseur, sauf s'il ne donne qu'une colonne (détection douteuse)"""
+        if not supplier_key:
+            return
+        if plan.columns < 2:
+            logger.debug(f"Plan de lecture de {supplier_key} non mémorisé (une seule colonne): {plan}")
+            return
+        with self._lock:
+            self._plans[supplier_key] = plan
+
+    def forget(self, supplier_key: Optional[str] = None):
+        """Oublie le plan d'un fournisseur (ou tous les plans)"""
+        with self._lock:
+            if supplier_key is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(supplier_key, None)
+
+    # ==================== LECTURE ====================
+
+    def read_csv(self, file_path: str, supplier_key: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        """
+        Lit un CSV avec le plan du fournisseur
+
+        Les arguments supplémentaires sont passés à pd.read_csv (ex: dtype=str, header=None).
+        Si le plan mémorisé ne convient pas à ce fichier, il est redétecté une fois.
+        """
+        plan = self.plan_for(file_path, supplier_key)
+
+        try:
+            return pd.read_csv(file_path, **plan.read_csv_kwargs(**kwargs))
+
+        except UnicodeDecodeError:
+            # Caractère non UTF-8 au-delà de l'échantillon
+            fallback = replace(plan, encoding='latin-1')
+            logger.debug(f"Encodage {plan.encoding} invalide dans {file_path}, relecture en latin-1")
+
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            if not supplier_key:
+                raise
+            # Le plan mémorisé vient d'un autre fichier: redétecter sur celui-ci
+            fallback = self.sniff(file_path)
+            if fallback == plan:
+                raise
+            logger.info(f"Plan de lecture de {supplier_key} mis à jour: {fallback}")
+
+        df = pd.read_csv(file_path, **fallback.read_csv_kwargs(**kwargs))
+        self._remember(supplier_key, fallback)
+        return df
+
+
+class _FixedDelimiterSniffer(csv.Sniffer):
+    """csv.Sniffer dont has_header utilise le séparateur déjà déterminé (au lieu de le redeviner)"""
+
+    def __init__(self, delimiter: str):
+        super().__init__()
+        self._dialect = type('_Dialect', (csv.excel,), {'delimiter': delimiter})
+
+    def sniff(self, sample, delimiters=None):
+        return self._dialect
+
+
+# Instance globale
+csv_sniffer = CSVSniffer()
@@ -0,0 +1,121 @@
+"""
+Statistiques rapides des fichiers de commande CSV (nombre de lignes, montant total)
+Lecture en une seule passe, par blocs, sans charger tout le fichier en mémoire
+(encodage et séparateur détectés par csv_sniffer).
+Les résultats sont mémorisés par (chemin, taille, date de modification).
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Optional, Tuple, Union
+import pandas as pd
+from loguru import logger
+
+from app.services.csv_sniffer import csv_sniffer, ReadPlan
+
+
+@dataclass(frozen=True)
+class FileStats:
+    """Statistiques d'un fichier de commande"""
+    lines: int
+    amount: float
+
+
+class CSVStatsEngine:
+    """Calcule et mémorise les statistiques des fichiers CSV de commande"""
+
+    def __init__(self, amount_column: int = 3, chunk_size: int = 50000, max_entries: int = 2000):
+        """
+        Args:
+            amount_column: Index de la colonne sommée (colonne D par défaut)
+            chunk_size: Nombre de lignes lues par bloc
+            max_entries: Nombre maximum de résultats mémorisés
+        """
+        self.amount_column = amount_column
+        self.chunk_size = chunk_size
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[Tuple[str, int, int], FileStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ==================== API ====================
+
+    @staticmethod
+    def make_key(path: str, size: Optional[int], mtime: Union[datetime, float, int, None]) -> Tuple[str, int, int]:
+        if isinstance(mtime, datetime):
+            mtime = mtime.timestamp()
+        return (path, int(size or 0), int(mtime or 0))
+
+    def get(self, path: str, size: Optional[int], mtime: Union[datetime, float, int, None]) -> Optional[FileStats]:
+        """Retourne les statistiques mémorisées, ou None si le fichier n'a pas encore été analysé"""
+        key = self.make_key(path, size, mtime)
+        with self._lock:
+            stats = self._memo.get(key)
+            if stats is not None:
+                self._memo.move_to_end(key)
+            return stats
+
+    def compute(self, local_path: str, path: str, size: Optional[int],
+                mtime: Union[datetime, float, int, None]) -> Optional[FileStats]:
+        """
+        Analyse un fichier local et mémorise le résultat
+
+        Args:
+            local_path: Copie locale du fichier à analyser
+            path, size, mtime: Identité du fichier (chemin distant, taille, date) servant de clé
+        """
+        stats = self.get(path, size, mtime)
+        if stats is not None:
+            return stats
+
+        stats = self.read_stats(local_path)
+        if stats is None:
+            return None
+
+        key = self.make_key(path, size, mtime)
+        with self._lock:
+            self._memo[key] = stats
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return stats
+
+    def read_stats(self, local_path: str) -> Optional[FileStats]:
+        """Lit un fichier en une passe et retourne ses statistiques (sans mémorisation)"""
+        try:
+            plan = csv_sniffer.sniff(local_path)
+            try:
+                return self._scan(local_path, plan)
+            except UnicodeDecodeError:
+                # Caractère non UTF-8 au-delà de l'échantillon: une seule relecture en latin-1
+                logger.debug(f"Encodage {plan.encoding} invalide plus loin dans {local_path}, relecture en latin-1")
+                return self._scan(local_path, replace(plan, encoding='latin-1'))
+        except Exception as e:
+            logger.error(f"Erreur analyse {local_path}: {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    # ==================== INTERNE ====================
+
+    def _scan(self, local_path: str, plan: ReadPlan) -> FileStats:
+        lines = 0
+        amount = 0.0
+
+        # Toutes les lignes sont comptées (header=None), comme l'affichage l'a toujours fait
+        reader = pd.read_csv(
+            local_path, **plan.read_csv_kwargs(header=None, on_bad_lines='skip', chunksize=self.chunk_size)
+        )
+        with reader:
+            for chunk in reader:
+                lines += len(chunk)
+                if len(chunk.columns) > self.amount_column:
+                    amount += pd.to_numeric(chunk.iloc[:, self.amount_column], errors='coerce').sum()
+
+        return FileStats(lines=lines, amount=float(amount))
+
+
+# Instance globale
+csv_stats = CSVStatsEngine()
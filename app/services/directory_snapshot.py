@@ -0,0 +1,153 @@
+"""
+Instantané persistant d'un répertoire distant et calcul des différences entre deux listages
+Permet d'afficher immédiatement le dernier listage connu au démarrage, puis de
+n'appliquer à l'interface que les fichiers ajoutés, supprimés ou modifiés.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from loguru import logger
+
+
+@dataclass
+class SnapshotDiff:
+    """Différences entre deux listages d'un répertoire"""
+    added: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[Dict[str, Any]] = field(default_factory=list)
+    modified: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.modified)
+
+    def __str__(self) -> str:
+        return f"+{len(self.added)} -{len(self.removed)} ~{len(self.modified)}"
+
+
+class DirectorySnapshot:
+    """Dernier listage connu d'un répertoire distant, sauvegardé sur disque"""
+
+    def __init__(self, host: str, port: int, username: str, remote_path: str,
+                 snapshot_folder: Optional[str] = None):
+        self.remote_path = remote_path
+        # Serveur listé: deux serveurs peuvent avoir un répertoire de même chemin
+        self.server = f"{username}@{host}:{int(port)}"
+
+        if snapshot_folder is None:
+            app_data = Path.home() / "AppData" / "Local" / "SupplierOrderManager"
+            snapshot_folder = app_data / "cache" / "snapshots"
+        self.snapshot_folder = Path(snapshot_folder)
+
+        path_hash = hashlib.sha1(f"{self.server}{remote_path}".encode('utf-8')).hexdigest()[:16]
+        self.snapshot_file = self.snapshot_folder / f"{path_hash}.json"
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dir_mtime: Optional[float] = None
+        self.listed_at: float = 0.0
+        self.loaded_from_disk = False
+
+    # ==================== API ====================
+
+    def files(self) -> List[Dict[str, Any]]:
+        """Retourne le listage courant (même format que FTPFetcher.list_files)"""
+        return [dict(entry) for entry in self.entries.values()]
+
+    def diff(self, files: List[Dict[str, Any]]) -> SnapshotDiff:
+        """Compare un nouveau listage à l'instantané, sans le modifier"""
+        result = SnapshotDiff()
+        new_entries = {f['filename']: f for f in files}
+
+        for filename, file_info in new_entries.items():
+            old = self.entries.get(filename)
+            if old is None:
+                result.added.append(file_info)
+            elif old.get('size') != file_info.get('size') or old.get('modified') != file_info.get('modified'):
+                result.modified.append(file_info)
+
+        for filename, file_info in self.entries.items():
+            if filename not in new_entries:
+                result.removed.append(file_info)
+
+        return result
+
+    def apply(self, files: List[Dict[str, Any]], dir_mtime: Optional[float] = None) -> SnapshotDiff:
+        """Remplace l'instantané par un nouveau listage et retourne les différences"""
+        result = self.diff(files)
+
+        self.entries = {f['filename']: dict(f) for f in files}
+        self.dir_mtime = dir_mtime
+        self.listed_at = time.time()
+
+        if not result.is_empty or not self.snapshot_file.exists():
+            self.save()
+
+        logger.debug(f"Instantané {self.remote_path}: {result}")
+        return result
+
+    def remove(self, filenames: List[str]) -> SnapshotDiff:
+        """Retire des fichiers de l'instantané (ex: après archivage) et retourne les différences"""
+        result = SnapshotDiff()
+        for filename in filenames:
+            entry = self.entries.pop(filename, None)
+            if entry is not None:
+                result.removed.append(entry)
+        if not result.is_empty:
+            # Le répertoire a changé: forcer un listage complet au prochain rafraîchissement
+            self.dir_mtime = None
+            self.save()
+        return result
+
+    # ==================== PERSISTANCE ====================
+
+    def load(self) -> bool:
+        """Charge l'instantané sauvegardé lors de la session précédente"""
+        try:
+            if not self.snapshot_file.exists():
+                return False
+
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get('remote_path') != self.remote_path or data.get('server') != self.server:
+                return False
+
+            self.entries = {}
+            for entry in data.get('entries', []):
+                entry['modified'] = datetime.fromisoformat(entry['modified']) if entry.get('modified') else None
+                self.entries[entry['filename']] = entry
+
+            # Ne pas réutiliser dir_mtime: le premier rafraîchissement fait toujours un listage complet
+            self.dir_mtime = None
+            self.loaded_from_disk = True
+            logger.info(f"Instantané chargé: {len(self.entries)} fichier(s) pour {self.remote_path}")
+            return True
+
+        except Exception as e:
+            logger.warning(f"Instantané illisible pour {self.remote_path}: {e}")
+            return False
+
+    def save(self):
+        """Sauvegarde l'instantané sur disque"""
+        try:
+            self.snapshot_folder.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for entry in self.entries.values():
+                serialized = dict(entry)
+                if isinstance(serialized.get('modified'), datetime):
+                    serialized['modified'] = serialized['modified'].isoformat()
+                entries.append(serialized)
+
+            tmp_path = self.snapshot_file.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'server': self.server, 'remote_path': self.remote_path, 'entries': entries}, f,
+                          ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_file)
+
+        except Exception as e:
+            logger.error(f"Erreur sauvegarde de l'instantané {self.remote_path}: {e}")
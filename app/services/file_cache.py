@@ -0,0 +1,183 @@
+"""
+Cache local des fichiers fournisseurs téléchargés depuis le serveur FTP
+Les fichiers sont indexés par (chemin distant, taille, date de modification):
+un fichier modifié sur le serveur change de clé et sera donc retéléchargé.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Union
+from loguru import logger
+
+
+class RemoteFileCache:
+    """Cache disque LRU des fichiers distants, borné en taille"""
+
+    def __init__(self, cache_folder: Optional[str] = None, max_size_mb: Optional[int] = None):
+        if cache_folder is None:
+            app_data = Path.home() / "AppData" / "Local" / "SupplierOrderManager"
+            self.cache_folder = app_data / "cache" / "files"
+        else:
+            self.cache_folder = Path(cache_folder)
+
+        if max_size_mb is None:
+            max_size_mb = int(os.getenv("FILE_CACHE_MAX_MB", 500))
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+
+        self.index_path = self.cache_folder / "index.json"
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False  # Dates d'accès modifiées en mémoire, pas encore écrites dans l'index
+
+    # ==================== API ====================
+
+    @staticmethod
+    def make_key(remote_path: str, size: Optional[int], mtime: Union[datetime, float, int, None]) -> str:
+        """Calcule la clé de cache d'un fichier distant"""
+        if isinstance(mtime, datetime):
+            mtime = mtime.timestamp()
+        mtime = int(mtime) if mtime is not None else 0
+        raw = f"{remote_path}|{int(size or 0)}|{mtime}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, remote_path: str, size: Optional[int], mtime: Union[datetime, float, int, None]) -> Optional[Path]:
+        """Retourne le chemin local du fichier en cache, ou None s'il n'est pas (ou plus) en cache"""
+        key = self.make_key(remote_path, size, mtime)
+
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+
+            local_path = self._path_for_key(key)
+            if not local_path.exists():
+                # Fichier supprimé manuellement: nettoyer l'index
+                del self._index[key]
+                self._save_index()
+                return None
+
+            # Date d'accès mise à jour en mémoire seulement: écrite avec la prochaine sauvegarde (ou flush)
+            entry['last_access'] = time.time()
+            self._dirty = True
+            return local_path
+
+    def reserve_path(self, remote_path: str, size: Optional[int], mtime: Union[datetime, float, int, None]) -> Path:
+        """Retourne un chemin temporaire dans le cache où télécharger le fichier avant commit()"""
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        key = self.make_key(remote_path, size, mtime)
+        return self.cache_folder / f"{key}.{threading.get_ident()}.part"
+
+    def commit(self, remote_path: str, size: Optional[int], mtime: Union[datetime, float, int, None],
+               downloaded_path: Union[str, Path]) -> Optional[Path]:
+        """Ajoute au cache un fichier téléchargé (le fichier est déplacé, pas copié)"""
+        key = self.make_key(remote_path, size, mtime)
+
+        try:
+            with self._lock:
+                self._ensure_loaded()
+                local_path = self._path_for_key(key)
+                os.replace(str(downloaded_path), str(local_path))
+
+                # Les anciennes versions du même fichier distant ne serviront plus
+                for other_key in [k for k, entry in self._index.items()
+                                  if entry.get('remote_path') == remote_path and k != key]:
+                    self._remove_entry(other_key)
+
+                self._index[key] = {
+                    'remote_path': remote_path,
+                    'size': local_path.stat().st_size,
+                    'last_access': time.time()
+                }
+                self._evict(keep=key)
+                self._save_index()
+                return local_path
+
+        except Exception as e:
+            logger.error(f"Erreur ajout au cache de {remote_path}: {e}")
+            return None
+
+    def invalidate(self, remote_path: str):
+        """Supprime du cache toutes les versions d'un fichier distant (ex: après archivage)"""
+        with self._lock:
+            self._ensure_loaded()
+            keys = [k for k, entry in self._index.items() if entry.get('remote_path') == remote_path]
+            for key in keys:
+                self._remove_entry(key)
+            if keys:
+                self._save_index()
+                logger.debug(f"Cache invalidé pour {remote_path} ({len(keys)} version(s))")
+
+    def flush(self):
+        """Écrit l'index s'il reste des dates d'accès non sauvegardées (à appeler à la fermeture de l'application)"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self._ensure_loaded()
+            for key in list(self._index.keys()):
+                self._remove_entry(key)
+            self._save_index()
+
+    # ==================== INTERNE ====================
+
+    def _path_for_key(self, key: str) -> Path:
+        return self.cache_folder / key
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+        except Exception as e:
+            logger.warning(f"Index du cache illisible, réinitialisation: {e}")
+            self._index = {}
+
+    def _save_index(self):
+        try:
+            self.cache_folder.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Erreur sauvegarde de l'index du cache: {e}")
+
+    def _remove_entry(self, key: str):
+        self._index.pop(key, None)
+        try:
+            self._path_for_key(key).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Impossible de supprimer le fichier en cache {key}: {e}")
+
+    def _evict(self, keep: Optional[str] = None):
+        """Supprime les fichiers les moins récemment utilisés jusqu'à repasser sous la taille max"""
+        total = sum(entry.get('size', 0) for entry in self._index.values())
+        if total <= self.max_size_bytes:
+            return
+
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1].get('last_access', 0)):
+            if total <= self.max_size_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entry.get('size', 0)
+            self._remove_entry(key)
+            logger.debug(f"Éviction du cache: {entry.get('remote_path')}")
+
+
+# Instance globale
+file_cache = RemoteFileCache()
@@ -0,0 +1,115 @@
+"""
+Index en colonnes du listage des fichiers FTP
+Le listage est converti une fois en tableaux parallèles (nom, taille, date de
+modification), en un masque par fournisseur et en ordres de tri précalculés:
+filtrer par fournisseur, période ou nom revient à combiner des masques numpy, et le tableau
+est rempli depuis les lignes retenues, déjà dans l'ordre d'affichage.
+"""
+
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from app.services.supplier_classifier import SupplierClassifier
+
+
+class FileIndex:
+    """Listage FTP en colonnes (format FTPFetcher.list_files), classé par fournisseur"""
+
+    ORDER_NAME = 'name'
+    ORDER_MODIFIED = 'modified'
+
+    def __init__(self, files: List[Dict[str, Any]], classifier: Optional[SupplierClassifier] = None):
+        """
+        Args:
+            files: Listage, conservé tel quel (les lignes retenues sont renvoyées sans copie)
+            classifier: Classement par fournisseur (clé: file_filter_slug)
+        """
+        self.files = files
+        count = len(files)
+
+        self._names = np.array([f['filename'].lower() for f in files], dtype=str)
+        self._sizes = np.fromiter((f.get('size') or 0 for f in files), dtype=np.int64, count=count)
+        self._mtimes = np.fromiter(
+            (f['modified'].timestamp() if f.get('modified') else np.nan for f in files),
+            dtype=np.float64, count=count
+        )
+
+        # Lignes de chaque fournisseur, sous forme de masque (un fichier peut relever de plusieurs fournisseurs)
+        self._supplier_masks: Dict[str, np.ndarray] = {}
+        if classifier is not None:
+            rows_by_supplier = classifier.classify_all(range(count), filename_of=lambda row: files[row]['filename'])
+            for supplier_key, rows in rows_by_supplier.items():
+                if supplier_key is None:
+                    continue
+                supplier_mask = np.zeros(count, dtype=bool)
+                supplier_mask[rows] = True
+                self._supplier_masks[supplier_key] = supplier_mask
+
+        # Ordres d'affichage: nom (insensible à la casse), date de modification (plus récent d'abord)
+        self._orders = {
+            self.ORDER_NAME: np.argsort(self._names, kind='stable'),
+            self.ORDER_MODIFIED: np.argsort(-self._mtimes, kind='stable'),
+        }
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    # ==================== FILTRES ====================
+
+    def mask(self, supplier: Optional[str] = None,
+             date_from: Optional[Union[date, datetime]] = None,
+             date_to: Optional[Union[date, datetime]] = None,
+             name_contains: Optional[str] = None,
+             min_size: Optional[int] = None) -> np.ndarray:
+        """
+        Masque booléen des lignes retenues (un filtre None est ignoré)
+
+        Args:
+            supplier: Clé fournisseur (file_filter_slug)
+            date_from: Modifié à partir de cette date/heure
+            date_to: Modifié jusqu'à cette date/heure (une date inclut toute la journée)
+            name_contains: Sous-chaîne du nom, insensible à la casse
+            min_size: Taille minimale en octets
+        """
+        mask = np.ones(len(self.files), dtype=bool)
+
+        if supplier is not None:
+            supplier_mask = self._supplier_masks.get(supplier)
+            if supplier_mask is None:
+                return np.zeros(len(self.files), dtype=bool)
+            mask &= supplier_mask
+        if date_from is not None:
+            mask &= self._mtimes >= self._timestamp(date_from)
+        if date_to is not None:
+            if isinstance(date_to, datetime):
+                mask &= self._mtimes <= date_to.timestamp()
+            else:
+                mask &= self._mtimes < self._timestamp(date_to + timedelta(days=1))
+        if name_contains:
+            mask &= np.char.find(self._names, name_contains.lower()) >= 0
+        if min_size is not None:
+            mask &= self._sizes >= min_size
+
+        return mask
+
+    def rows(self, mask: Optional[np.ndarray] = None, order: str = ORDER_NAME) -> np.ndarray:
+        """Numéros des lignes retenues, dans l'ordre demandé"""
+        order_rows = self._orders[order]
+        return order_rows if mask is None else order_rows[mask[order_rows]]
+
+    def select(self, order: str = ORDER_NAME, **filters) -> List[Dict[str, Any]]:
+        """Fichiers retenus par les filtres de mask(), dans l'ordre demandé"""
+        files = self.files
+        return [files[row] for row in self.rows(self.mask(**filters), order).tolist()]
+
+    def supplier_counts(self) -> Dict[str, int]:
+        """Nombre de fichiers par fournisseur"""
+        return {key: int(np.count_nonzero(supplier_mask)) for key, supplier_mask in self._supplier_masks.items()}
+
+    @staticmethod
+    def _timestamp(value: Union[date, datetime]) -> float:
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, time.min)
+        return value.timestamp()
@@ -6,10 +6,15 @@ import os
 import pandas as pd
 from typing import Optional, Dict, Any, List
 from pathlib import Path
-from datetime import datetime
 from loguru import logger
 
 from app.models.file_record import FileType
+from app.services.csv_sniffer import csv_sniffer
+from app.services.transformation_plan import TransformationPlan, plan_cache
+
+
+# Lecture des CSV à transformer: séparateur et en-tête par défaut de pandas (seul l'encodage est détecté)
+CSV_READ_DEFAULTS = {'sep': ',', 'header': 0}
 
 
 class FileProcessor:
@@ -24,20 +29,20 @@ class FileProcessor:
             self.temp_folder = Path(temp_folder)
         self.temp_folder.mkdir(parents=True, exist_ok=True)
 
-    def read_file(self, file_path: str, file_type: FileType) -> Optional[pd.DataFrame]:
-        """Lit un fichier et retourne un DataFrame pandas"""
+    def read_file(self, file_path: str, file_type: FileType,
+                  supplier_key: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Lit un fichier et retourne un DataFrame pandas
+
+        Args:
+            supplier_key: Identifiant du fournisseur (réutilise son plan de lecture CSV)
+        """
         try:
             if file_type == FileType.CSV:
-                # Essayer différents encodages
-                for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-                    try:
-                        df = pd.read_csv(file_path, encoding=encoding)
-                        logger.info(f"Fichier CSV lu avec encoding {encoding}: {file_path}")
-                        return df
-                    except UnicodeDecodeError:
-                        continue
-                logger.error(f"Impossible de lire le fichier CSV avec les encodages testés: {file_path}")
-                return None
+                # Encodage détecté une seule fois (par fournisseur si connu);
+                # séparateur et en-tête restent ceux de pandas (',' et première ligne)
+                df = csv_sniffer.read_csv(file_path, supplier_key=supplier_key, **CSV_READ_DEFAULTS)
+                logger.info(f"Fichier CSV lu: {file_path}")
+                return df
 
             elif file_type in [FileType.XLSX, FileType.XLS]:
                 df = pd.read_excel(file_path)
@@ -52,7 +57,8 @@ class FileProcessor:
             logger.error(f"Erreur lors de la lecture du fichier {file_path}: {e}")
             return None
 
-    def apply_transformation(self, df: pd.DataFrame, rules: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    def apply_transformation(self, df: pd.DataFrame, rules: Dict[str, Any],
+                             inplace: bool = False, supplier_key: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         Applique les règles de transformation à un DataFrame
 
@@ -61,51 +67,16 @@ class FileProcessor:
         - columns_to_add: ajout de colonnes avec valeurs par défaut
         - columns_to_remove: suppression de colonnes
         - format_rules: formatage des valeurs
+
+        Les règles sont compilées en plan d'exécution (voir TransformationPlan).
+
+        Args:
+            inplace: Le DataFrame appartient à l'appelant et peut être modifié (pas de copie)
+            supplier_key: Identifiant du fournisseur (plan compilé réutilisé tant que ses règles ne changent pas)
         """
         try:
-            result_df = df.copy()
-
-            # 1. Renommage des colonnes
-            if 'column_mapping' in rules and rules['column_mapping']:
-                result_df = result_df.rename(columns=rules['column_mapping'])
-                logger.debug(f"Colonnes renommées: {rules['column_mapping']}")
-
-            # 2. Ajout de colonnes
-            if 'columns_to_add' in rules and rules['columns_to_add']:
-                for col_name, col_value in rules['columns_to_add'].items():
-                    if col_value == 'today':
-                        result_df[col_name] = datetime.now().date()
-                    elif col_value == 'now':
-                        result_df[col_name] = datetime.now()
-                    else:
-                        result_df[col_name] = col_value
-                logger.debug(f"Colonnes ajoutées: {list(rules['columns_to_add'].keys())}")
-
-            # 3. Suppression de colonnes
-            if 'columns_to_remove' in rules and rules['columns_to_remove']:
-                result_df = result_df.drop(columns=rules['columns_to_remove'], errors='ignore')
-                logger.debug(f"Colonnes supprimées: {rules['columns_to_remove']}")
-
-            # 4. Règles de formatage
-            if 'format_rules' in rules and rules['format_rules']:
-                for col_name, format_type in rules['format_rules'].items():
-                    if col_name not in result_df.columns:
-                        continue
-
-                    if format_type == 'uppercase':
-                        result_df[col_name] = result_df[col_name].astype(str).str.upper()
-                    elif format_type == 'lowercase':
-                        result_df[col_name] = result_df[col_name].astype(str).str.lower()
-                    elif format_type == 'integer':
-                        result_df[col_name] = pd.to_numeric(result_df[col_name], errors='coerce').fillna(0).astype(int)
-                    elif format_type == 'float':
-                        result_df[col_name] = pd.to_numeric(result_df[col_name], errors='coerce')
-                    elif format_type == 'date':
-                        result_df[col_name] = pd.to_datetime(result_df[col_name], errors='coerce')
-                    elif format_type == 'trim':
-                        result_df[col_name] = result_df[col_name].astype(str).str.strip()
-
-                logger.debug(f"Formatage appliqué sur: {list(rules['format_rules'].keys())}")
+            plan = self._plan_for(rules, supplier_key)
+            result_df = plan.apply(df, inplace=inplace)
 
             logger.info(f"Transformation appliquée avec succès. Lignes: {len(result_df)}, Colonnes: {len(result_df.columns)}")
             return result_df
@@ -114,6 +85,42 @@ class FileProcessor:
             logger.error(f"Erreur lors de la transformation: {e}")
             return None
 
+    def transform_csv(self, input_path: str, output_path: str, rules: Dict[str, Any],
+                      supplier_key: Optional[str] = None, chunk_size: int = 100_000) -> Optional[int]:
+        """
+        Transforme un CSV par morceaux, sans le charger entièrement en mémoire
+
+        Returns:
+            Nombre de lignes écrites, None en cas d'erreur
+        """
+        try:
+            plan = self._plan_for(rules, supplier_key)
+            read_plan = csv_sniffer.plan_for(input_path, supplier_key)
+            dtypes = plan.read_dtypes()
+
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            reader = pd.read_csv(input_path, chunksize=chunk_size, dtype=dtypes or None,
+                                 **read_plan.read_csv_kwargs(**CSV_READ_DEFAULTS))
+
+            row_count = 0
+            with open(output_path, 'w', encoding='utf-8-sig', newline='') as output:
+                for index, chunk in enumerate(plan.apply_chunks(reader)):
+                    chunk.to_csv(output, index=False, header=index == 0)
+                    row_count += len(chunk)
+
+            logger.info(f"Fichier transformé par morceaux: {output_path} ({row_count} lignes)")
+            return row_count
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la transformation de {input_path}: {e}")
+            return None
+
+    @staticmethod
+    def _plan_for(rules: Dict[str, Any], supplier_key: Optional[str]) -> TransformationPlan:
+        if supplier_key:
+            return plan_cache.transformation(supplier_key, rules)
+        return TransformationPlan.compile(rules)
+
     def save_dataframe(self, df: pd.DataFrame, output_path: str, file_type: FileType) -> bool:
         """Sauvegarde un DataFrame dans un fichier"""
         try:
@@ -143,7 +150,7 @@ class FileProcessor:
         try:
             dfs = []
             for file_path in file_paths:
-                df = self.read_file(file_path, file_type)
+                df = self.read_file(file_path, file_type, supplier_key=supplier_code)
                 if df is not None:
                     # Ajouter une colonne pour tracer l'origine
                     df['_source_file'] = Path(file_path).name
@@ -7,17 +7,43 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple, Union, Iterator
 from datetime import datetime, timedelta
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from loguru import logger
 
 from app.utils import config
 
 
+@dataclass
+class BulkResult:
+    """Résultat d'une opération groupée"""
+    succeeded: List[Dict[str, Any]] = field(default_factory=list)  # Lignes renvoyées par la base
+    failed: List[Tuple[int, str]] = field(default_factory=list)    # (index dans la liste fournie, erreur)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def failed_indexes(self) -> set:
+        return {index for index, _ in self.failed}
+
+
 class SupabaseClient:
     """Client singleton pour gérer les interactions avec Supabase"""
 
+    # Lignes par requête pour les opérations groupées
+    BULK_CHUNK_SIZE = 500
+
+    # Colonnes de la liste des fichiers (pas de ligne fournisseur complète par fichier)
+    FILE_LIST_COLUMNS = ('id, filename, supplier_code, received_date, file_type, status, locked_by, locked_at, '
+                         'original_path, row_count, file_size, created_at, suppliers(name), profiles(full_name, email)')
+    FILE_PAGE_SIZE = 1000
+    # Clé de pagination: ordre de la liste, id en dernier pour départager les égalités
+    FILE_PAGE_KEY = ('received_date', 'created_at', 'id')
+
     _instance: Optional['SupabaseClient'] = None
     _client: Optional[Client] = None
     _current_user: Optional[Dict[str, Any]] = None
@@ -95,10 +121,48 @@ class SupabaseClient:
 
     def get_files(self, status: Optional[str] = None,
                   supplier_code: Optional[str] = None,
-                  date_from: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Récupère la liste des fichiers avec filtres optionnels"""
+                  date_from: Optional[datetime] = None,
+                  columns: str = FILE_LIST_COLUMNS) -> List[Dict[str, Any]]:
+        """Récupère la liste des fichiers avec filtres optionnels (toutes les pages de iter_file_pages)"""
         try:
-            query = self.client.table('files').select('*, suppliers(*), profiles(full_name, email)')
+            files = []
+            for page in self.iter_file_pages(columns, status=status, supplier_code=supplier_code, date_from=date_from):
+                files.extend(page)
+            logger.debug(f"Fichiers récupérés: {len(files)}")
+            return files
+        except Exception as e:
+            # Pas de liste partielle: une page manquante fausserait la liste affichée
+            logger.error(f"Erreur récupération fichiers: {e}")
+            return []
+
+    def iter_file_pages(self, columns: str = FILE_LIST_COLUMNS, page_size: int = FILE_PAGE_SIZE,
+                        status: Optional[str] = None,
+                        supplier_code: Optional[str] = None,
+                        date_from: Optional[datetime] = None,
+                        date_to: Optional[datetime] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parcourt les fichiers page par page, du plus récent au plus ancien
+
+        Pagination par clé (received_date, created_at, id): chaque page reprend après la
+        dernière ligne de la précédente, sans OFFSET, à coût constant quelle que soit la
+        profondeur. Les colonnes de la clé sont ajoutées à la projection si besoin.
+        Les lignes dont une colonne de la clé est NULL sont ignorées (elles ne peuvent
+        pas être situées par rapport à la page précédente).
+
+        Lève une exception si une page ne peut pas être récupérée.
+
+        Args:
+            columns: Projection PostgREST (ex: 'id, filename, status, suppliers(name)')
+            page_size: Lignes par requête
+        """
+        selected = {column.strip() for column in columns.split(',')}
+        missing = [column for column in self.FILE_PAGE_KEY if column not in selected and '*' not in selected]
+        if missing:
+            columns = f"{columns}, {', '.join(missing)}"
+
+        last_row = None
+        while True:
+            query = self.client.table('files').select(columns)
 
             if status:
                 query = query.eq('status', status)
@@ -106,15 +170,32 @@ class SupabaseClient:
                 query = query.eq('supplier_code', supplier_code)
             if date_from:
                 query = query.gte('received_date', date_from.isoformat())
-
-            query = query.order('received_date', desc=True).order('created_at', desc=True)
-
-            response = query.execute()
-            logger.debug(f"Fichiers récupérés: {len(response.data)}")
-            return response.data
-        except Exception as e:
-            logger.error(f"Erreur récupération fichiers: {e}")
-            return []
+            if date_to:
+                query = query.lte('received_date', date_to.isoformat())
+            for column in self.FILE_PAGE_KEY[:-1]:  # id: clé primaire, jamais NULL
+                query = query.not_.is_(column, 'null')
+            if last_row is not None:
+                query = query.or_(self._after_key(last_row))
+
+            for column in self.FILE_PAGE_KEY:
+                query = query.order(column, desc=True)
+
+            page = query.limit(page_size).execute().data or []
+
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last_row = page[-1]
+
+    def _after_key(self, row: Dict[str, Any]) -> str:
+        """Filtre PostgREST 'après cette ligne' dans l'ordre décroissant de FILE_PAGE_KEY"""
+        conditions = []
+        for depth, column in enumerate(self.FILE_PAGE_KEY):
+            equal = [f'{previous}.eq."{row[previous]}"' for previous in self.FILE_PAGE_KEY[:depth]]
+            condition = f'{column}.lt."{row[column]}"'
+            conditions.append(f"and({','.join(equal + [condition])})" if equal else condition)
+        return ','.join(conditions)
 
     def create_file(self, file_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Crée un nouvel enregistrement de fichier"""
@@ -126,6 +207,22 @@ class SupabaseClient:
             logger.error(f"Erreur création fichier: {e}")
             return None
 
+    def find_files_by(self, column: str, values: List[Any], supplier_code: Optional[str] = None,
+                      columns: str = 'id, content_hash, original_path') -> List[Dict[str, Any]]:
+        """
+        Fichiers dont la colonne vaut l'une des valeurs (une requête par lot de BULK_CHUNK_SIZE)
+
+        Lève l'exception en cas d'erreur: une liste vide signifie réellement "aucun fichier".
+        """
+        rows = []
+        values = list(values)
+        for start in range(0, len(values), self.BULK_CHUNK_SIZE):
+            query = self.client.table('files').select(columns).in_(column, values[start:start + self.BULK_CHUNK_SIZE])
+            if supplier_code:
+                query = query.eq('supplier_code', supplier_code)
+            rows.extend(query.execute().data or [])
+        return rows
+
     def update_file(self, file_id: str, updates: Dict[str, Any]) -> bool:
         """Met à jour un fichier"""
         try:
@@ -136,27 +233,49 @@ class SupabaseClient:
             logger.error(f"Erreur mise à jour fichier: {e}")
             return False
 
+    def create_files(self, files_data: List[Dict[str, Any]]) -> BulkResult:
+        """Crée plusieurs enregistrements de fichiers (une requête par lot de BULK_CHUNK_SIZE)"""
+        result = self._bulk_insert('files', files_data)
+        logger.info(f"Fichiers créés: {len(result.succeeded)}/{len(files_data)}")
+        return result
+
+    def update_files(self, file_ids: List[str], updates: Dict[str, Any]) -> BulkResult:
+        """Applique les mêmes modifications à plusieurs fichiers (une requête par lot)"""
+        result = BulkResult()
+        for start in range(0, len(file_ids), self.BULK_CHUNK_SIZE):
+            chunk = file_ids[start:start + self.BULK_CHUNK_SIZE]
+            try:
+                response = self.client.table('files').update(updates).in_('id', chunk).execute()
+                rows = response.data or []
+                result.succeeded.extend(rows)
+
+                updated = {row.get('id') for row in rows}
+                result.failed.extend(
+                    (start + offset, "Fichier introuvable")
+                    for offset, file_id in enumerate(chunk) if file_id not in updated
+                )
+            except Exception as e:
+                logger.error(f"Erreur mise à jour groupée ({len(chunk)} fichier(s)): {e}")
+                result.failed.extend((start + offset, str(e)) for offset in range(len(chunk)))
+
+        logger.info(f"Fichiers mis à jour: {len(result.succeeded)}/{len(file_ids)}")
+        return result
+
     def lock_file(self, file_id: str, user_id: str) -> bool:
-        """Verrouille un fichier pour traitement"""
+        """
+        Verrouille un fichier pour traitement
+
+        Fonction SQL lock_file (migrations/create_file_lock_functions.sql): mise à jour
+        conditionnelle (locked_by IS NULL) et entrée d'historique en un seul appel,
+        un seul utilisateur obtient le verrou en cas de clics simultanés.
+        """
         try:
-            # Vérifier si le fichier n'est pas déjà verrouillé
-            file = self.client.table('files').select('locked_by').eq('id', file_id).execute()
+            response = self.client.rpc('lock_file', {'p_file_id': file_id, 'p_user_id': user_id}).execute()
 
-            if file.data and file.data[0].get('locked_by'):
+            if not response.data:
                 logger.warning(f"Fichier déjà verrouillé: {file_id}")
                 return False
 
-            updates = {
-                'locked_by': user_id,
-                'locked_at': datetime.utcnow().isoformat(),
-                'status': 'processing'
-            }
-
-            self.client.table('files').update(updates).eq('id', file_id).execute()
-
-            # Ajouter une entrée dans l'historique
-            self.add_history_entry(file_id, user_id, 'locked', {'timestamp': datetime.utcnow().isoformat()})
-
             logger.info(f"Fichier verrouillé: {file_id} par {user_id}")
             return True
         except Exception as e:
@@ -164,18 +283,17 @@ class SupabaseClient:
             return False
 
     def unlock_file(self, file_id: str, user_id: str, new_status: str = 'pending') -> bool:
-        """Déverrouille un fichier"""
+        """Déverrouille un fichier (fonction SQL unlock_file, même principe que lock_file)"""
         try:
-            updates = {
-                'locked_by': None,
-                'locked_at': None,
-                'status': new_status
-            }
-
-            self.client.table('files').update(updates).eq('id', file_id).execute()
-
-            # Ajouter une entrée dans l'historique
-            self.add_history_entry(file_id, user_id, 'unlocked', {'timestamp': datetime.utcnow().isoformat()})
+            response = self.client.rpc('unlock_file', {
+                'p_file_id': file_id,
+                'p_user_id': user_id,
+                'p_new_status': new_status
+            }).execute()
+
+            if not response.data:
+                logger.warning(f"Fichier non verrouillé: {file_id}")
+                return False
 
             logger.info(f"Fichier déverrouillé: {file_id}")
             return True
@@ -227,6 +345,17 @@ class SupabaseClient:
             logger.error(f"Erreur ajout historique: {e}")
             return False
 
+    def add_history_entries(self, entries: List[Dict[str, Any]]) -> BulkResult:
+        """
+        Ajoute plusieurs entrées dans l'historique (une requête par lot)
+
+        Args:
+            entries: Dictionnaires {'file_id', 'user_id', 'action', 'details'}
+        """
+        result = self._bulk_insert('processing_history', entries)
+        logger.debug(f"Historique ajouté: {len(result.succeeded)}/{len(entries)} entrée(s)")
+        return result
+
     def get_file_history(self, file_id: str) -> List[Dict[str, Any]]:
         """Récupère l'historique d'un fichier"""
         try:
@@ -240,12 +369,61 @@ class SupabaseClient:
             logger.error(f"Erreur récupération historique: {e}")
             return []
 
+    # ==================== OPÉRATIONS GROUPÉES ====================
+
+    def _bulk_insert(self, table: str, rows: List[Dict[str, Any]]) -> BulkResult:
+        """
+        Insère des lignes par lots de BULK_CHUNK_SIZE
+
+        Un lot est inséré en une seule instruction (tout ou rien). S'il est rejeté par
+        la base à cause de ses données (contrainte, valeur invalide), ses lignes sont
+        reprises une par une pour n'écarter que celles en erreur. Toute autre erreur
+        (délai dépassé, connexion perdue) marque le lot entier en échec: il a pu être
+        enregistré malgré tout, le réinsérer créerait des doublons.
+        """
+        result = BulkResult()
+        for start in range(0, len(rows), self.BULK_CHUNK_SIZE):
+            chunk = rows[start:start + self.BULK_CHUNK_SIZE]
+            try:
+                response = self.client.table(table).insert(chunk).execute()
+                result.succeeded.extend(response.data or [])
+                continue
+            except Exception as e:
+                if len(chunk) == 1 or not self._is_data_error(e):
+                    logger.error(f"Erreur insertion {table} ({len(chunk)} ligne(s)): {e}")
+                    result.failed.extend((start + offset, str(e)) for offset in range(len(chunk)))
+                    continue
+                logger.warning(f"Insertion groupée {table} rejetée ({e}), reprise ligne par ligne")
+
+            for offset, row in enumerate(chunk):
+                try:
+                    response = self.client.table(table).insert(row).execute()
+                    result.succeeded.extend(response.data or [])
+                except Exception as e:
+                    logger.error(f"Erreur insertion {table}: {e}")
+                    result.failed.append((start + offset, str(e)))
+
+        return result
+
+    @staticmethod
+    def _is_data_error(error: Exception) -> bool:
+        """Rejet dû aux lignes envoyées: SQLSTATE 22xxx (valeur invalide) ou 23xxx (contrainte)"""
+        return isinstance(error, APIError) and str(error.code or '')[:2] in ('22', '23')
+
     # ==================== STORAGE ====================
 
-    def upload_file(self, bucket: str, file_path: str, file_content: bytes) -> Optional[str]:
-        """Upload un fichier vers Supabase Storage"""
+    def upload_file(self, bucket: str, file_path: str, file_content: Union[bytes, str, Path],
+                    upsert: bool = False) -> Optional[str]:
+        """
+        Upload un fichier vers Supabase Storage
+
+        Args:
+            file_content: Contenu, ou chemin d'un fichier local (envoyé en flux, sans être chargé en mémoire)
+            upsert: Remplacer l'objet s'il existe déjà (sinon l'upload échoue)
+        """
         try:
-            response = self.client.storage.from_(bucket).upload(file_path, file_content)
+            file_options = {"upsert": "true"} if upsert else None
+            response = self.client.storage.from_(bucket).upload(file_path, file_content, file_options)
             logger.info(f"Fichier uploadé: {file_path} dans {bucket}")
             return file_path
         except Exception as e:
@@ -289,6 +467,22 @@ class SupabaseClient:
             logger.error(f"Erreur abonnement realtime: {e}")
             return None
 
+    def subscribe_to_suppliers(self, callback):
+        """S'abonne aux changements en temps réel sur la table suppliers"""
+        try:
+            channel = self.client.channel('suppliers-channel')
+            channel.on_postgres_changes(
+                event='*',
+                schema='public',
+                table='suppliers',
+                callback=callback
+            ).subscribe()
+            logger.info("Abonnement realtime activé pour les fournisseurs")
+            return channel
+        except Exception as e:
+            logger.error(f"Erreur abonnement realtime fournisseurs: {e}")
+            return None
+
 
 # Instance globale
 supabase_client = SupabaseClient()
@@ -0,0 +1,102 @@
+"""
+Classement des fichiers par fournisseur à partir des patterns (file_patterns)
+Tous les patterns de tous les fournisseurs sont compilés en une seule expression
+régulière: un listage complet est classé en une passe, et filtrer sur un
+fournisseur revient ensuite à une simple recherche dans un dictionnaire.
+Chaque fournisseur y est une assertion facultative avec son groupe nommé: une
+seule correspondance indique tous les fournisseurs du fichier (ex: 'M-Jardin*'
+et 'M-Jardin Bleu*'), pas seulement le premier.
+"""
+
+import fnmatch
+import os
+import re
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Iterable, Callable, Tuple
+
+
+def _normcase(value: str) -> str:
+    # Même sensibilité à la casse que fnmatch.fnmatch (insensible sous Windows)
+    return os.path.normcase(value)
+
+
+@lru_cache(maxsize=256)
+def compile_patterns(patterns: Tuple[str, ...]) -> Optional["re.Pattern"]:
+    """Compile une liste de patterns fnmatch en une seule expression (None si liste vide)"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(_normcase(p)) for p in patterns))
+
+
+def match_patterns(filename: str, patterns: Iterable[str]) -> bool:
+    """Équivalent de any(fnmatch.fnmatch(filename, p) for p in patterns), avec compilation mise en cache"""
+    regex = compile_patterns(tuple(patterns))
+    return regex is not None and regex.match(_normcase(filename)) is not None
+
+
+def glob_escape(value: str) -> str:
+    """Échappe les caractères spéciaux fnmatch d'une chaîne"""
+    return re.sub(r'([*?\[])', r'[\1]', value)
+
+
+class SupplierClassifier:
+    """Associe un nom de fichier aux fournisseurs dont un pattern correspond"""
+
+    def __init__(self, suppliers: List[Dict[str, Any]], key: str = 'file_filter_slug',
+                 slug_prefix_fallback: bool = True):
+        """
+        Args:
+            suppliers: Fournisseurs, dans l'ordre de priorité (supplier_for retourne le premier qui correspond)
+            key: Champ du fournisseur utilisé comme clé des résultats
+            slug_prefix_fallback: Pour un fournisseur sans patterns, utiliser son slug comme préfixe
+        """
+        self.key = key
+        self._suppliers: Dict[str, Dict[str, Any]] = {}
+        self._group_keys: Dict[str, str] = {}  # nom de groupe regex -> clé fournisseur
+
+        alternatives = []
+
+        for supplier in suppliers:
+            supplier_key = supplier.get(key)
+            if not supplier_key or supplier_key in self._suppliers:
+                continue
+
+            patterns = list(supplier.get('file_patterns') or [])
+            if not patterns and slug_prefix_fallback and supplier.get('file_filter_slug'):
+                patterns = [f"{glob_escape(supplier['file_filter_slug'])}*"]
+            if not patterns:
+                continue
+
+            group = f"s{len(self._group_keys)}"
+            self._group_keys[group] = supplier_key
+            self._suppliers[supplier_key] = supplier
+            body = '|'.join(fnmatch.translate(_normcase(p)) for p in patterns)
+            # Assertion facultative: le groupe n'est renseigné que si un pattern du fournisseur correspond
+            alternatives.append(f"(?:(?=(?P<{group}>{body})))?")
+
+        self._regex = re.compile(''.join(alternatives)) if alternatives else None
+
+    def classify(self, filename: str) -> List[str]:
+        """Clés de tous les fournisseurs correspondant au fichier, dans l'ordre de priorité"""
+        if self._regex is None:
+            return []
+        groups = self._regex.match(_normcase(filename)).groupdict()
+        return [key for group, key in self._group_keys.items() if groups[group] is not None]
+
+    def supplier_for(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Premier fournisseur (ordre de priorité) correspondant au fichier, ou None"""
+        supplier_keys = self.classify(filename)
+        return self._suppliers[supplier_keys[0]] if supplier_keys else None
+
+    def classify_all(self, files: Iterable[Any],
+                     filename_of: Callable[[Any], str] = lambda f: f['filename']) -> Dict[Optional[str], List[Any]]:
+        """
+        Classe un listage en une passe: {clé fournisseur: [fichiers]} (None: aucun fournisseur)
+
+        Un fichier correspondant à plusieurs fournisseurs figure dans la liste de chacun.
+        """
+        result: Dict[Optional[str], List[Any]] = {}
+        for file_info in files:
+            for supplier_key in self.classify(filename_of(file_info)) or [None]:
+                result.setdefault(supplier_key, []).append(file_info)
+        return result
@@ -0,0 +1,185 @@
+"""
+Cache en mémoire des fournisseurs (table suppliers)
+Chargé une fois après la connexion, indexé par id, slug et code fournisseur.
+Rafraîchi via le canal realtime Supabase, ou à défaut après expiration (TTL).
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, Callable
+from loguru import logger
+
+from app.services.supabase_client import supabase_client
+from app.services.supplier_classifier import SupplierClassifier
+
+
+class SupplierRepository:
+    """Fournisseurs en mémoire avec notification des changements"""
+
+    # Délai avant une nouvelle tentative de chargement après un échec (secondes)
+    RETRY_DELAY = 30
+
+    def __init__(self, ttl: Optional[int] = None):
+        """
+        Args:
+            ttl: Durée de validité du cache en secondes (env SUPPLIERS_CACHE_TTL, 300 par défaut)
+        """
+        if ttl is None:
+            ttl = int(os.getenv("SUPPLIERS_CACHE_TTL", 300))
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._suppliers: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_slug: Dict[str, Dict[str, Any]] = {}
+        self._by_code: Dict[str, Dict[str, Any]] = {}
+        self._classifier: Optional[SupplierClassifier] = None
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None  # Dernier échec de chargement
+        self._load_scheduled = False
+        self._stale = True
+        self._listeners: List[Callable[[], None]] = []
+        self._channel = None
+
+    # ==================== CHARGEMENT ====================
+
+    def load(self) -> bool:
+        """Recharge tous les fournisseurs depuis la base, retourne True si la liste a changé"""
+        try:
+            response = supabase_client.client.table('suppliers').select('*').order('name').execute()
+            suppliers = response.data or []
+        except Exception as e:
+            logger.error(f"Erreur chargement des fournisseurs: {e}")
+            with self._lock:
+                self._failed_at = time.monotonic()
+            return False
+
+        with self._lock:
+            changed = suppliers != self._suppliers
+            self._suppliers = suppliers
+            self._by_id = {s['id']: s for s in suppliers if s.get('id')}
+            self._by_slug = {s['file_filter_slug']: s for s in suppliers if s.get('file_filter_slug')}
+            self._by_code = {s['supplier_code']: s for s in suppliers if s.get('supplier_code')}
+            self._classifier = None
+            self._loaded_at = time.monotonic()
+            self._failed_at = None
+            self._stale = False
+
+        logger.info(f"{len(suppliers)} fournisseur(s) en cache")
+        if changed:
+            self._notify()
+        return changed
+
+    def refresh_if_stale(self) -> bool:
+        """Recharge si le cache a expiré ou a été invalidé (à appeler hors du thread UI)"""
+        if self.is_stale():
+            return self.load()
+        return False
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            if self._stale or self._loaded_at is None:
+                return True
+            # Avec le realtime actif, le TTL ne sert que de filet de sécurité
+            ttl = self.ttl * 4 if self._channel is not None else self.ttl
+            return time.monotonic() - self._loaded_at > ttl
+
+    def invalidate(self):
+        """Marque le cache comme périmé (rechargé au prochain refresh_if_stale)"""
+        with self._lock:
+            self._stale = True
+
+    def _ensure_loaded(self):
+        """
+        Premier accès avant tout chargement: chargement lancé en arrière-plan
+
+        Les accès retournent le cache (vide en attendant, les écouteurs sont notifiés
+        une fois chargé) et ne bloquent jamais le thread UI, même base injoignable:
+        après un échec, pas de nouvelle tentative avant RETRY_DELAY secondes.
+        """
+        with self._lock:
+            if self._loaded_at is not None or self._load_scheduled:
+                return
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.RETRY_DELAY:
+                return
+            self._load_scheduled = True
+        threading.Thread(target=self._background_load, name="suppliers-load", daemon=True).start()
+
+    def _background_load(self):
+        try:
+            self.load()
+        finally:
+            with self._lock:
+                self._load_scheduled = False
+
+    # ==================== ACCÈS ====================
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Tous les fournisseurs, triés par nom"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._suppliers)
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Fournisseurs actifs, triés par nom"""
+        return [s for s in self.all() if s.get('active')]
+
+    def get_by_id(self, supplier_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_id.get(supplier_id)
+
+    def get_by_slug(self, file_filter_slug: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_slug.get(file_filter_slug)
+
+    def get_by_code(self, supplier_code: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_code.get(supplier_code)
+
+    def classifier(self) -> SupplierClassifier:
+        """Classifieur fichier -> slug des fournisseurs actifs (recompilé après chaque rechargement)"""
+        self._ensure_loaded()
+        with self._lock:
+            if self._classifier is None:
+                self._classifier = SupplierClassifier([s for s in self._suppliers if s.get('active')])
+            return self._classifier
+
+    def find_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Premier fournisseur actif dont un pattern correspond au nom de fichier"""
+        return self.classifier().supplier_for(filename)
+
+    # ==================== NOTIFICATIONS ====================
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Appelé après chaque rechargement qui modifie la liste (depuis n'importe quel thread)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def subscribe(self):
+        """Active le rechargement automatique sur les changements de la table suppliers"""
+        if self._channel is not None:
+            return
+        self._channel = supabase_client.subscribe_to_suppliers(self._on_realtime_change)
+
+    def _on_realtime_change(self, payload):
+        logger.debug("Changement realtime sur la table suppliers")
+        self.invalidate()
+        self.load()
+
+    def _notify(self):
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Erreur notification changement fournisseurs: {e}")
+
+
+# Instance globale
+supplier_repository = SupplierRepository()
@@ -0,0 +1,279 @@
+"""
+Plan d'exécution des règles de transformation d'un fournisseur
+Les règles (renommage, ajout, suppression, formatage) sont interprétées une fois:
+les formats texte d'une même colonne sont fusionnés en une seule passe, et le même
+plan s'applique à un DataFrame complet ou à des morceaux lus en flux (fichiers plus
+grands que la mémoire).
+Les plans sont mis en cache par fournisseur (plan_cache) et recompilés seulement
+quand sa configuration change.
+"""
+
+import copy
+import importlib.util
+import re
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable, Iterator
+
+import pandas as pd
+from pandas.api.types import is_integer_dtype, is_float_dtype, is_datetime64_any_dtype
+
+
+# Texte en colonnes Arrow si pyarrow est installé (opérations texte vectorisées)
+STRING_DTYPE = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') else None
+
+# Formats texte (appliqués après conversion en str, comme astype(str))
+_STRING_OPS: Dict[str, Callable[[str], str]] = {
+    'uppercase': str.upper,
+    'lowercase': str.lower,
+    'trim': str.strip,
+}
+_ARROW_OPS = {'uppercase': 'upper', 'lowercase': 'lower', 'trim': 'strip'}
+_CONVERSIONS = ('integer', 'float', 'date')
+
+# Valeurs spéciales de columns_to_add
+_DYNAMIC_VALUES = ('today', 'now')
+
+
+class TransformationPlan:
+    """Règles de transformation compilées, réutilisables sur plusieurs DataFrames"""
+
+    def __init__(self, rename: Dict[str, str], constants: List[Tuple[str, Any]],
+                 drop: List[str], formats: List[Tuple[str, Tuple[str, ...], Optional[str]]]):
+        self.rename = rename
+        self.constants = constants
+        self.drop = drop
+        self.formats = formats  # (colonne, formats texte fusionnés, conversion finale)
+        self._string_functions = {
+            column: self._compose([_STRING_OPS[op] for op in ops]) for column, ops, _ in formats if ops
+        }
+
+    @classmethod
+    def compile(cls, rules: Dict[str, Any]) -> 'TransformationPlan':
+        """
+        Compile les règles (format de config/transformations.json)
+
+        format_rules (ou formatting) associe à une colonne un format ou une liste de
+        formats: ["trim", "uppercase"] est exécuté en une seule passe.
+        """
+        rename = dict(rules.get('column_mapping') or {})
+        constants = list((rules.get('columns_to_add') or {}).items())
+        drop = list(rules.get('columns_to_remove') or [])
+
+        formats = []
+        format_rules = rules.get('format_rules') or rules.get('formatting') or {}
+        for column, format_types in format_rules.items():
+            if isinstance(format_types, str):
+                format_types = [format_types]
+            ops = tuple(op for op in format_types if op in _STRING_OPS)
+            conversions = [op for op in format_types if op in _CONVERSIONS]
+            if ops or conversions:
+                formats.append((column, ops, conversions[-1] if conversions else None))
+
+        return cls(rename, constants, drop, formats)
+
+    # ==================== TYPES ====================
+
+    def read_dtypes(self) -> Dict[str, str]:
+        """Types de lecture des colonnes sources (avant renommage): texte Arrow pour les colonnes formatées en texte"""
+        if STRING_DTYPE is None:
+            return {}
+        sources = {target: source for source, target in self.rename.items()}
+        return {
+            sources.get(column, column): STRING_DTYPE
+            for column, ops, conversion in self.formats if ops and conversion is None
+        }
+
+    # ==================== EXÉCUTION ====================
+
+    def apply(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """
+        Applique le plan
+
+        Args:
+            inplace: Le DataFrame appartient à l'appelant et peut être modifié (pas de copie).
+                Sinon seule la structure est copiée: les colonnes transformées sont de
+                nouveaux tableaux, les autres restent partagées avec l'original.
+        """
+        return self._apply(df, inplace, self._constant_values())
+
+    def apply_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Applique le plan à des morceaux lus en flux (ex: pd.read_csv(chunksize=...)), modifiés en place"""
+        constants = self._constant_values()  # 'now' identique pour tous les morceaux
+        for chunk in chunks:
+            yield self._apply(chunk, True, constants)
+
+    def _apply(self, df: pd.DataFrame, inplace: bool, constants: List[Tuple[str, Any]]) -> pd.DataFrame:
+        result = df if inplace else df.copy(deep=False)
+
+        # 1. Renommage des colonnes
+        if self.rename:
+            result.rename(columns=self.rename, inplace=True)
+
+        # 2. Ajout de colonnes
+        for column, value in constants:
+            result[column] = value
+
+        # 3. Suppression de colonnes
+        if self.drop:
+            result.drop(columns=[c for c in self.drop if c in result.columns], inplace=True)
+
+        # 4. Formatage: une passe par colonne
+        for column, ops, conversion in self.formats:
+            if column not in result.columns:
+                continue
+            series = result[column]
+            if ops:
+                series = self._format_strings(series, column, ops)
+            if conversion is not None:
+                series = self._convert(series, conversion)
+            result[column] = series
+
+        return result
+
+    def _constant_values(self) -> List[Tuple[str, Any]]:
+        now = datetime.now()
+        dynamic = {'today': now.date(), 'now': now}
+        return [
+            (column, dynamic[value] if isinstance(value, str) and value in _DYNAMIC_VALUES else value)
+            for column, value in self.constants
+        ]
+
+    def _format_strings(self, series: pd.Series, column: str, ops: Tuple[str, ...]) -> pd.Series:
+        if STRING_DTYPE is not None and series.dtype == STRING_DTYPE:
+            # Colonne Arrow: opérations vectorisées (valeurs manquantes écrites 'nan' comme astype(str))
+            series = series.fillna('nan')
+            for op in ops:
+                series = getattr(series.str, _ARROW_OPS[op])()
+            return series
+
+        function = self._string_functions[column]
+        return pd.Series([function(value) for value in series.tolist()], index=series.index, dtype=object)
+
+    @staticmethod
+    def _convert(series: pd.Series, conversion: str) -> pd.Series:
+        if conversion == 'integer':
+            if is_integer_dtype(series.dtype):
+                return series
+            return pd.to_numeric(series, errors='coerce').fillna(0).astype(int)
+        if conversion == 'float':
+            return series if is_float_dtype(series.dtype) else pd.to_numeric(series, errors='coerce')
+        return series if is_datetime64_any_dtype(series.dtype) else pd.to_datetime(series, errors='coerce')
+
+    @staticmethod
+    def _compose(functions: List[Callable[[str], str]]) -> Callable[[Any], str]:
+        """Enchaîne des formats texte en une fonction (conversion str incluse)"""
+        if len(functions) == 1:
+            function = functions[0]
+            return lambda value: function(str(value))
+
+        def run(value: Any) -> str:
+            value = str(value)
+            for function in functions:
+                value = function(value)
+            return value
+        return run
+
+
+# ==================== IMPRESSION / EXPORT / AFFICHAGE ====================
+
+# Position des colonnes des fichiers fournisseurs sans en-tête
+COLUMN_INDEXES = {
+    'ref': 0, 'qty': 1, 'designation': 2, 'price': 3,
+    'client': 4, 'ean13': 5, 'order': 6
+}
+
+
+class ColumnCleanupPlan:
+    """Suppression de colonnes et de préfixes de référence (print_config, import_config, display_config)"""
+
+    def __init__(self, columns_to_remove: List[str], prefixes_to_remove: List[str], leading_zeros: bool = False):
+        self.columns_to_remove = list(columns_to_remove)
+        self.drop_indexes = sorted({COLUMN_INDEXES[key] for key in columns_to_remove if key in COLUMN_INDEXES})
+        prefixes = [prefix for prefix in prefixes_to_remove if prefix]
+        # Alternatives essayées dans l'ordre: le premier préfixe configuré qui correspond est retiré
+        self.prefix_regex = re.compile('^(?:' + '|'.join(map(re.escape, prefixes)) + ')') if prefixes else None
+        self.leading_zeros = leading_zeros
+
+    @classmethod
+    def compile(cls, config: Dict[str, Any]) -> 'ColumnCleanupPlan':
+        prefixes = config.get('prefixes_to_remove') or []
+        if not prefixes and config.get('prefix_to_remove'):
+            prefixes = [config['prefix_to_remove']]  # Ancien format: préfixe unique
+        return cls(config.get('columns_to_remove') or [], prefixes, config.get('leading_zeros', False))
+
+    def apply(self, df: pd.DataFrame, has_header: bool = False) -> pd.DataFrame:
+        """
+        Applique le plan à un fichier lu avec dtype=str
+
+        Sans en-tête, les colonnes sont désignées par leur position (COLUMN_INDEXES) et les
+        préfixes retirés de la première colonne restante; avec en-tête, par leur nom ('ref').
+        """
+        if has_header:
+            drop = [column for column in self.columns_to_remove if column in df.columns]
+        else:
+            drop = [index for index in self.drop_indexes if index < len(df.columns)]
+        if drop:
+            df = df.drop(columns=drop)
+
+        if has_header:
+            key_column = 'ref' if 'ref' in df.columns else None
+        else:
+            key_column = df.columns[0] if len(df.columns) > 0 else None
+        if key_column is None:
+            return df
+
+        if self.prefix_regex is not None:
+            series = df[key_column]
+            if series.dtype != object and not isinstance(series.dtype, pd.StringDtype):
+                series = series.astype(str)
+            df[key_column] = series.str.replace(self.prefix_regex, '', n=1, regex=True)
+        if self.leading_zeros:
+            # Formater comme texte pour conserver les zéros
+            df[key_column] = df[key_column].astype(str)
+        return df
+
+
+# ==================== CACHE ====================
+
+class PlanCache:
+    """Plans compilés par fournisseur, recompilés uniquement quand leur configuration change"""
+
+    def __init__(self):
+        self._plans: Dict[Tuple[str, str], Tuple[Dict[str, Any], Any]] = {}
+        self._lock = threading.Lock()
+
+    def transformation(self, supplier_key: str, rules: Dict[str, Any]) -> TransformationPlan:
+        """Plan des règles de transformation (config/transformations.json)"""
+        return self._get(supplier_key, 'transformation', rules, TransformationPlan.compile)
+
+    def cleanup(self, supplier_key: str, kind: str, config: Dict[str, Any]) -> ColumnCleanupPlan:
+        """Plan de nettoyage des colonnes (kind: 'print', 'import' ou 'display')"""
+        return self._get(supplier_key, kind, config, ColumnCleanupPlan.compile)
+
+    def forget(self, supplier_key: Optional[str] = None):
+        """Oublie les plans d'un fournisseur (ou tous les plans)"""
+        with self._lock:
+            if supplier_key is None:
+                self._plans.clear()
+            else:
+                for key in [key for key in self._plans if key[0] == supplier_key]:
+                    del self._plans[key]
+
+    def _get(self, supplier_key: str, kind: str, config: Dict[str, Any], compile_plan: Callable[[Dict[str, Any]], Any]):
+        config = config or {}
+        key = (supplier_key, kind)
+        with self._lock:
+            entry = self._plans.get(key)
+        if entry is not None and entry[0] == config:
+            return entry[1]
+
+        plan = compile_plan(config)
+        with self._lock:
+            # Copie: une configuration modifiée en place est bien détectée
+            self._plans[key] = (copy.deepcopy(config), plan)
+        return plan
+
+
+# Instance globale
+plan_cache = PlanCache()
@@ -0,0 +1,184 @@
+"""
+Modèle du tableau des fichiers FTP (model/view Qt)
+La case à cocher et le fond vert des lignes cochées sont servis par data(),
+sans widget par ligne: seul le coût des lignes visibles est payé au dessin.
+"""
+
+import bisect
+from typing import List, Dict, Any, Optional
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+from PySide6.QtGui import QBrush, QColor
+
+
+class FilesTableModel(QAbstractTableModel):
+    """Fichiers FTP affichés dans le tableau principal, triés par nom"""
+
+    COL_FILENAME = 0
+    COL_DATE = 1
+    COL_FULL_PATH = 2  # Colonne cachée
+    COL_CHECK = 3
+
+    HEADERS = ["Nom du fichier", "Date", "Chemin complet", "☑"]
+
+    checked_changed = Signal()  # Émis quand des cases sont cochées/décochées
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._files: List[Dict[str, Any]] = []
+        self._sort_keys: List[str] = []  # Noms en minuscules, parallèle à _files
+        self._checked = set()  # Noms des fichiers cochés
+        self._checked_brush = QBrush(QColor("#9df589"))
+
+    # ==================== API QAbstractTableModel ====================
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._files)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        file_info = self._files[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.COL_FILENAME:
+                return f"  {file_info['filename']}"  # Padding à gauche
+            if column == self.COL_DATE:
+                modified = file_info.get('modified')
+                return modified.strftime("%d/%m/%Y") if modified else "-"
+            if column == self.COL_FULL_PATH:
+                return file_info['full_path']
+            return None
+
+        if role == Qt.CheckStateRole and column == self.COL_CHECK:
+            return Qt.Checked if file_info['filename'] in self._checked else Qt.Unchecked
+
+        if role == Qt.BackgroundRole and file_info['filename'] in self._checked:
+            return self._checked_brush
+
+        if role == Qt.TextAlignmentRole and column == self.COL_DATE:
+            return Qt.AlignCenter
+
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.CheckStateRole or index.column() != self.COL_CHECK:
+            return False
+
+        filename = self._files[index.row()]['filename']
+        if Qt.CheckState(value) == Qt.Checked:
+            self._checked.add(filename)
+        else:
+            self._checked.discard(filename)
+
+        # Toute la ligne change de fond
+        row = index.row()
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.COL_CHECK),
+                              [Qt.CheckStateRole, Qt.BackgroundRole])
+        self.checked_changed.emit()
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COL_CHECK:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    # ==================== CONTENU ====================
+
+    def set_files(self, files: List[Dict[str, Any]], checked: bool = False, sorted_by_name: bool = False):
+        """Remplace tout le contenu (fichiers au format FTPFetcher.list_files + 'full_path')
+
+        Args:
+            sorted_by_name: Fichiers déjà triés par nom (ex: lignes d'un FileIndex), pas de nouveau tri
+        """
+        self.beginResetModel()
+        self._files = list(files) if sorted_by_name else sorted(files, key=lambda f: f['filename'].lower())
+        self._sort_keys = [f['filename'].lower() for f in self._files]
+        self._checked = {f['filename'] for f in self._files} if checked else set()
+        self.endResetModel()
+        self.checked_changed.emit()
+
+    def apply_diff(self, added: List[Dict[str, Any]], removed: List[Dict[str, Any]],
+                   modified: List[Dict[str, Any]], check_added: bool = False):
+        """Applique les différences d'un listage, par plages de lignes contiguës"""
+        rows_by_name = {f['filename']: row for row, f in enumerate(self._files)}
+        checked_before = len(self._checked)
+
+        # Fichiers modifiés: mise à jour des données de la ligne
+        for file_info in modified:
+            row = rows_by_name.get(file_info['filename'])
+            if row is not None:
+                self._files[row].update(file_info)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.COL_CHECK))
+
+        # Fichiers supprimés: une notification par plage contiguë, de bas en haut
+        removed_rows = sorted({rows_by_name[f['filename']] for f in removed if f['filename'] in rows_by_name})
+        for first, last in reversed(self._contiguous_ranges(removed_rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for file_info in self._files[first:last + 1]:
+                self._checked.discard(file_info['filename'])
+            del self._files[first:last + 1]
+            del self._sort_keys[first:last + 1]
+            self.endRemoveRows()
+
+        # Fichiers ajoutés: regroupés par position d'insertion dans l'ordre alphabétique
+        added = sorted((f for f in added if f['filename'] not in rows_by_name), key=lambda f: f['filename'].lower())
+        groups = []  # [(position, [fichiers])]
+        for file_info in added:
+            position = bisect.bisect_right(self._sort_keys, file_info['filename'].lower())
+            if groups and groups[-1][0] == position:
+                groups[-1][1].append(file_info)
+            else:
+                groups.append((position, [file_info]))
+
+        # De bas en haut: les positions calculées restent valables
+        for position, group in reversed(groups):
+            self.beginInsertRows(QModelIndex(), position, position + len(group) - 1)
+            self._files[position:position] = group
+            self._sort_keys[position:position] = [f['filename'].lower() for f in group]
+            if check_added:
+                self._checked.update(f['filename'] for f in group)
+            self.endInsertRows()
+
+        if len(self._checked) != checked_before:
+            self.checked_changed.emit()
+
+    def clear(self):
+        self.set_files([])
+
+    # ==================== ACCÈS ====================
+
+    def file_at(self, row: int) -> Optional[Dict[str, Any]]:
+        return self._files[row] if 0 <= row < len(self._files) else None
+
+    def files(self) -> List[Dict[str, Any]]:
+        """Fichiers affichés, dans l'ordre du tableau"""
+        return list(self._files)
+
+    def checked_files(self) -> List[Dict[str, Any]]:
+        """Fichiers cochés, dans l'ordre du tableau"""
+        return [f for f in self._files if f['filename'] in self._checked]
+
+    @staticmethod
+    def _contiguous_ranges(rows: List[int]) -> List[tuple]:
+        """[1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]"""
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1] = (ranges[-1][0], row)
+            else:
+                ranges.append((row, row))
+        return ranges
@@ -19,11 +19,12 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QIcon, QAction
 
-import paramiko
 from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from worker.sftp_pool import sftp_pool
+
 load_dotenv()
 
 
@@ -38,7 +39,6 @@ class SFTPWorker(QThread):
         self.operation = operation
         self.params = params
         self.sftp = None
-        self.transport = None
 
     def run(self):
         """Execute l'opération SFTP"""
@@ -71,22 +71,18 @@ class SFTPWorker(QThread):
             self.disconnect_sftp()
 
     def connect_sftp(self):
-        """Connexion au serveur SFTP"""
+        """Emprunte un canal SFTP au pool partagé"""
         host = os.getenv("FTP_HOST")
         port = int(os.getenv("FTP_PORT", 22))
         username = os.getenv("FTP_USERNAME")
         password = os.getenv("FTP_PASSWORD")
 
-        self.transport = paramiko.Transport((host, port))
-        self.transport.connect(username=username, password=password)
-        self.sftp = paramiko.SFTPClient.from_transport(self.transport)
+        self.sftp = sftp_pool.acquire(host, port, username, password)
 
     def disconnect_sftp(self):
-        """Déconnexion SFTP"""
-        if self.sftp:
-            self.sftp.close()
-        if self.transport:
-            self.transport.close()
+        """Rend le canal SFTP au pool"""
+        sftp_pool.release(self.sftp)
+        self.sftp = None
 
     def list_directory(self) -> str:
         """Liste les fichiers d'un répertoire"""
@@ -372,11 +368,8 @@ class FTPManagerDialog(QDialog):
             username = os.getenv("FTP_USERNAME")
             password = os.getenv("FTP_PASSWORD")
 
-            transport = paramiko.Transport((host, port))
-            transport.connect(username=username, password=password)
-            sftp = paramiko.SFTPClient.from_transport(transport)
-
-            files = sftp.listdir_attr(path)
+            with sftp_pool.session(host, port, username, password) as sftp:
+                files = sftp.listdir_attr(path)
 
             self.files_tree.clear()
 
@@ -413,9 +406,6 @@ class FTPManagerDialog(QDialog):
                 full_path = f"{path}/{file_name}".replace('//', '/')
                 item.setData(1, Qt.UserRole, full_path)
 
-            sftp.close()
-            transport.close()
-
             self.current_path = path
             self.path_input.setText(path)
             self.info_label.setText(f"{len(files)} élément(s) dans {path}")
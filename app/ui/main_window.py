@@ -2,11 +2,13 @@
 Fenêtre principale de l'application
 """
 
+import bisect
 import os
 import sys
 import tempfile
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from datetime import datetime, date, timedelta
 from loguru import logger
 from dotenv import load_dotenv
@@ -14,12 +16,12 @@ import pandas as pd
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QTableWidget, QTableWidgetItem, QLabel, QComboBox, QDateEdit,
+    QTableView, QAbstractItemView, QLabel, QComboBox, QDateEdit,
     QMessageBox, QDialog, QFileDialog, QStatusBar, QToolBar, QMenu,
-    QScrollArea, QGridLayout, QFrame, QProgressBar, QSizePolicy, QCheckBox,
+    QScrollArea, QGridLayout, QFrame, QProgressBar, QSizePolicy,
     QStyledItemDelegate, QStyle
 )
-from PySide6.QtCore import Qt, QTimer, QDate, Signal, Slot, QSize, QByteArray
+from PySide6.QtCore import Qt, QTimer, QDate, Signal, Slot, QSize, QByteArray, QThread, QEventLoop
 from PySide6.QtGui import QAction, QIcon, QPixmap, QPainter, QBrush, QColor, QPen
 from PySide6.QtSvg import QSvgRenderer
 
@@ -48,14 +50,175 @@ from app.services.supabase_client import supabase_client
 from app.services.file_processor import FileProcessor
 from app.models.file_record import FileRecord, FileStatus, FileType
 from app.ui.transformation_config_dialog import TransformationConfigDialog
+from app.ui.files_table_model import FilesTableModel
+from app.services.directory_snapshot import DirectorySnapshot, SnapshotDiff
+from app.services.file_index import FileIndex
+from app.services.transformation_plan import plan_cache
+from app.services.csv_stats import csv_stats
+from app.services.csv_sniffer import csv_sniffer
+from app.services.supplier_repository import supplier_repository
 from worker.ftp_fetcher import FTPFetcher
 
 load_dotenv()
 
 
+@dataclass
+class FilesRefreshResult:
+    """Résultat d'un rafraîchissement de la liste des fichiers FTP"""
+    files: List[Dict[str, Any]]
+    diff: SnapshotDiff
+    suppliers: Optional[List[Dict[str, Any]]] = None  # None si la requête fournisseurs a échoué
+    logos: Dict[str, bytes] = field(default_factory=dict)  # Logos téléchargés {url: contenu}
+
+
+class FileStatsWorker(QThread):
+    """Thread de calcul des statistiques des fichiers cochés pas encore analysés"""
+
+    file_done = Signal(str)  # chemin distant du fichier analysé
+    finished = Signal()
+
+    def __init__(self, ftp_config: dict, files: list):
+        super().__init__()
+        self.ftp_config = ftp_config
+        self.files = files  # [{'remote_file', 'size', 'modified'}]
+
+    def run(self):
+        try:
+            # Cache disque d'abord: la connexion n'est ouverte que s'il reste des fichiers à télécharger
+            fetcher = FTPFetcher(
+                self.ftp_config.get("host"),
+                self.ftp_config.get("port", 22),
+                self.ftp_config.get("username"),
+                self.ftp_config.get("password"),
+                use_sftp=True
+            )
+            local_files = fetcher.fetch_cached(self.files)
+
+            for file_info in self.files:
+                remote_file = file_info['remote_file']
+                local_path = local_files.get(remote_file)
+                if not local_path:
+                    logger.error(f"Fichier indisponible pour les statistiques: {remote_file}")
+                    continue
+                if csv_stats.compute(str(local_path), remote_file, file_info['size'], file_info['modified']):
+                    self.file_done.emit(remote_file)
+
+        except Exception as e:
+            logger.error(f"Erreur calcul des statistiques: {e}")
+
+        finally:
+            self.finished.emit()
+
+
+class FilesRefreshWorker(QThread):
+    """Thread de rafraîchissement: listage FTP (incrémental) + fournisseurs actifs + logos"""
+
+    finished = Signal(object)  # FilesRefreshResult
+    progress = Signal(int, str)  # pourcentage, message
+    error = Signal(str)
+
+    def __init__(self, ftp_config: dict, snapshot: DirectorySnapshot, known_logos=None):
+        super().__init__()
+        self.ftp_config = ftp_config
+        self.snapshot = snapshot  # Modifié uniquement par ce thread tant qu'il tourne
+        self.known_logos = set(known_logos or [])
+
+    def run(self):
+        try:
+            self.progress.emit(10, "🔄 Connexion au serveur FTP...")
+            fetcher = FTPFetcher(
+                self.ftp_config.get("host"),
+                self.ftp_config.get("port", 22),
+                self.ftp_config.get("username"),
+                self.ftp_config.get("password"),
+                use_sftp=True
+            )
+            if not fetcher.connect():
+                raise ConnectionError("Connexion au serveur FTP impossible")
+
+            try:
+                self.progress.emit(30, "📋 Récupération de la liste des fichiers...")
+                diff = fetcher.sync_directory(self.snapshot, exclude_dirs=['old'])
+            finally:
+                fetcher.disconnect()
+
+            files = self.snapshot.files()
+            self.progress.emit(60, f"📊 Analyse de {len(files)} fichier(s) en cours...")
+
+            suppliers = None
+            logos = {}
+            try:
+                # Cache fournisseurs: rechargé seulement s'il a expiré ou a été invalidé
+                supplier_repository.refresh_if_stale()
+                suppliers = supplier_repository.active()
+                logos = self._fetch_logos(suppliers)
+            except Exception as e:
+                logger.error(f"Erreur chargement des fournisseurs: {e}")
+
+            self.progress.emit(100, f"✅ {len(files)} fichier(s) trouvé(s)")
+            self.finished.emit(FilesRefreshResult(files=files, diff=diff, suppliers=suppliers, logos=logos))
+
+        except Exception as e:
+            logger.error(f"Erreur lors du rafraîchissement FTP: {e}")
+            self.error.emit(str(e))
+
+    def _fetch_logos(self, suppliers: list) -> dict:
+        """Télécharge les logos pas encore connus de l'interface"""
+        import requests
+
+        logos = {}
+        for supplier in suppliers:
+            url = supplier.get('logo_url')
+            if not url or url in self.known_logos or url in logos:
+                continue
+            try:
+                response = requests.get(url, timeout=5)
+                response.raise_for_status()
+                logos[url] = response.content
+            except Exception as e:
+                logger.error(f"Erreur chargement logo fournisseur {url}: {e}")
+        return logos
+
+
+class FilesDownloadWorker(QThread):
+    """Thread de récupération des copies locales des fichiers FTP (cache disque, sinon téléchargement parallèle)"""
+
+    progress = Signal(int, int, int)  # fichiers terminés, nombre de fichiers, octets reçus
+    finished = Signal(object)  # {chemin distant: chemin local}
+
+    def __init__(self, ftp_config: dict, requests: list):
+        super().__init__()
+        self.ftp_config = ftp_config
+        self.requests = requests  # [{'remote_file', 'size', 'modified'}]
+        self.results = {}
+
+    def run(self):
+        try:
+            fetcher = FTPFetcher(
+                self.ftp_config.get("host"),
+                self.ftp_config.get("port", 22),
+                self.ftp_config.get("username"),
+                self.ftp_config.get("password"),
+                use_sftp=True
+            )
+            self.results = fetcher.fetch_cached(
+                self.requests,
+                progress_callback=lambda files_done, files_total, bytes_done, bytes_total:
+                    self.progress.emit(files_done, files_total, bytes_done)
+            )
+
+        except Exception as e:
+            logger.error(f"Erreur lors du téléchargement des fichiers: {e}")
+
+        finally:
+            self.finished.emit(self.results)
+
+
 class MainWindow(QMainWindow):
     """Fenêtre principale de l'application"""
 
+    suppliers_changed = Signal()  # Cache fournisseurs rechargé (émis depuis n'importe quel thread)
+
     def __init__(self):
         super().__init__()
         self.current_user = None
@@ -65,6 +228,25 @@ class MainWindow(QMainWindow):
         self.selected_supplier_filter = None  # Filtre par fournisseur
         self.supplier_buttons = {}  # Dict pour stocker les boutons de fournisseurs
         self.is_loading = True  # Indicateur de chargement initial
+        self.dir_snapshot = None  # Dernier listage connu du répertoire FTP
+        self._files_table_ready = False  # Tableau rempli: les rafraîchissements suivants sont incrémentaux
+        self.suppliers_data = None  # Fournisseurs actifs (dernier chargement)
+        self._logo_cache = {}  # Logos fournisseurs déjà téléchargés {url: contenu}
+        self._suppliers_grid_cols = None  # Nombre de colonnes de la grille des fournisseurs
+        self._refresh_worker = None
+        self._refresh_running = False
+        self._refresh_pending = False  # Rafraîchissement demandé pendant qu'un autre était en cours
+        self._downloading_files = False  # Téléchargement en cours: actions sur les fichiers désactivées
+        self._refresh_timer_was_active = False
+
+        # Statistiques: regrouper les changements de cases rapprochés, calcul en arrière-plan
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.setInterval(200)
+        self.stats_timer.timeout.connect(self.update_file_statistics)
+        self._stats_worker = None
+        self._stats_running = False
+        self._stats_pending = False
 
         # Timer de rafraîchissement automatique
         self.refresh_timer = QTimer(self)
@@ -72,6 +254,10 @@ class MainWindow(QMainWindow):
 
         self.init_ui()
 
+        # Reconstruire la grille quand le cache fournisseurs change (realtime, TTL, gestionnaire)
+        self.suppliers_changed.connect(self.on_suppliers_repository_changed)
+        supplier_repository.add_listener(self.suppliers_changed.emit)
+
         # Configurer le rafraîchissement automatique selon les préférences
         self.setup_auto_refresh()
 
@@ -84,10 +270,11 @@ class MainWindow(QMainWindow):
         from PySide6.QtWidgets import QApplication
         QApplication.processEvents()
 
-        # Lancer le chargement des données
+        # Lancer le chargement des données (en arrière-plan, le loader est caché à la fin)
         self.refresh_files_list()
 
-        # Cacher le loader initial après le chargement complet
+    def _finish_initial_load(self):
+        """Cache le loader initial une fois le premier chargement terminé"""
         self.is_loading = False
         if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
             self.initial_loader.hide()
@@ -101,9 +288,11 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
             self.initial_loader.setGeometry(self.centralWidget().rect())
 
-        # Réorganiser la grille des fournisseurs si elle existe et n'est pas en chargement
+        # Réorganiser la grille des fournisseurs si elle existe, n'est pas en chargement
+        # et que le nombre de colonnes change (fournisseurs et logos déjà en mémoire)
         if hasattr(self, 'supplier_buttons') and len(self.supplier_buttons) > 0 and not self.is_loading:
-            self.load_suppliers_grid()
+            if self._suppliers_grid_columns() != self._suppliers_grid_cols:
+                self.load_suppliers_grid(self.suppliers_data)
 
     def init_ui(self):
         """Initialise l'interface utilisateur"""
@@ -143,7 +332,8 @@ class MainWindow(QMainWindow):
         table_container_layout.setSpacing(0)
 
         # Tableau des fichiers (à gauche)
-        self.files_table = QTableWidget()
+        self.files_table = QTableView()
+        self.files_model = FilesTableModel(self)
         self.setup_files_table()
         table_container_layout.addWidget(self.files_table)
 
@@ -294,6 +484,7 @@ class MainWindow(QMainWindow):
         refresh_action = QAction(self._load_colored_svg_icon("refresh.svg"), "Rafraîchir", self)
         refresh_action.triggered.connect(self.refresh_files_list)
         toolbar.addAction(refresh_action)
+        self.refresh_action = refresh_action
 
         toolbar.addSeparator()
 
@@ -561,22 +752,21 @@ class MainWindow(QMainWindow):
 
     def setup_files_table(self):
         """Configure le tableau des fichiers FTP"""
-        self.files_table.setColumnCount(4)
-        self.files_table.setHorizontalHeaderLabels([
-            "Nom du fichier", "Date", "Chemin complet", "☑"
-        ])
+        self.files_table.setModel(self.files_model)
 
         # Masquer la colonne chemin complet
-        self.files_table.setColumnHidden(2, True)
+        self.files_table.setColumnHidden(FilesTableModel.COL_FULL_PATH, True)
 
         # Masquer les numéros de ligne (en-têtes verticaux)
         self.files_table.verticalHeader().setVisible(False)
 
         # Configurer les largeurs de colonnes
+        # (pas de ResizeToContents: il parcourrait toutes les lignes à chaque mise à jour)
         from PySide6.QtWidgets import QHeaderView
         header = self.files_table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)  # Nom du fichier (stretch pour remplir)
-        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)  # Date
+        header.setSectionResizeMode(1, QHeaderView.Fixed)  # Date (format fixe jj/mm/aaaa)
+        header.resizeSection(1, 90)
         header.setSectionResizeMode(3, QHeaderView.Fixed)  # Checkbox (largeur fixe)
         header.resizeSection(3, 40)  # 40 pixels pour la checkbox
 
@@ -584,11 +774,12 @@ class MainWindow(QMainWindow):
         self.files_table.setItemDelegate(NoSelectionDelegate())
 
         # Sélection par ligne
-        self.files_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.files_table.setSelectionMode(QTableWidget.SingleSelection)
+        self.files_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.files_table.setSelectionMode(QAbstractItemView.SingleSelection)
 
-        # Connexion du signal de sélection
-        self.files_table.itemSelectionChanged.connect(self.on_file_selected)
+        # Connexion des signaux de sélection et de cases à cocher
+        self.files_table.selectionModel().selectionChanged.connect(self.on_file_selected)
+        self.files_model.checked_changed.connect(self.schedule_file_statistics)
 
     # Ancienne section de boutons d'action (remplacée par les boutons dans "Actions rapides")
     # def create_actions_section(self) -> QHBoxLayout:
@@ -628,6 +819,7 @@ class MainWindow(QMainWindow):
                 user_email = getattr(self.current_user, 'email', 'Utilisateur')
                 logger.info(f"Utilisateur connecté: {user_email}")
                 self.statusBar.showMessage(f"Connecté: {user_email}")
+                supplier_repository.subscribe()
                 self.refresh_files_list()
             else:
                 QMessageBox.critical(self, "Erreur", "Impossible de récupérer les informations utilisateur")
@@ -636,112 +828,154 @@ class MainWindow(QMainWindow):
             sys.exit(0)
 
     def refresh_files_list(self):
-        """Rafraîchit la liste des fichiers depuis le serveur FTP"""
-        logger.debug("Rafraîchissement de la liste des fichiers FTP")
-
-        # Vider le cache des statistiques
-        if hasattr(self, '_file_stats_cache'):
-            self._file_stats_cache.clear()
+        """Rafraîchit la liste des fichiers depuis le serveur FTP (en arrière-plan)"""
+        # Un rafraîchissement (ou un téléchargement) est déjà en cours: en relancer un seul à la fin au lieu de les empiler
+        if self._refresh_running or self._downloading_files:
+            logger.debug("Rafraîchissement ou téléchargement en cours, demande regroupée")
+            self._refresh_pending = True
+            return
 
-        # Si le loader initial est visible, le garder au-dessus
-        if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
-            self.initial_loader.raise_()
+        logger.debug("Rafraîchissement de la liste des fichiers FTP")
 
-        # Cacher le tableau, afficher le widget de chargement (uniquement si pas de loader initial)
-        self.files_table.setVisible(False)
-        if not (hasattr(self, 'initial_loader') and self.initial_loader.isVisible()):
-            self.loading_widget.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.loading_text.setText("🔄 Connexion au serveur FTP...")
+        # Récupérer les paramètres FTP depuis la configuration centralisée
+        from app.utils import config
+        ftp_config = config.get_ftp_config()
+        ftp_path = ftp_config.get("path", "/home/mjard_ep43/export-cdes-fournisseurs")
 
-        # Désactiver les boutons d'action pendant le chargement
-        if hasattr(self, 'print_btn'):
-            self.print_btn.setEnabled(False)
-        if hasattr(self, 'export_btn'):
-            self.export_btn.setEnabled(False)
-        if hasattr(self, 'new_archive_btn'):
-            self.new_archive_btn.setEnabled(False)
-        if hasattr(self, 'open_btn'):
-            self.open_btn.setEnabled(False)
-        if hasattr(self, 'web_btn'):
-            self.web_btn.setEnabled(False)
-
-        # Forcer le rafraîchissement de l'interface et permettre au spinner de tourner
-        from PySide6.QtWidgets import QApplication
-        QApplication.processEvents()
+        if not all([ftp_config.get("host"), ftp_config.get("username"), ftp_config.get("password")]):
+            logger.error("Configuration FTP incomplète - Identifiants FTP manquants")
+            QMessageBox.warning(self, "Erreur", "Impossible de rafraîchir la liste FTP:\nConfiguration FTP incomplète - Identifiants FTP manquants")
+            self.statusBar.showMessage("❌ Erreur de connexion FTP")
+            self._finish_initial_load()
+            return
 
-        try:
-            # Récupérer les paramètres FTP depuis la configuration centralisée
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
-            ftp_path = ftp_config.get("path", "/home/mjard_ep43/export-cdes-fournisseurs")
+        snapshot = self._get_dir_snapshot(ftp_config, ftp_path)
 
-            if not all([ftp_host, ftp_user, ftp_pass]):
-                raise ValueError("Configuration FTP incomplète - Identifiants FTP manquants")
+        # Premier affichage: partir du dernier listage connu s'il existe, les différences suivront
+        if not self._files_table_ready:
+            self._paint_from_snapshot()
 
-            self.statusBar.showMessage("🔄 Connexion au serveur FTP...")
-            self.progress_bar.setValue(10)
+        if not self._files_table_ready:
+            # Aucun listage à afficher: loader pendant le chargement complet
             if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
                 self.initial_loader.raise_()
-            QApplication.processEvents()  # Permettre au spinner de tourner
-
-            # Se connecter au FTP
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            fetcher.connect()
+            else:
+                self.files_table.setVisible(False)
+                self.loading_widget.setVisible(True)
+            self.progress_bar.setValue(0)
+            self.loading_text.setText("🔄 Connexion au serveur FTP...")
 
-            self.loading_text.setText("📋 Récupération de la liste des fichiers...")
-            self.progress_bar.setValue(30)
-            if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
-                self.initial_loader.raise_()
-            QApplication.processEvents()  # Permettre au spinner de tourner
-            self.statusBar.showMessage("📋 Récupération de la liste des fichiers...")
+            # Désactiver les boutons d'action pendant le chargement
+            if hasattr(self, 'print_btn'):
+                self.print_btn.setEnabled(False)
+            if hasattr(self, 'export_btn'):
+                self.export_btn.setEnabled(False)
+            if hasattr(self, 'new_archive_btn'):
+                self.new_archive_btn.setEnabled(False)
+            if hasattr(self, 'open_btn'):
+                self.open_btn.setEnabled(False)
+            if hasattr(self, 'web_btn'):
+                self.web_btn.setEnabled(False)
 
-            # Lister les fichiers (exclure le dossier 'old')
-            self.files_data = fetcher.list_files(ftp_path, exclude_dirs=['old'])
+        # Attendre la fin du thread précédent (il a déjà émis son résultat) avant de le remplacer
+        if self._refresh_worker is not None:
+            self._refresh_worker.wait()
+
+        self._refresh_running = True
+        self._refresh_worker = FilesRefreshWorker(ftp_config, snapshot, known_logos=self._logo_cache.keys())
+        self._refresh_worker.progress.connect(self.on_refresh_progress)
+        self._refresh_worker.finished.connect(self.on_refresh_finished)
+        self._refresh_worker.error.connect(self.on_refresh_error)
+        self._refresh_worker.start()
+
+    def on_refresh_progress(self, percent: int, message: str):
+        """Progression du rafraîchissement (thread de rafraîchissement)"""
+        if self._files_table_ready:
+            return  # Rafraîchissement incrémental: ne pas encombrer la barre d'état
+        self.progress_bar.setValue(percent)
+        self.loading_text.setText(message)
+        self.statusBar.showMessage(message)
+
+    def on_refresh_finished(self, result: FilesRefreshResult):
+        """Applique au tableau le résultat du rafraîchissement"""
+        self.files_data = result.files
+
+        if result.suppliers is not None:
+            self._logo_cache.update(result.logos)
+            # Ne reconstruire la grille que si les fournisseurs ont changé
+            if result.suppliers != self.suppliers_data:
+                self.suppliers_data = result.suppliers
+                self.load_suppliers_grid(result.suppliers)
+
+        if self._files_table_ready:
+            if not result.diff.is_empty:
+                self.apply_files_diff(result.diff)
+        else:
+            self.populate_ftp_table(self.files_data)
+            self._files_table_ready = True
 
-            # Déconnexion
-            fetcher.disconnect()
+        self.statusBar.showMessage(f"✅ {len(self.files_data)} fichier(s) non commandé(s) trouvé(s)", 5000)
+        self._end_refresh()
 
-            self.loading_text.setText(f"📊 Analyse de {len(self.files_data)} fichier(s) en cours...")
-            if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
-                self.initial_loader.raise_()
-            QApplication.processEvents()  # Permettre au spinner de tourner
-            self.progress_bar.setValue(60)
-            self.loading_widget.repaint()
-            self.statusBar.showMessage(f"📊 Analyse de {len(self.files_data)} fichier(s) en cours...")
-
-            # Charger les fournisseurs dans la grille
-            self.load_suppliers_grid()
-            self.progress_bar.setValue(80)
-            if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
-                self.initial_loader.raise_()
-            QApplication.processEvents()  # Permettre au spinner de tourner
+    def on_refresh_error(self, message: str):
+        """Échec du rafraîchissement"""
+        if self._files_table_ready:
+            # Le tableau affiché reste valide (dernier listage connu)
+            self.statusBar.showMessage("❌ Erreur de connexion FTP (liste non mise à jour)", 5000)
+        else:
+            QMessageBox.warning(self, "Erreur", f"Impossible de rafraîchir la liste FTP:\n{message}")
+            self.statusBar.showMessage("❌ Erreur de connexion FTP")
+        self._end_refresh()
 
-            # Afficher dans le tableau
-            self.populate_ftp_table(self.files_data)
+    def _end_refresh(self):
+        """Fin d'un rafraîchissement: réafficher le tableau et relancer une demande regroupée"""
+        self.loading_widget.setVisible(False)
+        self.files_table.setVisible(True)
+        self._finish_initial_load()
+
+        self._refresh_running = False
+        if self._refresh_pending:
+            self._refresh_pending = False
+            QTimer.singleShot(0, self.refresh_files_list)
+
+    def _get_dir_snapshot(self, ftp_config: dict, ftp_path: str) -> DirectorySnapshot:
+        """Retourne l'instantané du répertoire FTP (chargé depuis le disque à la première utilisation)"""
+        snapshot = DirectorySnapshot(
+            ftp_config.get("host"), ftp_config.get("port", 22), ftp_config.get("username"), ftp_path
+        )
+        # Nouvel instantané si le répertoire ou le serveur (réglages FTP modifiés) a changé
+        if self.dir_snapshot is None or self.dir_snapshot.snapshot_file != snapshot.snapshot_file:
+            self.dir_snapshot = snapshot
+            self.dir_snapshot.load()
+            self._files_table_ready = False
+        return self.dir_snapshot
+
+    def _paint_from_snapshot(self) -> bool:
+        """Affiche immédiatement le dernier listage connu (session précédente), sans attendre le serveur"""
+        snapshot = self.dir_snapshot
+        if snapshot is None or not snapshot.loaded_from_disk:
+            return False
+
+        self.files_data = snapshot.files()
+        self.populate_ftp_table(self.files_data)
+        self._files_table_ready = True
 
-            self.progress_bar.setValue(100)
-            if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
-                self.initial_loader.raise_()
-            QApplication.processEvents()  # Permettre au spinner de tourner
-            self.statusBar.showMessage(f"✅ {len(self.files_data)} fichier(s) non commandé(s) trouvé(s)", 5000)
+        # Le tableau est prêt: retirer le loader initial sans attendre la réponse du serveur
+        if hasattr(self, 'initial_loader') and self.initial_loader.isVisible():
+            self.initial_loader.hide()
+            self.initial_spinner.timer.stop()
+        self.loading_widget.setVisible(False)
+        self.files_table.setVisible(True)
 
-        except Exception as e:
-            logger.error(f"Erreur lors du rafraîchissement FTP: {e}")
-            QMessageBox.warning(self, "Erreur", f"Impossible de rafraîchir la liste FTP:\n{str(e)}")
-            self.statusBar.showMessage("❌ Erreur de connexion FTP")
+        self.statusBar.showMessage(f"🔄 {len(self.files_data)} fichier(s) (dernier listage connu), mise à jour en cours...")
+        return True
 
-        finally:
-            # Cacher le loader, réafficher le tableau
-            self.loading_widget.setVisible(False)
-            self.files_table.setVisible(True)
+    def load_suppliers_grid(self, suppliers: Optional[list] = None):
+        """Charge les fournisseurs actifs dans la grille
 
-    def load_suppliers_grid(self):
-        """Charge les fournisseurs actifs dans la grille"""
+        Args:
+            suppliers: Fournisseurs déjà chargés, sinon ceux du cache fournisseurs
+        """
         try:
             # Vider la grille
             while self.suppliers_grid.count():
@@ -751,15 +985,13 @@ class MainWindow(QMainWindow):
 
             self.supplier_buttons.clear()
 
-            # Récupérer les fournisseurs actifs depuis la BDD
-            response = supabase_client.client.table('suppliers').select('*').eq('active', True).order('name').execute()
-            suppliers = response.data
+            # Récupérer les fournisseurs actifs (cache en mémoire)
+            if suppliers is None:
+                suppliers = supplier_repository.active()
+                self.suppliers_data = suppliers
 
-            # Calculer le nombre de colonnes en fonction de la largeur disponible
-            # Largeur estimée d'un widget: 140px (logo) + 20px (padding) + 10px (spacing) = 170px
-            panel_width = self.suppliers_grid.parentWidget().width() if self.suppliers_grid.parentWidget() else 800
-            widget_width = 155  # Largeur réduite de 10%: 140px -> 126px + padding
-            max_cols = max(2, panel_width // widget_width)  # Minimum 2 colonnes
+            max_cols = self._suppliers_grid_columns()
+            self._suppliers_grid_cols = max_cols
 
             row = 0
             col = 0
@@ -845,21 +1077,43 @@ class MainWindow(QMainWindow):
                     col = 0
                     row += 1
 
+            # Conserver la mise en évidence du fournisseur sélectionné
+            if self.selected_supplier_filter:
+                self._apply_supplier_button_styles()
+
             logger.info(f"{len(suppliers)} fournisseur(s) actif(s) chargé(s) dans la grille")
 
         except Exception as e:
             logger.error(f"Erreur chargement grille fournisseurs: {e}")
 
+    def _suppliers_grid_columns(self) -> int:
+        """Nombre de colonnes de la grille en fonction de la largeur disponible"""
+        # Largeur estimée d'un widget: 140px (logo) + 20px (padding) + 10px (spacing) = 170px
+        panel_width = self.suppliers_grid.parentWidget().width() if self.suppliers_grid.parentWidget() else 800
+        widget_width = 155  # Largeur réduite de 10%: 140px -> 126px + padding
+        return max(2, panel_width // widget_width)  # Minimum 2 colonnes
+
+    def on_suppliers_repository_changed(self):
+        """Le cache fournisseurs a été rechargé: reconstruire la grille si les fournisseurs actifs ont changé"""
+        suppliers = supplier_repository.active()
+        if suppliers != self.suppliers_data:
+            self.suppliers_data = suppliers
+            self.load_suppliers_grid(suppliers)
+
     def _load_supplier_logo(self, label: QLabel, url: str, size: int):
         """Charge et affiche un logo de fournisseur"""
         try:
-            import requests
+            content = self._logo_cache.get(url)
+            if content is None:
+                import requests
 
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
+                response = requests.get(url, timeout=5)
+                response.raise_for_status()
+                content = response.content
+                self._logo_cache[url] = content
 
             pixmap = QPixmap()
-            pixmap.loadFromData(response.content)
+            pixmap.loadFromData(content)
 
             if not pixmap.isNull():
                 scaled_pixmap = pixmap.scaled(
@@ -878,8 +1132,15 @@ class MainWindow(QMainWindow):
         logger.info(f"Filtre appliqué: {file_filter_slug}")
 
         # Mettre à jour le style des boutons
+        self._apply_supplier_button_styles()
+
+        # Appliquer le filtre au tableau
+        self.apply_filters()
+
+    def _apply_supplier_button_styles(self):
+        """Met en évidence le fournisseur sélectionné et grise les autres"""
         for slug, widget in self.supplier_buttons.items():
-            if slug == file_filter_slug:
+            if slug == self.selected_supplier_filter:
                 # Actif (vert) - uniquement le cadre extérieur
                 widget.setStyleSheet("""
                     QFrame#supplierCard {
@@ -908,9 +1169,6 @@ class MainWindow(QMainWindow):
                     }
                 """)
 
-        # Appliquer le filtre au tableau
-        self.apply_filters()
-
     def clear_supplier_filter(self):
         """Retire le filtre fournisseur"""
         self.selected_supplier_filter = None
@@ -949,182 +1207,158 @@ class MainWindow(QMainWindow):
 
     def populate_ftp_table(self, files: list):
         """Remplit le tableau avec les fichiers FTP"""
-        self.files_table.setRowCount(0)
+        # Filtrer par fournisseur si un filtre est actif (listage courant: lignes de l'index, déjà triées par nom)
+        sorted_by_name = files is self.files_data
+        files = self._filter_files_for_supplier(files)
 
-        # Filtrer par fournisseur si un filtre est actif
-        if self.selected_supplier_filter:
-            # Récupérer les patterns du fournisseur depuis la base de données
-            try:
-                response = supabase_client.client.table('suppliers').select('file_patterns').eq('file_filter_slug', self.selected_supplier_filter).execute()
-                if response.data and len(response.data) > 0:
-                    patterns = response.data[0].get('file_patterns', [])
-
-                    if patterns:
-                        # Filtrer les fichiers selon les patterns
-                        import fnmatch
-                        filtered_files = []
-                        for file_info in files:
-                            filename = file_info.get('filename', '')
-                            # Vérifier si le fichier correspond à au moins un pattern
-                            for pattern in patterns:
-                                if fnmatch.fnmatch(filename, pattern):
-                                    filtered_files.append(file_info)
-                                    break  # Pas besoin de vérifier les autres patterns
-
-                        files = filtered_files
-                        logger.debug(f"{len(files)} fichier(s) après filtrage par patterns {patterns}")
-                    else:
-                        # Pas de patterns configurés, utiliser le slug comme fallback
-                        files = [f for f in files if f.get('filename', '').startswith(self.selected_supplier_filter)]
-                        logger.debug(f"{len(files)} fichier(s) après filtrage par slug '{self.selected_supplier_filter}'")
-                else:
-                    logger.warning(f"Fournisseur '{self.selected_supplier_filter}' introuvable")
-                    files = []
-            except Exception as e:
-                logger.error(f"Erreur lors de la récupération des patterns: {e}")
+        # Toutes les lignes sont cochées si un filtre est actif
+        self.files_model.set_files([self._with_full_path(f) for f in files],
+                                   checked=bool(self.selected_supplier_filter),
+                                   sorted_by_name=sorted_by_name)
+
+        # Si un filtre fournisseur est actif et qu'il y a des fichiers, sélectionner automatiquement le premier
+        if self.selected_supplier_filter and self.files_model.rowCount() > 0:
+            logger.debug(f"Sélection automatique de la ligne 0 (total: {self.files_model.rowCount()} lignes)")
+            self.files_table.selectRow(0)
+
+        # Mettre à jour les statistiques
+        self.schedule_file_statistics()
+
+    def apply_files_diff(self, diff: SnapshotDiff):
+        """Met à jour le tableau en place (lignes ajoutées, supprimées, modifiées) sans le reconstruire"""
+        self.files_model.apply_diff(
+            added=[self._with_full_path(f) for f in self._filter_files_for_supplier(diff.added)],
+            removed=diff.removed,
+            modified=diff.modified,
+            check_added=bool(self.selected_supplier_filter)
+        )
+        logger.debug(f"Tableau mis à jour en place: {diff}")
+        self.schedule_file_statistics()
+
+    def _filter_files_for_supplier(self, files: list) -> list:
+        """Retourne les fichiers correspondant au fournisseur sélectionné (tous si aucun filtre)
+
+        Pour le listage courant, le résultat vient de l'index en colonnes, trié par nom.
+        """
+        if files is not self.files_data and not self.selected_supplier_filter:
+            return files
+
+        try:
+            if files is self.files_data:
+                files = self._get_file_index().select(supplier=self.selected_supplier_filter)
+            else:
+                files = supplier_repository.classifier().classify_all(files).get(self.selected_supplier_filter, [])
+            if self.selected_supplier_filter:
+                logger.debug(f"{len(files)} fichier(s) pour le fournisseur '{self.selected_supplier_filter}'")
+        except Exception as e:
+            logger.error(f"Erreur lors du classement des fichiers par fournisseur: {e}")
+            if self.selected_supplier_filter:
                 # Fallback sur le slug
                 files = [f for f in files if f.get('filename', '').startswith(self.selected_supplier_filter)]
                 logger.debug(f"{len(files)} fichier(s) après filtrage par slug '{self.selected_supplier_filter}' (fallback)")
+            files = sorted(files, key=lambda f: f.get('filename', '').lower())
+
+        return files
 
-        # Trier les fichiers par ordre alphabétique selon le nom
-        files_sorted = sorted(files, key=lambda f: f.get('filename', '').lower())
+    def _get_file_index(self) -> FileIndex:
+        """Index en colonnes du listage courant
 
+        Construit (et classé par fournisseur) une fois tant que ni le listage ni les fournisseurs
+        ne changent: changer de filtre ne fait que combiner des masques sur l'index.
+        """
+        classifier = supplier_repository.classifier()
+        source = getattr(self, '_file_index_source', None)
+        if source is None or source[0] is not self.files_data or source[1] is not classifier:
+            self._file_index = FileIndex(self.files_data, classifier)
+            self._file_index_source = (self.files_data, classifier)
+        return self._file_index
+
+    @staticmethod
+    def _with_full_path(file_info: dict) -> dict:
+        """Copie d'un fichier listé avec son chemin complet sur le serveur"""
         # Récupérer le chemin FTP de base
         ftp_path = os.getenv("FTP_REMOTE_PATH", "/home/mjard_ep43/export-cdes-fournisseurs")
+        full_path = f"{ftp_path}/{file_info.get('filename', '')}".replace('//', '/')
+        return {**file_info, 'full_path': full_path}
 
-        for file_info in files_sorted:
-            row = self.files_table.rowCount()
-            self.files_table.insertRow(row)
+    def get_checked_files(self):
+        """Retourne la liste des fichiers cochés dans le tableau"""
+        return [
+            {'filename': f['filename'], 'full_path': f['full_path']}
+            for f in self.files_model.checked_files()
+        ]
 
-            # Colonne 0: Nom du fichier (avec padding)
-            filename = file_info.get('filename', '')
-            filename_item = QTableWidgetItem(f"  {filename}")  # Padding à gauche
-            self.files_table.setItem(row, 0, filename_item)
+    def _fetch_remote_files(self, files: list) -> dict:
+        """
+        Récupère des copies locales des fichiers FTP (cache disque, sinon téléchargement parallèle)
 
-            # Colonne 1: Date
-            modified = file_info.get('modified')
-            if modified:
-                date_str = modified.strftime("%d/%m/%Y")
-            else:
-                date_str = "-"
-            date_item = QTableWidgetItem(date_str)
-            date_item.setTextAlignment(Qt.AlignCenter)
-            self.files_table.setItem(row, 1, date_item)
-
-            # Colonne 2: Chemin complet (caché)
-            full_path = f"{ftp_path}/{filename}".replace('//', '/')
-            self.files_table.setItem(row, 2, QTableWidgetItem(full_path))
-
-            # Colonne 3: Checkbox (dernière colonne)
-            checkbox_widget = QWidget()
-            checkbox_layout = QHBoxLayout(checkbox_widget)
-            checkbox = QCheckBox()
-            is_checked = bool(self.selected_supplier_filter)
-            checkbox.setChecked(is_checked)  # Coché si filtre actif
-            checkbox.setProperty('row', row)  # Stocker le numéro de ligne dans la checkbox
-            checkbox.stateChanged.connect(self.on_checkbox_changed)  # Mettre à jour les stats et le background
-            checkbox_layout.addWidget(checkbox)
-            checkbox_layout.setAlignment(Qt.AlignCenter)
-            checkbox_layout.setContentsMargins(0, 0, 0, 0)
-            self.files_table.setCellWidget(row, 3, checkbox_widget)
+        Args:
+            files: Liste de dicts contenant au moins 'full_path'
 
-        # Si un filtre fournisseur est actif et qu'il y a des fichiers, sélectionner automatiquement le premier
-        if self.selected_supplier_filter and self.files_table.rowCount() > 0:
-            logger.debug(f"Sélection automatique de la ligne 0 (total: {self.files_table.rowCount()} lignes)")
-            self.files_table.selectRow(0)
-            # Le signal itemSelectionChanged déclenchera automatiquement on_file_selected()
-            # Forcer l'appel manuel au cas où le signal ne se déclenche pas
-            from PySide6.QtCore import QTimer
-            QTimer.singleShot(100, self.on_file_selected)
+        Returns:
+            Dict {chemin distant: chemin local} des fichiers disponibles
+        """
+        from app.utils import config
+
+        # Taille et date de modification (clé du cache) connues depuis le dernier listage
+        files_by_name = {f.get('filename'): f for f in self.files_data}
+        requests = []
+        for file_info in files:
+            listed = files_by_name.get(Path(file_info['full_path']).name, {})
+            requests.append({
+                'remote_file': file_info['full_path'],
+                'size': file_info.get('size', listed.get('size')),
+                'modified': file_info.get('modified', listed.get('modified'))
+            })
+
+        worker = FilesDownloadWorker(config.get_ftp_config(), requests)
+        worker.progress.connect(self.on_download_progress)
+
+        # L'interface reste réactive pendant le téléchargement: les actions qui relisent
+        # ou modifient les fichiers (et le rafraîchissement) sont suspendues jusqu'à la fin
+        loop = QEventLoop()
+        worker.finished.connect(loop.quit)
+        self._set_downloading_files(True)
+        try:
+            self.on_download_progress(0, len(requests), 0)
+            worker.start()
+            loop.exec()
+            worker.wait()
+        finally:
+            self._set_downloading_files(False)
 
-        # Appliquer le background à toutes les lignes cochées avec un délai
-        # pour laisser Qt finir ses opérations de style de sélection
-        if self.selected_supplier_filter:
-            from PySide6.QtCore import QTimer
-            QTimer.singleShot(50, lambda: self.apply_all_backgrounds())
+        self.statusBar.clearMessage()
+        return {remote_file: str(local_path) for remote_file, local_path in worker.results.items()}
 
-        # Mettre à jour les statistiques
-        self.update_file_statistics()
-
-    def apply_all_backgrounds(self):
-        """Applique le background à toutes les lignes cochées"""
-        for row in range(self.files_table.rowCount()):
-            checkbox_widget = self.files_table.cellWidget(row, 3)
-            if checkbox_widget:
-                checkbox = checkbox_widget.findChild(QCheckBox)
-                if checkbox and checkbox.isChecked():
-                    self.set_row_background(row, True)
-
-    def set_row_background(self, row: int, checked: bool):
-        """Applique ou retire le background vert sur une ligne en fonction de l'état de la checkbox"""
-        from PySide6.QtGui import QBrush, QColor
-
-        logger.debug(f"set_row_background: row={row}, checked={checked}")
-
-        # Déterminer la couleur de fond
-        if checked:
-            bg_color = QColor("#9df589")  # Vert
-            logger.debug(f"  -> Application du fond VERT sur ligne {row}")
-        else:
-            bg_color = QColor(Qt.white)  # Blanc par défaut de Qt
-            logger.debug(f"  -> Application du fond BLANC sur ligne {row}")
-
-        # Appliquer le background à toutes les colonnes de la ligne
-        for col in range(self.files_table.columnCount()):
-            if not self.files_table.isColumnHidden(col):
-                item = self.files_table.item(row, col)
-                if item:
-                    # Appliquer le background avec setData pour forcer
-                    brush = QBrush(bg_color)
-                    item.setBackground(brush)
-                    item.setData(Qt.BackgroundRole, brush)
-
-                # Pour les widgets (comme la checkbox en colonne 3)
-                widget = self.files_table.cellWidget(row, col)
-                if widget:
-                    # Appliquer le stylesheet
-                    if checked:
-                        widget.setStyleSheet("QWidget { background-color: #9df589; }")
-                    else:
-                        widget.setStyleSheet("")  # Retirer le style
-
-        # Forcer un rafraîchissement immédiat et complet
-        self.files_table.viewport().update()
-        self.files_table.repaint()
-
-        logger.debug(f"  -> Rafraîchissement forcé pour ligne {row}")
-
-    def on_checkbox_changed(self, state):
-        """Appelé quand l'état d'une checkbox change"""
-        # Récupérer la checkbox qui a émis le signal
-        checkbox = self.sender()
-        if checkbox:
-            # Récupérer le numéro de ligne stocké dans la propriété
-            row = checkbox.property('row')
-            if row is not None:
-                # Mettre à jour le background de la ligne
-                # Utiliser bool(state) car state est un int: 0=unchecked, 2=checked
-                is_checked = bool(state)
-                logger.debug(f"on_checkbox_changed: row={row}, state={state}, is_checked={is_checked}")
-                self.set_row_background(row, is_checked)
+    def on_download_progress(self, files_done: int, files_total: int, bytes_done: int):
+        """Progression du téléchargement (thread de téléchargement)"""
+        self.statusBar.showMessage(
+            f"📥 Téléchargement: {files_done}/{files_total} fichier(s), "
+            f"{bytes_done / 1024:,.0f} Ko".replace(',', ' ')
+        )
 
-        # Mettre à jour les statistiques
-        self.update_file_statistics()
+    def _set_downloading_files(self, downloading: bool):
+        """Suspend (ou rétablit) les actions sur les fichiers et le rafraîchissement pendant un téléchargement"""
+        self._downloading_files = downloading
+        self.refresh_action.setEnabled(not downloading)
 
-    def get_checked_files(self):
-        """Retourne la liste des fichiers cochés dans le tableau"""
-        checked_files = []
-        for row in range(self.files_table.rowCount()):
-            # Récupérer le widget checkbox de la dernière colonne (colonne 3)
-            checkbox_widget = self.files_table.cellWidget(row, 3)
-            if checkbox_widget:
-                checkbox = checkbox_widget.findChild(QCheckBox)
-                if checkbox and checkbox.isChecked():
-                    # Récupérer les informations du fichier
-                    filename = self.files_table.item(row, 0).text().strip()  # Colonne 0: Nom (strip pour enlever le padding)
-                    full_path = self.files_table.item(row, 2).text()  # Colonne 2: Chemin complet
-                    checked_files.append({'filename': filename, 'full_path': full_path})
-        return checked_files
+        if downloading:
+            self._refresh_timer_was_active = self.refresh_timer.isActive()
+            self.refresh_timer.stop()
+            for button in (self.print_btn, self.export_btn, self.new_archive_btn, self.open_btn, self.web_btn):
+                button.setEnabled(False)
+        else:
+            if self._refresh_timer_was_active:
+                self.refresh_timer.start()
+            if self._refresh_pending and not self._refresh_running:
+                self._refresh_pending = False
+                QTimer.singleShot(0, self.refresh_files_list)
+            # Boutons rétablis selon la sélection courante (elle a pu changer entre-temps)
+            self.on_file_selected()
+
+    def schedule_file_statistics(self):
+        """Demande une mise à jour des statistiques (regroupée avec les demandes des 200 ms suivantes)"""
+        self.stats_timer.start()
 
     def update_file_statistics(self):
         """Met à jour les statistiques affichées (nb lignes et montant total) - uniquement pour les fichiers cochés"""
@@ -1137,107 +1371,94 @@ class MainWindow(QMainWindow):
             self.stats_total_amount.setText("Montant total : 0.00 €")
             return
 
-        # Initialiser le cache si nécessaire
-        if not hasattr(self, '_file_stats_cache'):
-            self._file_stats_cache = {}
-
-        total_lines = 0
-        total_amount = 0.0
+        total_lines, total_amount, missing = self._sum_checked_statistics(checked_files)
+        self._show_statistics(total_lines, total_amount, pending=bool(missing))
 
-        # Connexion FTP pour télécharger et analyser les fichiers
-        try:
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
+        # Tout est déjà analysé: aucun accès réseau
+        if not missing:
+            return
 
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            if not fetcher.connect():
-                logger.error("Impossible de se connecter au FTP pour calculer les statistiques")
-                self.stats_total_lines.setText("Nombre total de lignes : Erreur connexion FTP")
-                self.stats_total_amount.setText("Montant total : Erreur connexion FTP")
-                return
-        except Exception as e:
-            logger.error(f"Erreur connexion FTP pour statistiques: {e}")
-            self.stats_total_lines.setText("Nombre total de lignes : Erreur")
-            self.stats_total_amount.setText("Montant total : Erreur")
+        # Un calcul est déjà en cours: relancer à la fin uniquement pour les fichiers restants
+        if self._stats_running:
+            self._stats_pending = True
             return
 
-        # Analyser chaque fichier coché
-        for file_info in checked_files:
-            filename = file_info['filename']
-            full_path = file_info['full_path']
-
-            # Vérifier le cache
-            if filename in self._file_stats_cache:
-                cached_stats = self._file_stats_cache[filename]
-                total_lines += cached_stats['lines']
-                total_amount += cached_stats['amount']
-                logger.debug(f"Utilisation du cache pour {filename}: {cached_stats['lines']} lignes, {cached_stats['amount']:.2f} €")
-                continue
+        from app.utils import config
 
-            # Télécharger et analyser le fichier
-            tmp_path = None
-            try:
-                with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.csv') as tmp_file:
-                    tmp_path = tmp_file.name
+        if self._stats_worker is not None:
+            self._stats_worker.wait()
 
-                # Télécharger le fichier
-                fetcher.download_file(full_path, tmp_path)
+        self._stats_running = True
+        self._stats_worker = FileStatsWorker(config.get_ftp_config(), missing)
+        self._stats_worker.file_done.connect(self.on_stats_file_done)
+        self._stats_worker.finished.connect(self.on_stats_finished)
+        self._stats_worker.start()
 
-                # Analyser avec pandas
-                df = None
-                for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-                    try:
-                        df = pd.read_csv(tmp_path, encoding=encoding, sep=';', on_bad_lines='skip', header=None)
-                        break
-                    except UnicodeDecodeError:
-                        continue
+    def on_stats_file_done(self, remote_file: str):
+        """Un fichier vient d'être analysé: mise à jour incrémentale des totaux"""
+        total_lines, total_amount, missing = self._sum_checked_statistics(self.get_checked_files())
+        self._show_statistics(total_lines, total_amount, pending=bool(missing))
 
-                if df is None:
-                    logger.error(f"Impossible de décoder {filename}")
-                    continue
+    def on_stats_finished(self):
+        """Fin du calcul en arrière-plan"""
+        self._stats_running = False
 
-                # Compter les lignes
-                line_count = len(df)
-                total_lines += line_count
-
-                # Calculer la somme de la colonne D (index 3)
-                file_amount = 0.0
-                if len(df.columns) >= 4:
-                    column_d = df.iloc[:, 3]
-                    column_d_numeric = pd.to_numeric(column_d, errors='coerce')
-                    file_amount = column_d_numeric.sum()
-                    total_amount += file_amount
-
-                # Mettre en cache
-                self._file_stats_cache[filename] = {
-                    'lines': line_count,
-                    'amount': file_amount
-                }
-                logger.debug(f"Analyse de {filename}: {line_count} lignes, {file_amount:.2f} € (mis en cache)")
+        if self._stats_pending:
+            self._stats_pending = False
+            self.update_file_statistics()
+            return
 
-            except Exception as e:
-                logger.error(f"Erreur analyse {filename}: {e}")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.unlink(tmp_path)
-                    except:
-                        pass
+        total_lines, total_amount, missing = self._sum_checked_statistics(self.get_checked_files())
+        self._show_statistics(total_lines, total_amount)
+        if missing:
+            logger.warning(f"{len(missing)} fichier(s) exclu(s) des statistiques (indisponibles)")
+
+    def _sum_checked_statistics(self, checked_files: list):
+        """
+        Additionne les statistiques déjà connues des fichiers cochés
+
+        Returns:
+            (nb lignes, montant, fichiers restant à analyser au format FTPFetcher.fetch_cached)
+        """
+        # Statistiques mémorisées par (chemin, taille, date): elles restent valables d'un rafraîchissement
+        # à l'autre tant que le fichier n'a pas changé sur le serveur
+        files_by_name = {f.get('filename'): f for f in self.files_data}
+        total_lines = 0
+        total_amount = 0.0
+        missing = []
+
+        for file_info in checked_files:
+            listed = files_by_name.get(file_info['filename'], {})
+            stats = csv_stats.get(file_info['full_path'], listed.get('size'), listed.get('modified'))
+            if stats is not None:
+                total_lines += stats.lines
+                total_amount += stats.amount
+            else:
+                missing.append({
+                    'remote_file': file_info['full_path'],
+                    'size': listed.get('size'),
+                    'modified': listed.get('modified')
+                })
 
-        # Déconnexion FTP
-        fetcher.disconnect()
+        return total_lines, total_amount, missing
 
-        # Mettre à jour les labels
-        self.stats_total_lines.setText(f"Nombre total de lignes : {total_lines:,}".replace(',', ' '))
-        self.stats_total_amount.setText(f"Montant total : {total_amount:,.2f} €".replace(',', ' '))
+    def _show_statistics(self, total_lines: int, total_amount: float, pending: bool = False):
+        """Met à jour les labels (⏳ tant que des fichiers sont en cours d'analyse)"""
+        suffix = " ⏳" if pending else ""
+        self.stats_total_lines.setText(f"Nombre total de lignes : {total_lines:,}".replace(',', ' ') + suffix)
+        self.stats_total_amount.setText(f"Montant total : {total_amount:,.2f} €".replace(',', ' ') + suffix)
 
     def extract_supplier_from_filename(self, filename: str) -> str:
         """Extrait le nom du fournisseur depuis le nom du fichier"""
-        # Format attendu: Fournisseur-DD-MM-YY.csv
+        # Fournisseur dont un pattern correspond au fichier
+        try:
+            supplier = supplier_repository.find_by_filename(filename)
+            if supplier:
+                return supplier.get('name', '')
+        except Exception as e:
+            logger.debug(f"Classement par patterns impossible pour {filename}: {e}")
+
+        # Sinon, format attendu: Fournisseur-DD-MM-YY.csv
         try:
             # Enlever l'extension
             name_without_ext = filename.rsplit('.', 1)[0]
@@ -1250,7 +1471,9 @@ class MainWindow(QMainWindow):
     @Slot()
     def on_file_selected(self):
         """Gère la sélection d'un fichier FTP"""
-        selected_rows = self.files_table.selectedItems()
+        if self._downloading_files:
+            return  # Boutons rétablis à la fin du téléchargement
+        selected_rows = self.files_table.selectionModel().selectedRows()
         if not selected_rows:
             logger.debug("Aucun fichier sélectionné - désactivation des boutons")
             self.selected_file_id = None
@@ -1266,9 +1489,8 @@ class MainWindow(QMainWindow):
                 self.web_btn.setEnabled(False)
             return
 
-        # Récupérer le chemin du fichier sélectionné (colonne 2 - chemin complet caché)
-        row = selected_rows[0].row()
-        self.selected_file_id = self.files_table.item(row, 2).text()
+        # Récupérer le chemin du fichier sélectionné
+        self.selected_file_id = self.files_model.file_at(selected_rows[0].row())['full_path']
         logger.debug(f"Fichier sélectionné: {self.selected_file_id} - activation des boutons")
 
         # Activer tous les boutons quand un fichier est sélectionné
@@ -1303,21 +1525,14 @@ class MainWindow(QMainWindow):
 
             self.statusBar.showMessage("Téléchargement en cours...")
 
-            # Connexion FTP
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
-
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            fetcher.connect()
-
-            # Télécharger le fichier
-            fetcher.download_file(self.selected_file_id, save_path)
+            # Récupérer le fichier (cache local ou téléchargement) puis le copier
+            local_files = self._fetch_remote_files([{'full_path': self.selected_file_id}])
+            local_path = local_files.get(self.selected_file_id)
+            if not local_path:
+                raise IOError(f"Téléchargement impossible: {self.selected_file_id}")
 
-            fetcher.disconnect()
+            import shutil
+            shutil.copyfile(local_path, save_path)
 
             self.statusBar.showMessage(f"✅ Fichier téléchargé: {save_path}", 5000)
             QMessageBox.information(self, "Succès", f"Fichier téléchargé:\n{save_path}")
@@ -1457,8 +1672,8 @@ class MainWindow(QMainWindow):
         """Appelé quand les fournisseurs sont modifiés"""
         logger.info("Liste fournisseurs mise à jour")
         self.statusBar.showMessage("Liste fournisseurs mise à jour", 3000)
-        # Recharger la grille des fournisseurs
-        self.load_suppliers_grid()
+        # Recharger le cache fournisseurs (la grille est reconstruite si la liste a changé)
+        supplier_repository.load()
 
     def archive_file(self):
         """Archive les fichiers cochés vers le dossier 'old' sur le serveur FTP"""
@@ -1504,6 +1719,7 @@ class MainWindow(QMainWindow):
             # Archiver chaque fichier coché
             success_count = 0
             failed_files = []
+            archived_files = []
 
             for file_info in checked_files:
                 filename = file_info['filename']
@@ -1515,6 +1731,7 @@ class MainWindow(QMainWindow):
                     # Déplacer vers old/
                     if fetcher.move_to_archive(full_path, "old"):
                         success_count += 1
+                        archived_files.append(filename)
                         logger.info(f"✓ Fichier archivé sur FTP: {filename}")
                     else:
                         failed_files.append(filename)
@@ -1527,6 +1744,14 @@ class MainWindow(QMainWindow):
 
             fetcher.disconnect()
 
+            # Retirer les fichiers archivés de l'instantané et du tableau sans attendre le prochain listage
+            # (pendant un rafraîchissement, l'instantané appartient au thread: le listage suivant s'en charge)
+            if archived_files and self.dir_snapshot is not None and not self._refresh_running:
+                diff = self.dir_snapshot.remove(archived_files)
+                if not diff.is_empty:
+                    self.files_data = self.dir_snapshot.files()
+                    self.apply_files_diff(diff)
+
             # Afficher le résultat
             if success_count == len(checked_files):
                 self.statusBar.showMessage(f"✅ {success_count} fichier(s) archivé(s) avec succès", 5000)
@@ -1571,11 +1796,10 @@ class MainWindow(QMainWindow):
 
         try:
             # Récupérer les fichiers filtrés affichés dans le tableau
-            filtered_files = []
-            for row in range(self.files_table.rowCount()):
-                filename = self.files_table.item(row, 0).text()
-                full_path = self.files_table.item(row, 2).text()  # Colonne 2 = chemin complet
-                filtered_files.append({'filename': filename, 'full_path': full_path})
+            filtered_files = [
+                {'filename': f['filename'], 'full_path': f['full_path']}
+                for f in self.files_model.files()
+            ]
 
             if not filtered_files:
                 QMessageBox.warning(self, "Attention", "Aucun fichier à imprimer")
@@ -1584,12 +1808,11 @@ class MainWindow(QMainWindow):
             logger.info(f"Impression de {len(filtered_files)} fichier(s) pour {self.selected_supplier_filter}")
 
             # Récupérer la configuration d'impression du fournisseur
-            response = supabase_client.client.table('suppliers').select('*').eq('file_filter_slug', self.selected_supplier_filter).execute()
-            if not response.data:
+            supplier_data = supplier_repository.get_by_slug(self.selected_supplier_filter)
+            if not supplier_data:
                 QMessageBox.warning(self, "Erreur", "Impossible de trouver les paramètres du fournisseur")
                 return
 
-            supplier_data = response.data[0]
             print_config = supplier_data.get('print_config', {})
 
             # Extraire les paramètres
@@ -1608,82 +1831,26 @@ class MainWindow(QMainWindow):
             paper_format = print_config.get('paper_format', 'A4')
 
             logger.info(f"Configuration d'impression: colonnes={columns_to_remove}, préfixes={prefixes_to_remove}, date={add_date}, split={split_files}, format={paper_format}")
+            cleanup_plan = plan_cache.cleanup(self.selected_supplier_filter, 'print', print_config)
 
-            # Connexion FTP pour télécharger les fichiers
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
-
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            fetcher.connect()
-
-            # Télécharger tous les fichiers CSV et les garder séparés
+            # Récupérer tous les fichiers CSV (cache local ou téléchargement parallèle)
+            downloaded = self._fetch_remote_files(filtered_files)
             all_dataframes = []
-            temp_files = []
-
-            import tempfile
 
             for file_info in filtered_files:
                 full_path = file_info['full_path']
                 filename = file_info['filename']
 
-                # Créer un fichier temporaire
-                tmp_fd, tmp_path = tempfile.mkstemp(suffix='.csv', prefix='print_')
-                os.close(tmp_fd)
-                temp_files.append(tmp_path)
-
-                # Télécharger le fichier
-                success = fetcher.download_file(full_path, tmp_path)
-                if not success:
+                tmp_path = downloaded.get(full_path)
+                if not tmp_path:
                     logger.error(f"Échec du téléchargement de {filename}")
                     continue
 
                 # Lire le CSV SANS en-tête (tous les fichiers ont le même format, aucun n'a d'en-tête)
-                try:
-                    df = pd.read_csv(tmp_path, sep=';', encoding='utf-8', dtype=str, header=None)
-                except:
-                    try:
-                        df = pd.read_csv(tmp_path, sep=',', encoding='utf-8', dtype=str, header=None)
-                    except:
-                        df = pd.read_csv(tmp_path, sep=';', encoding='latin-1', dtype=str, header=None)
-
-                # Mapper les clés de colonnes vers les indices (position dans le CSV sans en-tête)
-                column_index_mapping = {
-                    'ref': 0, 'qty': 1, 'designation': 2, 'price': 3,
-                    'client': 4, 'ean13': 5, 'order': 6
-                }
+                df = csv_sniffer.read_csv(tmp_path, supplier_key=self.selected_supplier_filter, dtype=str, header=None)
 
-                # Identifier les colonnes à supprimer par leur indice
-                columns_to_drop_for_file = []
-                for col_key in columns_to_remove:
-                    if col_key in column_index_mapping:
-                        col_idx = column_index_mapping[col_key]
-                        if col_idx < len(df.columns):
-                            columns_to_drop_for_file.append(col_idx)
-
-                # Supprimer les colonnes configurées pour ce fichier
-                if columns_to_drop_for_file:
-                    columns_to_drop_for_file.sort(reverse=True)
-                    for col_idx in columns_to_drop_for_file:
-                        df = df.drop(columns=[col_idx])
-
-                # Supprimer les préfixes pour ce fichier (tous les préfixes configurés)
-                if prefixes_to_remove and len(df.columns) > 0:
-                    first_col = df.columns[0]
-                    def remove_prefixes(value):
-                        """Supprime le premier préfixe trouvé au début de la valeur"""
-                        if not value:
-                            return value
-                        value_str = str(value)
-                        for prefix in prefixes_to_remove:
-                            if value_str.startswith(prefix):
-                                return value_str[len(prefix):]  # Supprimer le préfixe
-                        return value_str
-
-                    df[first_col] = df[first_col].apply(remove_prefixes)
+                # Supprimer les colonnes et préfixes configurés (plan compilé du fournisseur)
+                df = cleanup_plan.apply(df)
 
                 # Trier ce fichier individuellement SEULEMENT si split_files est activé
                 # (sinon le tri global sera appliqué après la fusion)
@@ -1695,8 +1862,6 @@ class MainWindow(QMainWindow):
                 all_dataframes.append(df)
                 logger.info(f"Fichier {filename} traité: {len(df)} lignes, {len(df.columns)} colonnes")
 
-            fetcher.disconnect()
-
             # Fusionner tous les DataFrames
             if not all_dataframes:
                 QMessageBox.warning(self, "Erreur", "Aucune donnée à imprimer")
@@ -1837,13 +2002,6 @@ class MainWindow(QMainWindow):
 
             doc.build(elements)
 
-            # Nettoyer les fichiers temporaires
-            for tmp_file in temp_files:
-                try:
-                    os.unlink(tmp_file)
-                except:
-                    pass
-
             logger.info(f"PDF créé: {output_path}")
 
             # Ouvrir avec l'aperçu avant impression Windows
@@ -1882,19 +2040,17 @@ class MainWindow(QMainWindow):
             logger.info(f"Export de {len(filtered_files)} fichier(s) pour {self.selected_supplier_filter}")
 
             # Récupérer la configuration Import du fournisseur
-            response = supabase_client.client.table('suppliers').select('*').eq('file_filter_slug', self.selected_supplier_filter).execute()
-            if not response.data:
+            supplier_data = supplier_repository.get_by_slug(self.selected_supplier_filter)
+            if not supplier_data:
                 QMessageBox.warning(self, "Erreur", "Impossible de trouver les paramètres du fournisseur")
                 return
 
-            supplier_data = response.data[0]
             supplier_name = supplier_data.get('name', self.selected_supplier_filter)
             import_config = supplier_data.get('import_config', {})
 
             # Extraire les paramètres d'import
             output_format = import_config.get('output_format', 'xlsx')
             has_header = import_config.get('has_header', False)
-            leading_zeros = import_config.get('leading_zeros', False)
             add_output_header = import_config.get('add_output_header', False)
             header_type = import_config.get('header_type', 'Texte fixe')
             header_content = import_config.get('header_content', '')
@@ -1907,71 +2063,28 @@ class MainWindow(QMainWindow):
             logger.info(f"Configuration d'import: format={output_format}, colonnes={columns_to_remove}, préfixes={prefixes_to_remove}")
             logger.info(f"En-tête: add_output_header={add_output_header}, header_type={header_type}, header_content='{header_content}'")
 
-            # Connexion FTP pour télécharger les fichiers
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
-
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            fetcher.connect()
-
-            # Télécharger tous les fichiers CSV et les garder séparés
+            # Récupérer tous les fichiers CSV (cache local ou téléchargement parallèle)
+            downloaded = self._fetch_remote_files(filtered_files)
             all_dataframes = []
-            temp_files = []
-
-            import tempfile
 
             for file_info in filtered_files:
                 full_path = file_info['full_path']
                 filename = file_info['filename']
 
-                # Créer un fichier temporaire
-                tmp_fd, tmp_path = tempfile.mkstemp(suffix='.csv', prefix='export_')
-                os.close(tmp_fd)
-                temp_files.append(tmp_path)
-
-                # Télécharger le fichier
-                success = fetcher.download_file(full_path, tmp_path)
-                if not success:
+                tmp_path = downloaded.get(full_path)
+                if not tmp_path:
                     logger.error(f"Échec du téléchargement de {filename}")
                     continue
 
                 # Lire le CSV avec ou sans en-tête selon la configuration
-                try:
-                    if has_header:
-                        df = pd.read_csv(tmp_path, sep=';', encoding='utf-8', dtype=str)
-                    else:
-                        df = pd.read_csv(tmp_path, sep=';', encoding='utf-8', dtype=str, header=None)
-                    logger.debug(f"CSV lu avec sep=';' - {len(df.columns)} colonnes, {len(df)} lignes")
-                except:
-                    try:
-                        if has_header:
-                            df = pd.read_csv(tmp_path, sep=',', encoding='utf-8', dtype=str)
-                        else:
-                            df = pd.read_csv(tmp_path, sep=',', encoding='utf-8', dtype=str, header=None)
-                        logger.debug(f"CSV lu avec sep=',' - {len(df.columns)} colonnes, {len(df)} lignes")
-                    except:
-                        if has_header:
-                            df = pd.read_csv(tmp_path, sep=';', encoding='latin-1', dtype=str)
-                        else:
-                            df = pd.read_csv(tmp_path, sep=';', encoding='latin-1', dtype=str, header=None)
-                        logger.debug(f"CSV lu avec sep=';' latin-1 - {len(df.columns)} colonnes, {len(df)} lignes")
+                df = csv_sniffer.read_csv(
+                    tmp_path, supplier_key=self.selected_supplier_filter,
+                    dtype=str, header=0 if has_header else None
+                )
+                logger.debug(f"CSV lu - {len(df.columns)} colonnes, {len(df)} lignes")
 
                 all_dataframes.append(df)
 
-            # Fermer la connexion FTP
-            fetcher.disconnect()
-
-            # Nettoyer les fichiers temporaires
-            for tmp_file in temp_files:
-                try:
-                    os.remove(tmp_file)
-                except:
-                    pass
-
             # Fusionner tous les DataFrames
             if not all_dataframes:
                 QMessageBox.warning(self, "Attention", "Aucune donnée à exporter")
@@ -1980,71 +2093,10 @@ class MainWindow(QMainWindow):
             merged_df = pd.concat(all_dataframes, ignore_index=True)
             logger.info(f"Fusion terminée: {len(merged_df)} lignes au total")
 
-            # Appliquer les transformations selon la configuration d'import
-            # Mapper les clés de colonnes vers les indices (si pas d'en-tête)
-            if not has_header:
-                column_index_mapping = {
-                    'ref': 0, 'qty': 1, 'designation': 2, 'price': 3,
-                    'client': 4, 'ean13': 5, 'order': 6
-                }
-
-                # Identifier les colonnes à supprimer par leur indice
-                columns_to_drop = []
-                for col_key in columns_to_remove:
-                    if col_key in column_index_mapping:
-                        col_idx = column_index_mapping[col_key]
-                        if col_idx < len(merged_df.columns):
-                            columns_to_drop.append(col_idx)
-
-                # Supprimer les colonnes configurées
-                if columns_to_drop:
-                    columns_to_drop.sort(reverse=True)
-                    for col_idx in columns_to_drop:
-                        merged_df = merged_df.drop(columns=[col_idx])
-
-                # Supprimer les préfixes de la première colonne
-                if prefixes_to_remove and len(merged_df.columns) > 0:
-                    first_col = merged_df.columns[0]
-                    def remove_prefixes(value):
-                        """Supprime le premier préfixe trouvé au début de la valeur"""
-                        if pd.isna(value):
-                            return value
-                        value_str = str(value)
-                        for prefix in prefixes_to_remove:
-                            if value_str.startswith(prefix):
-                                return value_str[len(prefix):]
-                        return value_str
-
-                    merged_df[first_col] = merged_df[first_col].apply(remove_prefixes)
-
-                # Conserver les zéros de tête si configuré
-                if leading_zeros and len(merged_df.columns) > 0:
-                    first_col = merged_df.columns[0]
-                    # Formater comme texte pour conserver les zéros
-                    merged_df[first_col] = merged_df[first_col].astype(str)
-
-            else:
-                # Avec en-tête, utiliser les noms de colonnes
-                for col_key in columns_to_remove:
-                    if col_key in merged_df.columns:
-                        merged_df = merged_df.drop(columns=[col_key])
-
-                # Supprimer les préfixes de la colonne 'ref' si elle existe
-                if prefixes_to_remove and 'ref' in merged_df.columns:
-                    def remove_prefixes(value):
-                        if pd.isna(value):
-                            return value
-                        value_str = str(value)
-                        for prefix in prefixes_to_remove:
-                            if value_str.startswith(prefix):
-                                return value_str[len(prefix):]
-                        return value_str
-
-                    merged_df['ref'] = merged_df['ref'].apply(remove_prefixes)
-
-                # Conserver les zéros de tête si configuré
-                if leading_zeros and 'ref' in merged_df.columns:
-                    merged_df['ref'] = merged_df['ref'].astype(str)
+            # Appliquer les transformations selon la configuration d'import (plan compilé du fournisseur):
+            # colonnes désignées par position sans en-tête, par nom avec en-tête
+            cleanup_plan = plan_cache.cleanup(self.selected_supplier_filter, 'import', import_config)
+            merged_df = cleanup_plan.apply(merged_df, has_header=has_header)
 
             # Fusionner les doublons si configuré
             if merge_duplicates and len(merged_df.columns) >= 2:
@@ -2265,12 +2317,11 @@ class MainWindow(QMainWindow):
             logger.info(f"Ouverture de {len(filtered_files)} fichier(s) pour {self.selected_supplier_filter}")
 
             # Récupérer la configuration d'affichage du fournisseur
-            response = supabase_client.client.table('suppliers').select('*').eq('file_filter_slug', self.selected_supplier_filter).execute()
-            if not response.data:
+            supplier_data = supplier_repository.get_by_slug(self.selected_supplier_filter)
+            if not supplier_data:
                 QMessageBox.warning(self, "Erreur", "Impossible de trouver les paramètres du fournisseur")
                 return
 
-            supplier_data = response.data[0]
             display_config = supplier_data.get('display_config', {})
 
             # Extraire les paramètres d'affichage
@@ -2280,85 +2331,27 @@ class MainWindow(QMainWindow):
             split_files = display_config.get('split_files', False)
 
             logger.info(f"Configuration d'affichage: colonnes={columns_to_remove}, préfixes={prefixes_to_remove}, date={add_date}, split={split_files}")
+            cleanup_plan = plan_cache.cleanup(self.selected_supplier_filter, 'display', display_config)
 
-            # Connexion FTP pour télécharger les fichiers
-            from app.utils import config
-            ftp_config = config.get_ftp_config()
-            ftp_host = ftp_config.get("host")
-            ftp_port = ftp_config.get("port", 22)
-            ftp_user = ftp_config.get("username")
-            ftp_pass = ftp_config.get("password")
-
-            fetcher = FTPFetcher(ftp_host, ftp_port, ftp_user, ftp_pass, use_sftp=True)
-            fetcher.connect()
-
-            # Télécharger tous les fichiers CSV et les garder séparés
+            # Récupérer tous les fichiers CSV (cache local ou téléchargement parallèle)
+            downloaded = self._fetch_remote_files(filtered_files)
             all_dataframes = []
-            temp_files = []
-
-            import tempfile
 
             for file_info in filtered_files:
                 full_path = file_info['full_path']
                 filename = file_info['filename']
 
-                # Créer un fichier temporaire
-                tmp_fd, tmp_path = tempfile.mkstemp(suffix='.csv', prefix='open_')
-                os.close(tmp_fd)
-                temp_files.append(tmp_path)
-
-                # Télécharger le fichier
-                success = fetcher.download_file(full_path, tmp_path)
-                if not success:
+                tmp_path = downloaded.get(full_path)
+                if not tmp_path:
                     logger.error(f"Échec du téléchargement de {filename}")
                     continue
 
                 # Lire le CSV SANS en-tête
-                try:
-                    df = pd.read_csv(tmp_path, sep=';', encoding='utf-8', dtype=str, header=None)
-                    logger.debug(f"CSV lu avec sep=';' - {len(df.columns)} colonnes, {len(df)} lignes")
-                except:
-                    try:
-                        df = pd.read_csv(tmp_path, sep=',', encoding='utf-8', dtype=str, header=None)
-                        logger.debug(f"CSV lu avec sep=',' - {len(df.columns)} colonnes, {len(df)} lignes")
-                    except:
-                        df = pd.read_csv(tmp_path, sep=';', encoding='latin-1', dtype=str, header=None)
-                        logger.debug(f"CSV lu avec sep=';' latin-1 - {len(df.columns)} colonnes, {len(df)} lignes")
-
-                # Mapper les clés de colonnes vers les indices
-                column_index_mapping = {
-                    'ref': 0, 'qty': 1, 'designation': 2, 'price': 3,
-                    'client': 4, 'ean13': 5, 'order': 6
-                }
+                df = csv_sniffer.read_csv(tmp_path, supplier_key=self.selected_supplier_filter, dtype=str, header=None)
+                logger.debug(f"CSV lu - {len(df.columns)} colonnes, {len(df)} lignes")
 
-                # Identifier les colonnes à supprimer par leur indice
-                columns_to_drop_for_file = []
-                for col_key in columns_to_remove:
-                    if col_key in column_index_mapping:
-                        col_idx = column_index_mapping[col_key]
-                        if col_idx < len(df.columns):
-                            columns_to_drop_for_file.append(col_idx)
-
-                # Supprimer les colonnes configurées
-                if columns_to_drop_for_file:
-                    columns_to_drop_for_file.sort(reverse=True)
-                    for col_idx in columns_to_drop_for_file:
-                        df = df.drop(columns=[col_idx])
-
-                # Supprimer les préfixes
-                if prefixes_to_remove and len(df.columns) > 0:
-                    first_col = df.columns[0]
-                    def remove_prefixes(value):
-                        """Supprime le premier préfixe trouvé au début de la valeur"""
-                        if not value:
-                            return value
-                        value_str = str(value)
-                        for prefix in prefixes_to_remove:
-                            if value_str.startswith(prefix):
-                                return value_str[len(prefix):]
-                        return value_str
-
-                    df[first_col] = df[first_col].apply(remove_prefixes)
+                # Supprimer les colonnes et préfixes configurés (plan compilé du fournisseur)
+                df = cleanup_plan.apply(df)
 
                 # Trier ce fichier individuellement SEULEMENT si split_files est activé
                 if split_files and len(df.columns) > 0:
@@ -2369,8 +2362,6 @@ class MainWindow(QMainWindow):
                 all_dataframes.append(df)
                 logger.info(f"Fichier {filename} traité: {len(df)} lignes, {len(df.columns)} colonnes")
 
-            fetcher.disconnect()
-
             # Fusionner tous les DataFrames
             if not all_dataframes:
                 QMessageBox.warning(self, "Erreur", "Aucune donnée à ouvrir")
@@ -2513,13 +2504,6 @@ class MainWindow(QMainWindow):
             import gc
             gc.collect()
 
-            # Nettoyer les fichiers temporaires
-            for tmp_file in temp_files:
-                try:
-                    os.unlink(tmp_file)
-                except:
-                    pass
-
             logger.info(f"Fichier Excel créé: {output_path}")
 
             # ATTENDRE que tous les processus Python libèrent le fichier
@@ -2609,13 +2593,11 @@ class MainWindow(QMainWindow):
 
         # Récupérer les informations du fournisseur
         try:
-            response = supabase_client.client.table('suppliers').select('*').eq('file_filter_slug', self.selected_supplier_filter).execute()
-            if not response.data:
+            supplier_data = supplier_repository.get_by_slug(self.selected_supplier_filter)
+            if not supplier_data:
                 QMessageBox.warning(self, "Erreur", "Impossible de trouver le fournisseur")
                 return
 
-            supplier_data = response.data[0]
-
             # Récupérer web_config et website
             web_config = supplier_data.get('web_config', {})
             if isinstance(web_config, dict):
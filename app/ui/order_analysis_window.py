@@ -19,12 +19,16 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QPixmap, QIcon, QColor
 
-import paramiko
 import pandas as pd
 from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from app.services.csv_sniffer import csv_sniffer
+from app.services.supplier_classifier import SupplierClassifier
+from worker.sftp_pool import sftp_pool
+from worker.ftp_fetcher import FTPFetcher
+
 load_dotenv()
 
 
@@ -35,10 +39,13 @@ class FileAnalyzer(QThread):
     progress = Signal(str)
     error = Signal(str)
 
-    def __init__(self, files_to_analyze: List[str], ftp_path: str):
+    def __init__(self, files_to_analyze: List[str], ftp_path: str,
+                 files_metadata: Optional[Dict[str, Dict]] = None):
         super().__init__()
         self.files_to_analyze = files_to_analyze
         self.ftp_path = ftp_path
+        # {filename: {'size': int, 'modified': datetime}} pour servir les fichiers depuis le cache
+        self.files_metadata = files_metadata or {}
 
     def run(self):
         """Télécharge et analyse les fichiers"""
@@ -49,9 +56,18 @@ class FileAnalyzer(QThread):
             username = os.getenv("FTP_USERNAME")
             password = os.getenv("FTP_PASSWORD")
 
-            transport = paramiko.Transport((host, port))
-            transport.connect(username=username, password=password)
-            sftp = paramiko.SFTPClient.from_transport(transport)
+            # Récupérer tous les fichiers d'un coup (cache local, sinon téléchargement parallèle)
+            self.progress.emit("Récupération des fichiers...")
+            fetcher = FTPFetcher(host, port, username, password, use_sftp=True)
+            requests = []
+            for filename in self.files_to_analyze:
+                metadata = self.files_metadata.get(filename, {})
+                requests.append({
+                    'remote_file': f"{self.ftp_path}/{filename}".replace('//', '/'),
+                    'size': metadata.get('size'),
+                    'modified': metadata.get('modified')
+                })
+            local_files = fetcher.fetch_cached(requests)
 
             results = {}
 
@@ -59,26 +75,19 @@ class FileAnalyzer(QThread):
                 try:
                     self.progress.emit(f"Analyse de {filename}...")
 
-                    # Télécharger le fichier temporairement
                     remote_path = f"{self.ftp_path}/{filename}".replace('//', '/')
-                    local_path = f"./temp/{filename}"
-
-                    Path(local_path).parent.mkdir(parents=True, exist_ok=True)
-                    sftp.get(remote_path, local_path)
-
-                    # Lire le fichier avec pandas
-                    # Essayer différents séparateurs et encodages
-                    df = None
-                    for sep in [';', ',', '\t']:
-                        for encoding in ['utf-8', 'latin1', 'cp1252']:
-                            try:
-                                df = pd.read_csv(local_path, sep=sep, encoding=encoding)
-                                if len(df.columns) > 1:  # Vérifier qu'on a bien des colonnes
-                                    break
-                            except:
-                                continue
-                        if df is not None and len(df.columns) > 1:
-                            break
+                    local_path = local_files.get(remote_path)
+                    if not local_path:
+                        self.error.emit(f"Impossible de télécharger {filename}")
+                        continue
+
+                    # Lire le fichier avec pandas (encodage et séparateur détectés une fois par fournisseur)
+                    supplier_key = self.files_metadata.get(filename, {}).get('supplier')
+                    try:
+                        df = csv_sniffer.read_csv(str(local_path), supplier_key=supplier_key, header=0)
+                    except Exception as e:
+                        logger.error(f"Lecture impossible de {filename}: {e}")
+                        df = None
 
                     if df is None or len(df.columns) <= 1:
                         self.error.emit(f"Impossible de lire {filename}")
@@ -117,16 +126,10 @@ class FileAnalyzer(QThread):
                         'data': df.head(100)  # Garder les 100 premières lignes
                     }
 
-                    # Nettoyer le fichier temporaire
-                    Path(local_path).unlink(missing_ok=True)
-
                 except Exception as e:
                     logger.error(f"Erreur analyse {filename}: {e}")
                     self.error.emit(f"Erreur {filename}: {str(e)}")
 
-            sftp.close()
-            transport.close()
-
             self.finished.emit(results)
 
         except Exception as e:
@@ -141,6 +144,8 @@ class OrderAnalysisWindow(QMainWindow):
         super().__init__(parent)
         self.files_list = []
         self.suppliers_config = []
+        self.classifier = None  # Patterns de tous les fournisseurs compilés
+        self.files_by_supplier = {}  # {id fournisseur: [fichiers]}
         self.selected_supplier = None
         self.analysis_results = {}
 
@@ -350,6 +355,10 @@ class OrderAnalysisWindow(QMainWindow):
                 config = json.load(f)
 
             self.suppliers_config = config.get('suppliers', [])
+            self.classifier = SupplierClassifier(
+                [s for s in self.suppliers_config if s.get('active', True)],
+                key='id', slug_prefix_fallback=False
+            )
 
             # Créer les boutons fournisseurs
             self.supplier_buttons = {}
@@ -404,12 +413,9 @@ class OrderAnalysisWindow(QMainWindow):
             password = os.getenv("FTP_PASSWORD")
             ftp_path = os.getenv("FTP_PATH", "/")
 
-            transport = paramiko.Transport((host, port))
-            transport.connect(username=username, password=password)
-            sftp = paramiko.SFTPClient.from_transport(transport)
-
             # Lister les fichiers (exclure 'old')
-            files_attr = sftp.listdir_attr(ftp_path)
+            with sftp_pool.session(host, port, username, password) as sftp:
+                files_attr = sftp.listdir_attr(ftp_path)
 
             today = date.today()
 
@@ -428,18 +434,19 @@ class OrderAnalysisWindow(QMainWindow):
                 # Extraire le fournisseur depuis le nom de fichier
                 supplier_name = filename.split('-')[0] if '-' in filename else "Inconnu"
 
-                file_date = datetime.fromtimestamp(file_attr.st_mtime).date()
+                modified = datetime.fromtimestamp(file_attr.st_mtime)
 
                 self.files_list.append({
                     'filename': filename,
                     'supplier': supplier_name,
-                    'date': file_date,
+                    'date': modified.date(),
+                    'modified': modified,
                     'size': file_attr.st_size,
                     'analyzed': False
                 })
 
-            sftp.close()
-            transport.close()
+            # Classer le listage une seule fois: le filtre fournisseur devient une recherche directe
+            self.files_by_supplier = self.classifier.classify_all(self.files_list) if self.classifier else {}
 
             # Afficher dans le tableau
             self.display_files()
@@ -495,19 +502,8 @@ class OrderAnalysisWindow(QMainWindow):
             if supplier['id'] in self.supplier_buttons:
                 self.supplier_buttons[supplier['id']].setChecked(True)
 
-            # Filtrer les fichiers
-            patterns = supplier.get('file_patterns', [])
-
-            filtered = []
-            for file_info in self.files_list:
-                filename = file_info['filename']
-
-                # Vérifier si le fichier correspond aux patterns
-                import fnmatch
-                for pattern in patterns:
-                    if fnmatch.fnmatch(filename, pattern):
-                        filtered.append(file_info)
-                        break
+            # Filtrer les fichiers (listage déjà classé par fournisseur)
+            filtered = self.files_by_supplier.get(supplier['id'], [])
 
             self.display_files(filtered)
 
@@ -538,7 +534,8 @@ class OrderAnalysisWindow(QMainWindow):
         # Lancer l'analyse
         ftp_path = os.getenv("FTP_PATH", "/")
 
-        self.analyzer = FileAnalyzer(visible_files, ftp_path)
+        files_metadata = {f['filename']: f for f in self.files_list}
+        self.analyzer = FileAnalyzer(visible_files, ftp_path, files_metadata)
         self.analyzer.progress.connect(self.on_analysis_progress)
         self.analyzer.finished.connect(self.on_analysis_finished)
         self.analyzer.error.connect(self.on_analysis_error)
@@ -20,6 +20,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.services.supabase_client import supabase_client
 from app.utils import get_resource_path
+from worker.sftp_pool import sftp_pool
 
 
 class SettingsDialog(QDialog):
@@ -31,6 +32,7 @@ class SettingsDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Réglages")
         self.setMinimumSize(700, 500)
+        self._loaded_ftp_connection = None  # (hôte, port, utilisateur, mot de passe) à l'ouverture
 
         self.init_ui()
         self.load_current_settings()
@@ -511,6 +513,8 @@ class SettingsDialog(QDialog):
             self.ftp_pass_input.setText(os.getenv("FTP_PASSWORD", ""))
             self.ftp_path_input.setText(os.getenv("FTP_REMOTE_PATH", ""))
 
+        self._loaded_ftp_connection = self._ftp_connection()
+
         # === Paramètres du poste (fichier local) ===
         try:
             config_file = Path.home() / '.supplier_order_manager' / 'workstation_config.json'
@@ -567,6 +571,12 @@ class SettingsDialog(QDialog):
 
             logger.info("Réglages globaux sauvegardés avec succès dans la base de données")
 
+            # Ne plus réutiliser les sessions SFTP ouvertes avec les anciens identifiants
+            if self._loaded_ftp_connection and self._ftp_connection() != self._loaded_ftp_connection:
+                host, port, username, _ = self._loaded_ftp_connection
+                sftp_pool.invalidate(host, port, username)
+                self._loaded_ftp_connection = self._ftp_connection()
+
             # === Sauvegarder les paramètres du poste (fichier local) ===
             config_dir = Path.home() / '.supplier_order_manager'
             config_dir.mkdir(exist_ok=True)
@@ -603,6 +613,11 @@ class SettingsDialog(QDialog):
                 f"❌ Impossible de sauvegarder les réglages:\n{str(e)}"
             )
 
+    def _ftp_connection(self) -> tuple:
+        """Paramètres de connexion FTP saisis (hôte, port, utilisateur, mot de passe)"""
+        return (self.ftp_host_input.text(), self.ftp_port_input.value(),
+                self.ftp_user_input.text(), self.ftp_pass_input.text())
+
     def test_ftp_connection(self):
         """Teste la connexion FTP avec les paramètres saisis"""
         try:
@@ -621,8 +636,8 @@ class SettingsDialog(QDialog):
                 )
                 return
 
-            # Tenter la connexion
-            fetcher = FTPFetcher(host, port, user, password, use_sftp=True)
+            # Tenter la connexion (hors pool pour vraiment tester les identifiants saisis)
+            fetcher = FTPFetcher(host, port, user, password, use_sftp=True, pooled=False)
 
             if fetcher.connect():
                 fetcher.disconnect()
@@ -546,10 +546,12 @@ class TransformationConfigDialog(QDialog):
             # Construire les règles de transformation
             rules = self.build_transformation_rules()
 
-            # Appliquer la transformation
+            # Appliquer la transformation (le fichier exemple n'est pas modifié;
+            # plan recompilé seulement si les règles ont changé depuis le dernier test)
             transformed_df = self.file_processor.apply_transformation(
-                self.test_dataframe.copy(),
-                rules
+                self.test_dataframe,
+                rules,
+                supplier_key=self.current_supplier_id
             )
 
             # Afficher le résultat
@@ -53,6 +53,7 @@ CREATE TABLE IF NOT EXISTS files (
   -- Métadonnées
   row_count INTEGER,
   file_size INTEGER,
+  content_hash TEXT,
   error_message TEXT,
 
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -86,6 +87,9 @@ CREATE INDEX IF NOT EXISTS idx_files_status ON files(status);
 CREATE INDEX IF NOT EXISTS idx_files_supplier ON files(supplier_code);
 CREATE INDEX IF NOT EXISTS idx_files_received_date ON files(received_date);
 CREATE INDEX IF NOT EXISTS idx_files_locked_by ON files(locked_by);
+CREATE INDEX IF NOT EXISTS idx_files_supplier_content_hash ON files(supplier_code, content_hash);
+CREATE INDEX IF NOT EXISTS idx_files_original_path ON files(original_path);
+CREATE INDEX IF NOT EXISTS idx_files_pagination ON files(received_date DESC, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_processing_history_file_id ON processing_history(file_id);
 CREATE INDEX IF NOT EXISTS idx_processing_history_created_at ON processing_history(created_at);
 
@@ -119,6 +123,49 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Verrouillage atomique (appelé par RPC): un seul utilisateur obtient le verrou
+CREATE OR REPLACE FUNCTION lock_file(p_file_id UUID, p_user_id UUID)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_locked_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    UPDATE files
+    SET locked_by = p_user_id, locked_at = NOW(), status = 'processing'
+    WHERE id = p_file_id
+    AND locked_by IS NULL
+    RETURNING locked_at INTO v_locked_at;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO processing_history (file_id, user_id, action, details)
+    VALUES (p_file_id, p_user_id, 'locked', jsonb_build_object('timestamp', v_locked_at));
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Déverrouillage atomique (appelé par RPC)
+CREATE OR REPLACE FUNCTION unlock_file(p_file_id UUID, p_user_id UUID, p_new_status TEXT DEFAULT 'pending')
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE files
+    SET locked_by = NULL, locked_at = NULL, status = p_new_status
+    WHERE id = p_file_id
+    AND locked_by IS NOT NULL;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO processing_history (file_id, user_id, action, details)
+    VALUES (p_file_id, p_user_id, 'unlocked', jsonb_build_object('timestamp', NOW()));
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Row Level Security (RLS)
 ALTER TABLE profiles ENABLE ROW LEVEL SECURITY;
 ALTER TABLE suppliers ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,20 @@
+-- Migration: Ajout de la colonne content_hash à la table files
+-- Date: 2026-10-17
+-- Description: Empreinte SHA-256 du fichier collecté, pour ne pas réenregistrer un fichier déjà présent
+--              lorsque la collecte est relancée
+
+ALTER TABLE files
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Recherche des fichiers déjà collectés d'un fournisseur par empreinte
+CREATE INDEX IF NOT EXISTS idx_files_supplier_content_hash ON files(supplier_code, content_hash);
+
+-- Recherche des fichiers par chemin de stockage (collisions de noms)
+CREATE INDEX IF NOT EXISTS idx_files_original_path ON files(original_path);
+
+COMMENT ON COLUMN files.content_hash IS 'Empreinte SHA-256 du fichier original (déduplication de la collecte)';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Colonne content_hash ajoutée avec succès à la table files';
+END $$;
@@ -0,0 +1,12 @@
+-- Migration: Index de pagination de la liste des fichiers
+-- Date: 2026-10-17
+-- Description: La liste des fichiers est parcourue page par page dans l'ordre
+--              (received_date, created_at, id) décroissant: chaque page est lue directement
+--              dans l'index, sans tri ni OFFSET, quelle que soit la taille de l'historique
+
+CREATE INDEX IF NOT EXISTS idx_files_pagination ON files(received_date DESC, created_at DESC, id DESC);
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Index idx_files_pagination créé avec succès';
+END $$;
@@ -0,0 +1,56 @@
+-- Migration: Fonctions de verrouillage des fichiers (appelées par RPC)
+-- Date: 2026-10-17
+-- Description: Verrouillage et déverrouillage atomiques: mise à jour conditionnelle du fichier
+--              et entrée d'historique dans la même transaction, en un seul aller-retour.
+--              Deux utilisateurs qui verrouillent en même temps: un seul obtient le verrou.
+
+-- Verrouille un fichier s'il ne l'est pas déjà (true si le verrou est obtenu)
+CREATE OR REPLACE FUNCTION lock_file(p_file_id UUID, p_user_id UUID)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_locked_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    UPDATE files
+    SET locked_by = p_user_id, locked_at = NOW(), status = 'processing'
+    WHERE id = p_file_id
+    AND locked_by IS NULL
+    RETURNING locked_at INTO v_locked_at;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO processing_history (file_id, user_id, action, details)
+    VALUES (p_file_id, p_user_id, 'locked', jsonb_build_object('timestamp', v_locked_at));
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Déverrouille un fichier verrouillé et lui donne son nouveau statut (true si le verrou est levé)
+CREATE OR REPLACE FUNCTION unlock_file(p_file_id UUID, p_user_id UUID, p_new_status TEXT DEFAULT 'pending')
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE files
+    SET locked_by = NULL, locked_at = NULL, status = p_new_status
+    WHERE id = p_file_id
+    AND locked_by IS NOT NULL;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO processing_history (file_id, user_id, action, details)
+    VALUES (p_file_id, p_user_id, 'unlocked', jsonb_build_object('timestamp', NOW()));
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION lock_file(UUID, UUID) IS 'Verrouillage atomique d''un fichier avec entrée d''historique';
+COMMENT ON FUNCTION unlock_file(UUID, UUID, TEXT) IS 'Déverrouillage atomique d''un fichier avec entrée d''historique';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Fonctions lock_file et unlock_file créées avec succès';
+END $$;
@@ -6,9 +6,11 @@ Worker principal pour la collecte automatique des fichiers fournisseurs
 import os
 import sys
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from dotenv import load_dotenv
 from loguru import logger
 
@@ -17,6 +19,8 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from worker.email_fetcher import EmailFetcher, ExchangeFetcher
 from worker.ftp_fetcher import FTPFetcher
+from worker.mail_checkpoint import MailCheckpoint
+from worker.file_digest import FileDigest, digest_file
 from app.services.supabase_client import supabase_client
 from app.services.file_processor import FileProcessor
 from app.models.file_record import FileType
@@ -37,6 +41,18 @@ class SupplierFileCollector:
         self.file_processor = FileProcessor(self.temp_folder)
         self.collected_files: List[Dict[str, Any]] = []
 
+        # Parallélisme de la collecte
+        self.max_collect_workers = int(os.getenv("COLLECT_MAX_WORKERS", 8))
+        self.max_upload_workers = int(os.getenv("COLLECT_UPLOAD_WORKERS", 4))
+        self.max_per_host = int(os.getenv("COLLECT_MAX_PER_HOST", 4))
+        # Mode upsert: un fichier de même nom mais de contenu différent remplace l'enregistrement existant
+        self.upload_upsert = os.getenv("COLLECT_UPLOAD_UPSERT", "false").lower() in ("1", "true", "yes")
+        self._host_semaphores: Dict[Tuple[str, int, str], threading.Semaphore] = {}
+        self._host_semaphores_lock = threading.Lock()
+
+        # Point de reprise de la collecte email (collectes planifiées uniquement)
+        self.mail_checkpoint = MailCheckpoint()
+
     def load_suppliers_config(self) -> List[Dict[str, Any]]:
         """Charge la configuration des fournisseurs"""
         try:
@@ -47,53 +63,36 @@ class SupplierFileCollector:
             logger.error(f"Erreur lors du chargement de la config fournisseurs: {e}")
             return []
 
-    def collect_from_email(self, supplier: Dict[str, Any], target_date: date) -> List[Dict[str, Any]]:
-        """Collecte les fichiers depuis email pour un fournisseur"""
-        logger.info(f"Collecte email pour: {supplier['name']}")
-
-        try:
-            # Choisir entre IMAP ou Exchange
-            use_exchange = os.getenv("EXCHANGE_EMAIL") is not None
-
-            if use_exchange:
-                fetcher = ExchangeFetcher(
-                    email=os.getenv("EXCHANGE_EMAIL"),
-                    password=os.getenv("EXCHANGE_PASSWORD"),
-                    server=os.getenv("EXCHANGE_SERVER", "outlook.office365.com")
-                )
-            else:
-                fetcher = EmailFetcher(
-                    host=os.getenv("EMAIL_HOST", "imap.gmail.com"),
-                    port=int(os.getenv("EMAIL_PORT", 993)),
-                    username=os.getenv("EMAIL_USERNAME"),
-                    password=os.getenv("EMAIL_PASSWORD")
-                )
-
-            if not fetcher.connect():
-                logger.error(f"Échec de connexion email pour {supplier['name']}")
-                return []
-
-            # Récupérer les pièces jointes
-            files = fetcher.fetch_attachments(
-                sender_filter=supplier.get('email_pattern'),
-                target_date=target_date,
-                output_folder=self.temp_folder
+    def _create_email_fetcher(self):
+        """Crée le fetcher de la boîte email (Exchange si EXCHANGE_EMAIL est défini, sinon IMAP)"""
+        if os.getenv("EXCHANGE_EMAIL") is not None:
+            return ExchangeFetcher(
+                email=os.getenv("EXCHANGE_EMAIL"),
+                password=os.getenv("EXCHANGE_PASSWORD"),
+                server=os.getenv("EXCHANGE_SERVER", "outlook.office365.com")
             )
+        return EmailFetcher(
+            host=os.getenv("EMAIL_HOST", "imap.gmail.com"),
+            port=int(os.getenv("EMAIL_PORT", 993)),
+            username=os.getenv("EMAIL_USERNAME"),
+            password=os.getenv("EMAIL_PASSWORD")
+        )
 
-            if not use_exchange:
-                fetcher.disconnect()
-
-            # Ajouter les infos du fournisseur
-            for file in files:
-                file['supplier_code'] = supplier['id']
-                file['supplier_name'] = supplier['name']
+    def _supplier_folder(self, supplier: Dict[str, Any]) -> str:
+        """Dossier temporaire propre au fournisseur (évite les collisions de noms entre collectes parallèles)"""
+        return str(Path(self.temp_folder) / str(supplier['id']))
 
-            logger.info(f"{len(files)} fichier(s) collecté(s) par email pour {supplier['name']}")
-            return files
+    def collect_from_email(self, supplier: Dict[str, Any], target_date: date) -> List[Dict[str, Any]]:
+        """Collecte les fichiers depuis email pour un fournisseur (même passage que run_collection)"""
+        logger.info(f"Collecte email pour: {supplier['name']}")
 
+        collected = []
+        try:
+            self._collect_email_suppliers([(0, supplier)], target_date, lambda _, files: collected.extend(files))
         except Exception as e:
             logger.error(f"Erreur collecte email pour {supplier['name']}: {e}")
             return []
+        return collected
 
     def collect_from_ftp(self, supplier: Dict[str, Any], target_date: date) -> List[Dict[str, Any]]:
         """Collecte les fichiers depuis FTP pour un fournisseur"""
@@ -106,6 +105,7 @@ class SupplierFileCollector:
                 logger.warning(f"Pas de config FTP pour {supplier['name']}")
                 return []
 
+            # Connexion SSH partagée par hôte (pool SFTP), un canal par fournisseur
             fetcher = FTPFetcher(
                 host=ftp_config.get('host', os.getenv('FTP_HOST')),
                 port=ftp_config.get('port', int(os.getenv('FTP_PORT', 22))),
@@ -114,19 +114,22 @@ class SupplierFileCollector:
                 use_sftp=ftp_config.get('use_sftp', True)
             )
 
-            if not fetcher.connect():
-                logger.error(f"Échec de connexion FTP pour {supplier['name']}")
-                return []
-
-            # Récupérer les fichiers
-            files = fetcher.fetch_files_by_pattern(
-                remote_path=supplier.get('ftp_path', '/'),
-                file_patterns=supplier.get('file_patterns', ['*.csv', '*.xlsx']),
-                target_date=target_date,
-                output_folder=self.temp_folder
-            )
-
-            fetcher.disconnect()
+            # Limiter le nombre de collectes simultanées sur un même serveur
+            with self._host_semaphore(fetcher.host, fetcher.port, fetcher.username):
+                if not fetcher.connect():
+                    logger.error(f"Échec de connexion FTP pour {supplier['name']}")
+                    return []
+
+                try:
+                    # Récupérer les fichiers
+                    files = fetcher.fetch_files_by_pattern(
+                        remote_path=supplier.get('ftp_path', '/'),
+                        file_patterns=supplier.get('file_patterns', ['*.csv', '*.xlsx']),
+                        target_date=target_date,
+                        output_folder=self._supplier_folder(supplier)
+                    )
+                finally:
+                    fetcher.disconnect()
 
             # Ajouter les infos du fournisseur
             for file in files:
@@ -140,13 +143,68 @@ class SupplierFileCollector:
             logger.error(f"Erreur collecte FTP pour {supplier['name']}: {e}")
             return []
 
+    def _host_semaphore(self, host: str, port: int, username: str) -> threading.Semaphore:
+        key = (host, int(port or 0), username)
+        with self._host_semaphores_lock:
+            if key not in self._host_semaphores:
+                self._host_semaphores[key] = threading.Semaphore(self.max_per_host)
+            return self._host_semaphores[key]
+
+    def _collect_email_suppliers(self, suppliers: List[Tuple[int, Dict[str, Any]]], target_date: date,
+                                 on_collected: Callable[[int, List[Dict[str, Any]]], None],
+                                 checkpoint: Optional[MailCheckpoint] = None):
+        """Collecte tous les fournisseurs email en un seul passage sur la boîte (une connexion, une recherche)"""
+        fetcher = self._create_email_fetcher()
+        if not fetcher.connect():
+            logger.error(f"Échec de connexion email ({len(suppliers)} fournisseur(s) non collecté(s))")
+            return
+
+        try:
+            routes = {str(supplier['id']): supplier.get('email_pattern') for _, supplier in suppliers}
+            files_by_supplier = fetcher.scan_mailbox(
+                routes, target_date=target_date, output_folder=self.temp_folder, checkpoint=checkpoint
+            )
+        finally:
+            if isinstance(fetcher, EmailFetcher):
+                fetcher.disconnect()
+
+        for index, supplier in suppliers:
+            files = files_by_supplier.get(str(supplier['id']), [])
+            for file in files:
+                file['supplier_code'] = supplier['id']
+                file['supplier_name'] = supplier['name']
+                file['mailbox'] = fetcher.mailbox_key
+
+            logger.info(f"{len(files)} fichier(s) collecté(s) par email pour {supplier['name']}")
+            on_collected(index, files)
+
     def upload_to_supabase(self, file_info: Dict[str, Any]) -> bool:
-        """Upload un fichier vers Supabase Storage et crée l'enregistrement DB"""
+        """Upload un fichier vers Supabase Storage et crée l'enregistrement DB (ignoré s'il est déjà enregistré)"""
+        try:
+            return self._store_supplier_files([file_info])[0]
+        except Exception as e:
+            logger.error(f"Erreur upload Supabase pour {file_info['filename']}: {e}")
+            return False
+
+    def _storage_path(self, file_info: Dict[str, Any], subfolder: Optional[str] = None) -> str:
+        """Chemin de stockage {fournisseur}/{date}/[sous-dossier/]{fichier}"""
+        today = date.today().isoformat()
+        if subfolder:
+            return f"{file_info['supplier_code']}/{today}/{subfolder}/{file_info['filename']}"
+        return f"{file_info['supplier_code']}/{today}/{file_info['filename']}"
+
+    def _digest(self, file_info: Dict[str, Any]) -> Optional[FileDigest]:
+        try:
+            return digest_file(file_info['file_path'])
+        except Exception as e:
+            logger.error(f"Erreur lecture de {file_info['filename']}: {e}")
+            return None
+
+    def prepare_upload(self, file_info: Dict[str, Any], storage_path: Optional[str] = None,
+                       digest: Optional[FileDigest] = None) -> Optional[Dict[str, Any]]:
+        """Upload un fichier vers Supabase Storage et retourne l'enregistrement DB à créer (None en cas d'échec)"""
         try:
-            # Lire le fichier
             file_path = Path(file_info['file_path'])
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
 
             # Déterminer le type de fichier
             extension = file_path.suffix[1:].lower()
@@ -158,49 +216,138 @@ class SupplierFileCollector:
                 file_type = FileType.XLS
             else:
                 logger.warning(f"Type de fichier non supporté: {extension}")
-                return False
+                return None
 
             # Construire le chemin de stockage
-            today = date.today().isoformat()
-            storage_path = f"{file_info['supplier_code']}/{today}/{file_info['filename']}"
+            if storage_path is None:
+                storage_path = self._storage_path(file_info)
 
-            # Upload vers Storage
-            supabase_client.upload_file(
+            # Upload vers Storage, en flux depuis le disque. L'objet éventuellement présent au même
+            # chemin n'est référencé par aucun fichier (upload interrompu): il est remplacé.
+            uploaded = supabase_client.upload_file(
                 bucket='supplier-files-original',
                 file_path=storage_path,
-                file_content=file_content
+                file_content=file_path,
+                upsert=True
             )
+            if uploaded is None:
+                return None
 
-            # Récupérer les infos du fichier
-            file_details = self.file_processor.get_file_info(str(file_path), file_type)
-
-            # Créer l'enregistrement dans la DB
-            file_record = {
+            # Enregistrement DB (créé par lot, voir _store_supplier_files)
+            return {
                 'filename': file_info['filename'],
                 'supplier_code': file_info['supplier_code'],
                 'received_date': file_info['received_date'].isoformat(),
                 'file_type': file_type.value,
                 'status': 'pending',
                 'original_path': storage_path,
-                'file_size': file_info['file_size'],
-                'row_count': file_details.get('row_count') if file_details else None
+                'file_size': digest.size if digest else file_info['file_size'],
+                'content_hash': digest.sha256 if digest else None,
+                # Compté pendant le calcul de l'empreinte (pas de relecture du fichier)
+                'row_count': digest.row_count if digest else None
             }
 
-            created = supabase_client.create_file(file_record)
+        except Exception as e:
+            logger.error(f"Erreur upload Supabase pour {file_info['filename']}: {e}")
+            return None
+
+    def _store_supplier_files(self, files: List[Dict[str, Any]],
+                              pool: Optional[ThreadPoolExecutor] = None) -> List[bool]:
+        """
+        Enregistre les fichiers collectés d'un fournisseur, retourne le succès de chaque fichier
+
+        1. Empreinte SHA-256 de chaque fichier (lecture par blocs)
+        2. Empreintes déjà enregistrées pour ce fournisseur: fichier ignoré (une requête)
+        3. Chemin de stockage déjà utilisé par un autre contenu: remplacé en mode upsert,
+           sinon le fichier est rangé dans un sous-dossier à son empreinte (une requête)
+        4. Uploads (en parallèle sur pool), puis création groupée des enregistrements
+
+        Une collecte relancée après un échec partiel ne renvoie que les fichiers manquants.
+        """
+        run = pool.map if pool is not None else map
+        statuses = [False] * len(files)
+        supplier_code = files[0]['supplier_code']
+
+        digests = list(run(self._digest, files))
+
+        known = {
+            row['content_hash'] for row in supabase_client.find_files_by(
+                'content_hash', {d.sha256 for d in digests if d}, supplier_code
+            )
+        }
+
+        pending = []  # Index des fichiers à envoyer
+        seen = set()
+        for index, (file_info, digest) in enumerate(zip(files, digests)):
+            if digest is None:
+                continue
+            file_info['content_hash'] = digest.sha256
+            if digest.sha256 in known or digest.sha256 in seen:
+                file_info['duplicate'] = True
+                statuses[index] = True
+                logger.info(f"Fichier déjà enregistré, ignoré: {file_info['filename']}")
+                continue
+            seen.add(digest.sha256)
+            pending.append(index)
+
+        if not pending:
+            return statuses
 
-            if created:
-                logger.info(f"Fichier uploadé et enregistré: {file_info['filename']}")
-                return True
+        paths = {index: self._storage_path(files[index]) for index in pending}
+        taken = {
+            row['original_path']: row['id'] for row in supabase_client.find_files_by(
+                'original_path', set(paths.values()), supplier_code
+            )
+        }
+
+        replaced = {}  # Index -> id du fichier remplacé (mode upsert)
+        used = set()
+        for index in pending:
+            path = paths[index]
+            if path in taken and self.upload_upsert and path not in used:
+                replaced[index] = taken[path]
+            elif path in taken or path in used:
+                paths[index] = self._storage_path(files[index], digests[index].sha256[:12])
+            used.add(paths[index])
+
+        records = list(run(lambda i: self.prepare_upload(files[i], paths[i], digests[i]), pending))
+
+        new_records, owners = [], []
+        for index, record in zip(pending, records):
+            if record is None:
+                continue
+            if index in replaced:
+                if supabase_client.update_file(replaced[index], record):
+                    statuses[index] = True
+                    logger.info(f"Fichier remplacé: {files[index]['filename']}")
+                else:
+                    logger.error(f"Échec remplacement DB pour: {files[index]['filename']}")
             else:
-                logger.error(f"Échec enregistrement DB pour: {file_info['filename']}")
-                return False
+                new_records.append(record)
+                owners.append(index)
 
-        except Exception as e:
-            logger.error(f"Erreur upload Supabase pour {file_info['filename']}: {e}")
-            return False
+        if not new_records:
+            return statuses
+
+        result = supabase_client.create_files(new_records)
+        failed = result.failed_indexes()
+        for position, index in enumerate(owners):
+            if position in failed:
+                logger.error(f"Échec enregistrement DB pour: {files[index]['filename']}")
+            else:
+                statuses[index] = True
+                logger.info(f"Fichier uploadé et enregistré: {files[index]['filename']}")
+        return statuses
 
     def run_collection(self, target_date: Optional[date] = None):
-        """Lance la collecte pour tous les fournisseurs actifs"""
+        """
+        Lance la collecte pour tous les fournisseurs actifs
+
+        Sans date cible (collecte planifiée), les emails sont lus à partir du point de reprise:
+        la collecte peut être relancée plusieurs fois par jour sans relire la boîte.
+        Avec une date cible, tous les emails de ce jour sont relus et le point de reprise n'est pas modifié.
+        """
+        incremental = target_date is None
         if target_date is None:
             target_date = date.today()
 
@@ -212,23 +359,69 @@ class SupplierFileCollector:
 
         logger.info(f"{len(active_suppliers)} fournisseur(s) actif(s)")
 
-        # Collecter pour chaque fournisseur
-        for supplier in active_suppliers:
+        # Fournisseurs regroupés par source: une connexion email partagée,
+        # collectes FTP en parallèle (limitées par serveur)
+        email_suppliers = []
+        ftp_suppliers = []
+        for index, supplier in enumerate(active_suppliers):
             source = supplier.get('source', 'email')
-
             if source == 'email':
-                files = self.collect_from_email(supplier, target_date)
+                email_suppliers.append((index, supplier))
             elif source == 'ftp':
-                files = self.collect_from_ftp(supplier, target_date)
+                ftp_suppliers.append((index, supplier))
             else:
                 logger.warning(f"Source inconnue pour {supplier['name']}: {source}")
-                continue
 
-            # Uploader les fichiers vers Supabase
-            for file_info in files:
-                success = self.upload_to_supabase(file_info)
+        # Les uploads démarrent dès qu'un fournisseur a été collecté (pendant les autres téléchargements),
+        # fichiers déjà enregistrés ignorés, enregistrements DB créés en un lot (voir _store_supplier_files)
+        batches = []  # [(index fournisseur, fichiers, future de l'enregistrement groupé)]
+        batches_lock = threading.Lock()
+
+        with ThreadPoolExecutor(max_workers=self.max_upload_workers, thread_name_prefix="upload") as upload_pool, \
+                ThreadPoolExecutor(max_workers=2, thread_name_prefix="flush") as flush_pool:
+
+            def on_collected(supplier_index: int, files: List[Dict[str, Any]]):
+                if not files:
+                    return
+                flush = flush_pool.submit(self._store_supplier_files, files, upload_pool)
+                with batches_lock:
+                    batches.append((supplier_index, files, flush))
+
+            with ThreadPoolExecutor(max_workers=self.max_collect_workers, thread_name_prefix="collect") as collect_pool:
+                tasks = []
+                if email_suppliers:
+                    checkpoint = self.mail_checkpoint if incremental else None
+                    tasks.append(collect_pool.submit(
+                        self._collect_email_suppliers, email_suppliers, target_date, on_collected, checkpoint
+                    ))
+                for index, supplier in ftp_suppliers:
+                    tasks.append(collect_pool.submit(
+                        lambda i=index, s=supplier: on_collected(i, self.collect_from_ftp(s, target_date))
+                    ))
+
+                for task in as_completed(tasks):
+                    try:
+                        task.result()
+                    except Exception as e:
+                        logger.error(f"Erreur de collecte: {e}")
+
+        # Résultat dans l'ordre de la configuration (indépendant de l'ordre de fin des tâches)
+        for supplier_index, files, flush in sorted(batches, key=lambda b: b[0]):
+            try:
+                statuses = flush.result()
+            except Exception as e:
+                logger.error(f"Erreur enregistrement des fichiers de {files[0]['supplier_name']}: {e}")
+                statuses = [False] * len(files)
+
+            for file_info, success in zip(files, statuses):
                 if success:
                     self.collected_files.append(file_info)
+                elif incremental and file_info.get('mailbox'):
+                    # Message relu à la prochaine collecte
+                    self.mail_checkpoint.rewind(file_info['mailbox'], file_info['mail_position'])
+
+        if incremental and email_suppliers:
+            self.mail_checkpoint.save()
 
         logger.info(f"=== Collecte terminée: {len(self.collected_files)} fichier(s) total ===")
 
@@ -251,12 +444,13 @@ class SupplierFileCollector:
             supplier = file['supplier_name']
             if supplier not in by_supplier:
                 by_supplier[supplier] = []
-            by_supplier[supplier].append(file['filename'])
+            by_supplier[supplier].append(file)
 
         for supplier, files in by_supplier.items():
             logger.info(f"{supplier}: {len(files)} fichier(s)")
-            for filename in files:
-                logger.info(f"  - {filename}")
+            for file in files:
+                suffix = " (déjà enregistré)" if file.get('duplicate') else ""
+                logger.info(f"  - {file['filename']}{suffix}")
 
         logger.info("=" * 50)
 
@@ -4,18 +4,48 @@ Support IMAP et Exchange
 """
 
 import os
+import hashlib
 import imaplib
-import email
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from email.header import decode_header
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, BinaryIO
 from datetime import datetime, date
 from pathlib import Path
 from loguru import logger
 
+from worker.imap_parser import (
+    iter_fetch_responses, attachment_parts, envelope_sender, envelope_subject,
+    sender_matches, AttachmentPart, PartDecoder, ATTACHMENT_EXTENSIONS
+)
+from worker.mail_checkpoint import MailCheckpoint
+
+
+def _attachment_info(file_path: Path, filename: str, sender: str, subject: str,
+                     received_date: date, mail_position=None) -> Dict[str, Any]:
+    """Informations d'une pièce jointe enregistrée (format de fetch_attachments)"""
+    return {
+        'filename': filename,
+        'file_path': str(file_path),
+        'file_size': file_path.stat().st_size,
+        'sender': sender,
+        'subject': subject,
+        'received_date': received_date,
+        'source': 'email',
+        'mail_position': mail_position  # UID IMAP / date de réception Exchange (point de reprise)
+    }
+
 
 class EmailFetcher:
     """Classe pour récupérer les fichiers depuis une boîte email IMAP"""
 
+    # Messages par commande FETCH pour les en-têtes
+    HEADER_BATCH_SIZE = 500
+    # Volume (encodé) maximum de pièces jointes demandé en une commande FETCH
+    PART_BATCH_BYTES = 8 * 1024 * 1024
+    # Au-delà, une pièce jointe est téléchargée par morceaux écrits au fur et à mesure
+    STREAM_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self, host: str, port: int, username: str, password: str):
         self.host = host
         self.port = port
@@ -23,6 +53,11 @@ class EmailFetcher:
         self.password = password
         self.connection: Optional[imaplib.IMAP4_SSL] = None
 
+    @property
+    def mailbox_key(self) -> str:
+        """Identifiant de la boîte pour le point de reprise"""
+        return f"imap://{self.username}@{self.host}:{self.port}/INBOX"
+
     def connect(self) -> bool:
         """Se connecte au serveur IMAP"""
         try:
@@ -50,6 +85,9 @@ class EmailFetcher:
         """
         Récupère les pièces jointes des emails
 
+        Seules les sections CSV/Excel décrites par BODYSTRUCTURE sont téléchargées
+        (pas le message complet), et écrites directement sur le disque.
+
         Args:
             sender_filter: Filtre sur l'expéditeur (ex: "fournisseur@email.com")
             subject_filter: Filtre sur le sujet
@@ -66,14 +104,11 @@ class EmailFetcher:
         if target_date is None:
             target_date = date.today()
 
-        output_path = Path(output_folder)
-        output_path.mkdir(parents=True, exist_ok=True)
-
-        downloaded_files = []
+        results: Dict[str, List[Dict[str, Any]]] = {'': []}
 
         try:
-            # Sélectionner la boîte de réception
-            self.connection.select("INBOX")
+            # Lecture seule: BODY.PEEK ne marque pas les messages comme lus
+            self.connection.select("INBOX", readonly=True)
 
             # Construire la requête de recherche
             date_str = target_date.strftime("%d-%b-%Y")
@@ -85,81 +120,306 @@ class EmailFetcher:
             logger.info(f"Recherche d'emails avec critères: {search_criteria}")
 
             # Rechercher les emails
-            status, messages = self.connection.search(None, search_criteria)
+            status, messages = self.connection.uid('SEARCH', None, search_criteria)
 
             if status != "OK":
                 logger.warning("Aucun email trouvé")
                 return []
 
-            email_ids = messages[0].split()
-            logger.info(f"{len(email_ids)} email(s) trouvé(s)")
+            uids = [int(uid) for uid in messages[0].split()]
+            logger.info(f"{len(uids)} email(s) trouvé(s)")
 
-            # Parcourir chaque email
-            for email_id in email_ids:
-                status, msg_data = self.connection.fetch(email_id, "(RFC822)")
+            def route(sender: str, subject: str) -> List[str]:
+                # Filtrer par sujet si nécessaire
+                if subject_filter and subject_filter.lower() not in subject.lower():
+                    return []
+                return ['']
 
-                if status != "OK":
-                    continue
+            failed = set()
+            routed = self._route_messages(uids, route, failed)
+            self._download_routed(routed, {'': Path(output_folder)}, target_date, results, failed)
 
-                # Parser l'email
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
+            logger.info(f"Total de fichiers téléchargés: {len(results[''])}")
+            return results['']
 
-                        # Récupérer le sujet
-                        subject = self._decode_header_value(msg.get("Subject", ""))
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des pièces jointes: {e}")
+            return results['']
 
-                        # Filtrer par sujet si nécessaire
-                        if subject_filter and subject_filter.lower() not in subject.lower():
-                            continue
+    def scan_mailbox(self, routes: Dict[str, Optional[str]], target_date: Optional[date] = None,
+                     output_folder: str = "./temp",
+                     checkpoint: Optional[MailCheckpoint] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Récupère les pièces jointes de plusieurs fournisseurs en un seul passage sur la boîte
 
-                        # Récupérer l'expéditeur
-                        from_email = self._decode_header_value(msg.get("From", ""))
+        Une recherche sur la date, les ENVELOPE/BODYSTRUCTURE de tous les messages par lots,
+        le routage par expéditeur en local, puis uniquement les sections des pièces jointes:
+        le nombre d'échanges avec le serveur ne dépend pas du nombre de fournisseurs.
 
-                        logger.debug(f"Traitement email: {subject} de {from_email}")
+        Args:
+            routes: {clé fournisseur: filtre expéditeur (None: tous les messages)}
+            target_date: Date cible (par défaut aujourd'hui)
+            output_folder: Dossier racine (fichiers d'un fournisseur dans output_folder/<clé>)
+            checkpoint: Point de reprise: seuls les messages postérieurs au dernier UID traité
+                sont lus (recherche sur la date au premier passage ou si UIDVALIDITY a changé).
+                La nouvelle position y est enregistrée, sans sauvegarde sur disque.
 
-                        # Parcourir les pièces jointes
-                        for part in msg.walk():
-                            if part.get_content_maintype() == 'multipart':
-                                continue
-                            if part.get('Content-Disposition') is None:
-                                continue
+        Returns:
+            {clé fournisseur: liste des fichiers téléchargés, au format de fetch_attachments}
+        """
+        results: Dict[str, List[Dict[str, Any]]] = {key: [] for key in routes}
 
-                            filename = part.get_filename()
-                            if filename:
-                                filename = self._decode_header_value(filename)
+        if not self.connection:
+            logger.error("Pas de connexion active")
+            return results
 
-                                # Vérifier si c'est un fichier CSV ou Excel
-                                if not (filename.endswith('.csv') or
-                                       filename.endswith('.xlsx') or
-                                       filename.endswith('.xls')):
-                                    continue
+        if target_date is None:
+            target_date = date.today()
 
-                                # Sauvegarder la pièce jointe
-                                file_path = output_path / filename
-                                with open(file_path, 'wb') as f:
-                                    f.write(part.get_payload(decode=True))
+        try:
+            # Lecture seule: BODY.PEEK ne marque pas les messages comme lus
+            self.connection.select("INBOX", readonly=True)
 
-                                file_size = file_path.stat().st_size
+            uidvalidity = self._uidvalidity()
+            last_uid = None
+            if checkpoint is not None and uidvalidity is not None:
+                last_uid = checkpoint.imap_position(self.mailbox_key, uidvalidity)
 
-                                downloaded_files.append({
-                                    'filename': filename,
-                                    'file_path': str(file_path),
-                                    'file_size': file_size,
-                                    'sender': from_email,
-                                    'subject': subject,
-                                    'received_date': target_date,
-                                    'source': 'email'
-                                })
+            if last_uid is not None:
+                search_criteria = f'UID {last_uid + 1}:*'
+                logger.info(f"Reprise de la collecte après l'UID {last_uid}")
+            else:
+                search_criteria = f'(ON {target_date.strftime("%d-%b-%Y")})'
 
-                                logger.info(f"Fichier téléchargé: {filename} ({file_size} bytes)")
+            status, messages = self.connection.uid('SEARCH', None, search_criteria)
+            if status != "OK":
+                logger.warning("Aucun email trouvé")
+                return results
+
+            # "n:*" renvoie toujours au moins le dernier message, même déjà traité
+            uids = [int(uid) for uid in messages[0].split() if last_uid is None or int(uid) > last_uid]
+            logger.info(f"{len(uids)} email(s) à examiner ({search_criteria})")
+
+            def route(sender: str, subject: str) -> List[str]:
+                return [key for key, pattern in routes.items() if sender_matches(pattern, sender)]
+
+            failed = set()
+            routed = self._route_messages(uids, route, failed)
+            logger.info(f"{len(routed)} email(s) avec pièces jointes pour les fournisseurs")
+
+            folders = {key: Path(output_folder) / key for key in routes}
+            self._download_routed(routed, folders, target_date, results, failed)
+
+            if checkpoint is not None and uidvalidity is not None:
+                # Pas au-delà du premier message en échec: il sera relu à la prochaine collecte
+                processed = [uid for uid in uids if not failed or uid < min(failed)]
+                if last_uid is not None:
+                    processed.append(last_uid)
+                if processed:
+                    checkpoint.set_imap_position(self.mailbox_key, uidvalidity, max(processed))
 
-            logger.info(f"Total de fichiers téléchargés: {len(downloaded_files)}")
-            return downloaded_files
+            logger.info(f"Total de fichiers téléchargés: {sum(len(files) for files in results.values())}")
+            return results
 
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des pièces jointes: {e}")
-            return downloaded_files
+            logger.error(f"Erreur lors du parcours de la boîte email: {e}")
+            return results
+
+    def _uidvalidity(self) -> Optional[int]:
+        """UIDVALIDITY de la boîte sélectionnée (réponse au SELECT)"""
+        _, values = self.connection.response('UIDVALIDITY')
+        try:
+            return int(values[0])
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    # ==================== TÉLÉCHARGEMENT PAR SECTIONS ====================
+
+    def _route_messages(self, uids: List[int], route: Callable[[str, str], List[str]],
+                        failed: set) -> List[Dict[str, Any]]:
+        """
+        Lit ENVELOPE/BODYSTRUCTURE par lots et garde les messages ayant des pièces jointes utiles
+
+        Args:
+            route: (expéditeur, sujet) -> clés destinataires (liste vide: message ignoré)
+            failed: Complété avec les UID qui n'ont pas pu être lus
+        """
+        routed = []
+        for start in range(0, len(uids), self.HEADER_BATCH_SIZE):
+            batch = uids[start:start + self.HEADER_BATCH_SIZE]
+            uid_set = ','.join(str(uid) for uid in batch)
+            status, data = self.connection.uid('FETCH', uid_set, '(UID INTERNALDATE ENVELOPE BODYSTRUCTURE)')
+            if status != "OK":
+                logger.warning(f"Échec de lecture des en-têtes ({uid_set})")
+                failed.update(batch)
+                continue
+
+            for _, response in iter_fetch_responses(data):
+                parts = attachment_parts(response.get('BODYSTRUCTURE'))
+                if not parts or 'UID' not in response:
+                    continue
+
+                sender = envelope_sender(response.get('ENVELOPE'))
+                subject = envelope_subject(response.get('ENVELOPE'))
+                keys = route(sender, subject)
+                if keys:
+                    logger.debug(f"Traitement email: {subject} de {sender}")
+                    routed.append({
+                        'uid': response['UID'],
+                        'received_date': self._internal_date(response.get('INTERNALDATE')),
+                        'sender': sender,
+                        'subject': subject,
+                        'parts': parts,
+                        'keys': keys
+                    })
+        return routed
+
+    @staticmethod
+    def _internal_date(value: Optional[bytes]) -> Optional[date]:
+        """Date de réception du message (INTERNALDATE), indépendante de la locale"""
+        if not value:
+            return None
+        parsed = imaplib.Internaldate2tuple(b'INTERNALDATE "' + value + b'"')
+        return date(*parsed[:3]) if parsed else None
+
+    def _download_routed(self, routed: List[Dict[str, Any]], folders: Dict[str, Path],
+                         target_date: date, results: Dict[str, List[Dict[str, Any]]], failed: set):
+        """Télécharge les pièces jointes des messages routés (UID en échec ajoutés à failed)"""
+        # Petites pièces jointes: un FETCH par combinaison de sections, par lots bornés en volume
+        by_sections: Dict[tuple, List[Dict[str, Any]]] = {}
+        for message in routed:
+            small = tuple(p for p in message['parts'] if p.size <= self.STREAM_CHUNK_SIZE)
+            if small:
+                by_sections.setdefault(tuple(p.section for p in small), []).append(message)
+
+            # Grosses pièces jointes: par morceaux, directement dans le fichier
+            for part in message['parts']:
+                if part.size > self.STREAM_CHUNK_SIZE:
+                    if not self._store_part(message, part, folders, target_date, results,
+                                            lambda f, m=message, p=part: self._stream_section(m['uid'], p, f)):
+                        failed.add(message['uid'])
+
+        for sections, group in by_sections.items():
+            for batch in self._batches_by_size(group, sections):
+                contents = self._fetch_sections([m['uid'] for m in batch], sections)
+
+                for message in batch:
+                    for part in message['parts']:
+                        if part.section not in sections:
+                            continue
+                        payload = contents.get(message['uid'], {}).get(part.section)
+                        if payload is None:
+                            logger.warning(f"Pièce jointe absente de la réponse: {part.filename}")
+                            failed.add(message['uid'])
+                            continue
+                        if not self._store_part(message, part, folders, target_date, results,
+                                                lambda f, p=part, data=payload: self._write_decoded(f, p, [data])):
+                            failed.add(message['uid'])
+
+    def _batches_by_size(self, messages: List[Dict[str, Any]], sections: tuple) -> List[List[Dict[str, Any]]]:
+        """Découpe en lots dont le volume encodé cumulé reste sous PART_BATCH_BYTES"""
+        batches, batch, batch_bytes = [], [], 0
+        for message in messages:
+            size = sum(p.size for p in message['parts'] if p.section in sections)
+            if batch and batch_bytes + size > self.PART_BATCH_BYTES:
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(message)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _fetch_sections(self, uids: List[int], sections: tuple) -> Dict[int, Dict[str, bytes]]:
+        """Télécharge des sections BODY[...] pour un lot de messages: {uid: {section: contenu encodé}}"""
+        items = ' '.join(f"BODY.PEEK[{section}]" for section in sections)
+        status, data = self.connection.uid('FETCH', ','.join(str(uid) for uid in uids), f'(UID {items})')
+        if status != "OK":
+            logger.warning(f"Échec de téléchargement des pièces jointes ({len(uids)} email(s))")
+            return {}
+
+        contents = {}
+        for _, response in iter_fetch_responses(data):
+            if 'UID' not in response:
+                continue
+            contents[response['UID']] = {
+                section: response[f"BODY[{section}]"]
+                for section in sections
+                if isinstance(response.get(f"BODY[{section}]"), bytes)
+            }
+        return contents
+
+    def _stream_section(self, uid: int, part: AttachmentPart, f: BinaryIO):
+        """Télécharge une section par morceaux (BODY.PEEK[section]<début.longueur>) en décodant au fil de l'eau"""
+        def chunks():
+            offset = 0
+            while True:
+                status, data = self.connection.uid(
+                    'FETCH', str(uid), f'(UID BODY.PEEK[{part.section}]<{offset}.{self.STREAM_CHUNK_SIZE}>)'
+                )
+                if status != "OK":
+                    raise imaplib.IMAP4.error(f"Échec de téléchargement de {part.filename} (octet {offset})")
+
+                chunk = None
+                for _, response in iter_fetch_responses(data):
+                    chunk = response.get(f"BODY[{part.section}]<{offset}>", chunk)
+                if not chunk:
+                    return
+                yield chunk
+
+                offset += len(chunk)
+                if len(chunk) < self.STREAM_CHUNK_SIZE:
+                    return
+
+        self._write_decoded(f, part, chunks())
+
+    @staticmethod
+    def _write_decoded(f: BinaryIO, part: AttachmentPart, chunks):
+        decoder = PartDecoder(part.encoding)
+        for chunk in chunks:
+            f.write(decoder.feed(chunk))
+        f.write(decoder.flush())
+
+    def _store_part(self, message: Dict[str, Any], part: AttachmentPart, folders: Dict[str, Path],
+                    target_date: date, results: Dict[str, List[Dict[str, Any]]],
+                    write: Callable[[BinaryIO], None]) -> bool:
+        """
+        Écrit une pièce jointe une seule fois, puis la copie pour les autres clés destinataires
+
+        Chaque message a son propre dossier (UID): deux emails envoyant le même nom de
+        fichier ne s'écrasent pas, et une nouvelle collecte du même message réécrit le même fichier.
+        """
+        message_folder = Path(str(message['uid']))
+        if sum(1 for p in message['parts'] if p.filename == part.filename) > 1:
+            message_folder = message_folder / part.section  # Même nom deux fois dans le message
+
+        first_path = None
+        for key in message['keys']:
+            output_path = folders[key] / message_folder
+            output_path.mkdir(parents=True, exist_ok=True)
+            file_path = output_path / part.filename
+
+            if first_path is None:
+                tmp_path = file_path.with_name(file_path.name + '.part')
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        write(f)
+                    os.replace(tmp_path, file_path)
+                except Exception as e:
+                    logger.error(f"Erreur téléchargement de {part.filename}: {e}")
+                    tmp_path.unlink(missing_ok=True)
+                    return False
+                first_path = file_path
+            elif file_path != first_path:
+                shutil.copyfile(first_path, file_path)
+
+            file_info = _attachment_info(
+                file_path, part.filename, message['sender'], message['subject'],
+                message.get('received_date') or target_date, message['uid']
+            )
+            results[key].append(file_info)
+            logger.info(f"Fichier téléchargé: {part.filename} ({file_info['file_size']} bytes)")
+        return True
 
     def _decode_header_value(self, value: str) -> str:
         """Décode les valeurs d'en-tête email"""
@@ -184,12 +444,23 @@ class ExchangeFetcher:
     Nécessite la librairie exchangelib
     """
 
+    # Messages par page (FindItem) et par lot (GetItem)
+    PAGE_SIZE = 100
+    # Téléchargements de pièces jointes simultanés / taille des morceaux lus
+    MAX_DOWNLOAD_WORKERS = 4
+    STREAM_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self, email: str, password: str, server: str = "outlook.office365.com"):
         self.email = email
         self.password = password
         self.server = server
         self.account = None
 
+    @property
+    def mailbox_key(self) -> str:
+        """Identifiant de la boîte pour le point de reprise"""
+        return f"ews://{self.email}/inbox"
+
     def connect(self) -> bool:
         """Se connecte au serveur Exchange"""
         try:
@@ -225,10 +496,7 @@ class ExchangeFetcher:
         if target_date is None:
             target_date = date.today()
 
-        output_path = Path(output_folder)
-        output_path.mkdir(parents=True, exist_ok=True)
-
-        downloaded_files = []
+        results: Dict[str, List[Dict[str, Any]]] = {'': []}
 
         try:
             from exchangelib import Q
@@ -247,45 +515,175 @@ class ExchangeFetcher:
             if subject_filter:
                 query &= Q(subject__icontains=subject_filter)
 
-            # Rechercher les emails
-            items = self.account.inbox.filter(query).order_by('-datetime_received')
-
             logger.info(f"Recherche d'emails Exchange pour {target_date}")
 
-            for item in items:
-                # Parcourir les pièces jointes
-                for attachment in item.attachments:
-                    if hasattr(attachment, 'name'):
-                        filename = attachment.name
-
-                        # Vérifier si c'est un fichier CSV ou Excel
-                        if not (filename.endswith('.csv') or
-                               filename.endswith('.xlsx') or
-                               filename.endswith('.xls')):
-                            continue
+            self._download_items(query, lambda sender: [''], {'': Path(output_folder)}, results)
+
+            logger.info(f"Total de fichiers téléchargés depuis Exchange: {len(results[''])}")
+            return results['']
 
-                        # Sauvegarder la pièce jointe
-                        file_path = output_path / filename
-                        with open(file_path, 'wb') as f:
-                            f.write(attachment.content)
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des pièces jointes Exchange: {e}")
+            return results['']
+
+    def scan_mailbox(self, routes: Dict[str, Optional[str]], target_date: Optional[date] = None,
+                     output_folder: str = "./temp",
+                     checkpoint: Optional[MailCheckpoint] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Récupère les pièces jointes de plusieurs fournisseurs en une seule requête sur la boîte
 
-                        file_size = file_path.stat().st_size
+        Args et retour identiques à EmailFetcher.scan_mailbox. Le point de reprise est la date
+        de réception du dernier message traité (messages reçus à cette même date exclus par id).
+        """
+        results: Dict[str, List[Dict[str, Any]]] = {key: [] for key in routes}
 
-                        downloaded_files.append({
-                            'filename': filename,
-                            'file_path': str(file_path),
-                            'file_size': file_size,
-                            'sender': str(item.sender.email_address),
-                            'subject': item.subject,
-                            'received_date': target_date,
-                            'source': 'email'
-                        })
+        if not self.account:
+            logger.error("Pas de connexion Exchange active")
+            return results
 
-                        logger.info(f"Fichier téléchargé depuis Exchange: {filename}")
+        if target_date is None:
+            target_date = date.today()
 
-            logger.info(f"Total de fichiers téléchargés depuis Exchange: {len(downloaded_files)}")
-            return downloaded_files
+        try:
+            from exchangelib import Q
+            from datetime import datetime as dt, timedelta
+
+            position = checkpoint.exchange_position(self.mailbox_key) if checkpoint is not None else None
+            if position is not None:
+                query = Q(datetime_received__gte=position['last_received'])
+                logger.info(f"Reprise de la collecte Exchange après le {position['last_received']}")
+            else:
+                start_date = dt.combine(target_date, dt.min.time())
+                query = Q(datetime_received__range=(start_date, start_date + timedelta(days=1)))
+
+            def route(sender: str) -> List[str]:
+                return [key for key, pattern in routes.items() if sender_matches(pattern, sender)]
+
+            folders = {key: Path(output_folder) / key for key in routes}
+            received, failed = self._download_items(
+                query, route, folders, results, skip_ids=set(position['ids']) if position else set()
+            )
+
+            if checkpoint is not None:
+                self._advance_checkpoint(checkpoint, position, received, failed)
+
+            logger.info(f"Total de fichiers téléchargés depuis Exchange: {sum(len(f) for f in results.values())}")
+            return results
 
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des pièces jointes Exchange: {e}")
-            return downloaded_files
+            logger.error(f"Erreur lors du parcours de la boîte Exchange: {e}")
+            return results
+
+    # ==================== TÉLÉCHARGEMENT ====================
+
+    def _download_items(self, query, route: Callable[[str], List[str]], folders: Dict[str, Path],
+                        results: Dict[str, List[Dict[str, Any]]], skip_ids: set = frozenset()):
+        """
+        Parcourt les messages par pages et télécharge leurs pièces jointes en parallèle
+
+        Seuls expéditeur, sujet, date et métadonnées des pièces jointes sont chargés avec les
+        messages; le contenu est lu en flux, par morceaux, directement dans les fichiers.
+
+        Args:
+            route: expéditeur -> clés destinataires (liste vide: message ignoré)
+            skip_ids: Messages déjà traités (point de reprise)
+
+        Returns:
+            ({id: date de réception} des messages examinés, {id} des messages en échec)
+        """
+        from exchangelib import Q, FileAttachment
+
+        items = self.account.inbox.filter(query & Q(has_attachments=True)).only(
+            'sender', 'subject', 'datetime_received', 'attachments'
+        ).order_by('datetime_received')
+        items.page_size = self.PAGE_SIZE
+        items.chunk_size = self.PAGE_SIZE
+
+        received: Dict[str, Any] = {}
+        downloads = []  # [(id, future)], dans l'ordre de réception
+
+        with ThreadPoolExecutor(max_workers=self.MAX_DOWNLOAD_WORKERS, thread_name_prefix="ews") as pool:
+            for item in items:
+                if isinstance(item, Exception) or item.id in skip_ids:
+                    continue
+                received[item.id] = item.datetime_received
+
+                sender = str(item.sender.email_address) if item.sender else ""
+                keys = route(sender)
+                attachments = [
+                    a for a in item.attachments or []
+                    if isinstance(a, FileAttachment) and a.name and a.name.endswith(ATTACHMENT_EXTENSIONS)
+                ]
+                if keys and attachments:
+                    downloads.append((item.id, pool.submit(
+                        self._download_item, item, sender, attachments, keys, folders
+                    )))
+
+            logger.info(f"{len(received)} email(s) Exchange examiné(s), {len(downloads)} avec pièces jointes utiles")
+
+            failed = set()
+            for item_id, future in downloads:
+                try:
+                    for key, file_info in future.result():
+                        results[key].append(file_info)
+                except Exception as e:
+                    logger.error(f"Erreur pièces jointes Exchange: {e}")
+                    failed.add(item_id)
+
+        return received, failed
+
+    def _download_item(self, item, sender: str, attachments: list, keys: List[str],
+                       folders: Dict[str, Path]) -> List[tuple]:
+        """Télécharge les pièces jointes d'un message: [(clé, informations du fichier)]"""
+        # Un dossier par message: deux emails avec le même nom de fichier ne s'écrasent pas
+        message_folder = hashlib.sha1(item.id.encode('utf-8')).hexdigest()[:12]
+        received_at = item.datetime_received
+        files = []
+
+        for attachment in attachments:
+            first_path = None
+            for key in keys:
+                output_path = folders[key] / message_folder
+                output_path.mkdir(parents=True, exist_ok=True)
+                file_path = output_path / attachment.name
+
+                if first_path is None:
+                    self._stream_attachment(attachment, file_path)
+                    first_path = file_path
+                elif file_path != first_path:
+                    shutil.copyfile(first_path, file_path)
+
+                files.append((key, _attachment_info(
+                    file_path, attachment.name, sender, item.subject or "", received_at.date(), received_at
+                )))
+                logger.info(f"Fichier téléchargé depuis Exchange: {attachment.name}")
+        return files
+
+    def _stream_attachment(self, attachment, file_path: Path):
+        """Écrit le contenu d'une pièce jointe par morceaux (GetAttachment en flux)"""
+        tmp_path = file_path.with_name(file_path.name + '.part')
+        try:
+            with attachment.fp as fp, open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: fp.read(self.STREAM_CHUNK_SIZE), b''):
+                    f.write(chunk)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def _advance_checkpoint(self, checkpoint: MailCheckpoint, position: Optional[Dict[str, Any]],
+                            received: Dict[str, Any], failed: set):
+        """Nouvelle position: dernier message traité, sans dépasser le premier message en échec"""
+        if failed:
+            first_failure = min(received[item_id] for item_id in failed)
+            received = {item_id: at for item_id, at in received.items() if at < first_failure}
+        if not received:
+            if failed and position is None:
+                checkpoint.set_exchange_position(self.mailbox_key, first_failure, [])
+            return
+
+        last_received = max(received.values())
+        ids = [item_id for item_id, at in received.items() if at == last_received]
+        if position is not None and last_received == position['last_received']:
+            ids = list(set(ids) | set(position['ids']))
+        checkpoint.set_exchange_position(self.mailbox_key, last_received, ids)
@@ -0,0 +1,119 @@
+"""
+Empreinte d'un fichier collecté, calculée en une lecture par blocs
+Le nombre de lignes est obtenu pendant cette même lecture (CSV: fins de ligne
+comptées au passage) ou depuis les métadonnées du classeur (XLSX: dimensions de
+la feuille), sans relire le fichier dans un DataFrame.
+"""
+
+import hashlib
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Optional, Union
+from loguru import logger
+
+
+# Élément <dimension ref="A1:F120"/> d'une feuille XLSX (situé avant les données)
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="[A-Z]*(\d+)(?::[A-Z]*(\d+))?"')
+_SHEET_HEAD_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    """Empreinte SHA-256, taille et nombre de lignes de données d'un fichier"""
+    sha256: str
+    size: int
+    row_count: Optional[int] = None  # Hors en-tête, comme len(DataFrame); None si inconnu
+
+
+def digest_file(file_path: Union[str, Path], chunk_size: int = 1024 * 1024) -> FileDigest:
+    """Calcule l'empreinte d'un fichier sans le charger en mémoire"""
+    file_path = Path(file_path)
+    extension = file_path.suffix.lower()
+
+    sha256 = hashlib.sha256()
+    size = 0
+    newlines = 0
+    last_byte = b''
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+            size += len(chunk)
+            if extension == '.csv':
+                newlines += chunk.count(b'\n')
+                last_byte = chunk[-1:]
+
+    row_count = None
+    if extension == '.csv':
+        row_count = _csv_row_count(size, newlines, last_byte)
+    elif extension == '.xlsx':
+        row_count = _xlsx_row_count(file_path)
+    elif extension == '.xls':
+        row_count = _xls_row_count(file_path)
+
+    return FileDigest(sha256=sha256.hexdigest(), size=size, row_count=row_count)
+
+
+def _csv_row_count(size: int, newlines: int, last_byte: bytes) -> int:
+    """Lignes du fichier (dernière ligne sans fin de ligne comprise), moins l'en-tête
+
+    La première ligne est toujours comptée comme en-tête, comme FileProcessor.read_file (header=0).
+    """
+    if not size:
+        return 0
+    lines = newlines + (0 if last_byte == b'\n' else 1)
+    return max(lines - 1, 0)
+
+
+def _xlsx_row_count(file_path: Path) -> Optional[int]:
+    """Lignes de la première feuille d'après son élément <dimension>, moins l'en-tête"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            sheet_path = _xlsx_first_sheet(archive)
+            if sheet_path is None:
+                return None
+            with archive.open(sheet_path) as sheet:
+                match = _DIMENSION.search(sheet.read(_SHEET_HEAD_SIZE))
+    except Exception as e:
+        logger.debug(f"Dimensions illisibles pour {file_path.name}: {e}")
+        return None
+
+    if not match:
+        return None  # Élément facultatif, absent chez certains générateurs
+    first_row = int(match.group(1))
+    last_row = int(match.group(2) or first_row)
+    return max(last_row - first_row, 0)
+
+
+def _xlsx_first_sheet(archive: zipfile.ZipFile) -> Optional[str]:
+    """Chemin dans l'archive de la première feuille du classeur (ordre de workbook.xml)"""
+    workbook = archive.read('xl/workbook.xml')
+    sheet = re.search(rb'<(?:\w+:)?sheet\b[^>]*?\b\w+:id="([^"]+)"', workbook)
+    if not sheet:
+        return None
+
+    relations = archive.read('xl/_rels/workbook.xml.rels')
+    for relation in re.finditer(rb'<(?:\w+:)?Relationship\b[^>]*>', relations):
+        if re.search(rb'\bId="' + re.escape(sheet.group(1)) + rb'"', relation.group(0)):
+            target = re.search(rb'\bTarget="([^"]+)"', relation.group(0))
+            if not target:
+                return None
+            target = target.group(1).decode('utf-8')
+            # Cible relative au dossier xl/, ou absolue depuis la racine de l'archive
+            return target.lstrip('/') if target.startswith('/') else str(PurePosixPath('xl') / target)
+    return None
+
+
+def _xls_row_count(file_path: Path) -> Optional[int]:
+    """Lignes de la première feuille d'un classeur Excel 97-2003, moins l'en-tête"""
+    try:
+        import xlrd
+        workbook = xlrd.open_workbook(str(file_path), on_demand=True)
+        try:
+            return max(workbook.sheet_by_index(0).nrows - 1, 0)
+        finally:
+            workbook.release_resources()
+    except Exception as e:
+        logger.debug(f"Dimensions illisibles pour {file_path.name}: {e}")
+        return None
@@ -3,29 +3,49 @@ Module pour récupérer les fichiers depuis un serveur FTP/SFTP
 """
 
 import os
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime, date
 from pathlib import Path
 from loguru import logger
 import paramiko
 from stat import S_ISDIR
 
+from worker.sftp_pool import sftp_pool
+from app.services.file_cache import file_cache
+from app.services.directory_snapshot import DirectorySnapshot, SnapshotDiff
+from app.services.supplier_classifier import match_patterns
+
 
 class FTPFetcher:
     """Classe pour récupérer les fichiers depuis un serveur SFTP"""
 
-    def __init__(self, host: str, port: int, username: str, password: str, use_sftp: bool = True):
+    def __init__(self, host: str, port: int, username: str, password: str, use_sftp: bool = True,
+                 pooled: bool = True):
+        """
+        Args:
+            pooled: Si True, emprunte un canal au pool SFTP partagé (sftp_pool)
+                    au lieu d'ouvrir une connexion SSH dédiée
+        """
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.use_sftp = use_sftp
+        self.pooled = pooled
         self.transport = None
         self.sftp = None
 
     def connect(self) -> bool:
         """Se connecte au serveur SFTP"""
         try:
+            if self.pooled:
+                self.sftp = sftp_pool.acquire(self.host, self.port, self.username, self.password)
+                logger.debug(f"Canal SFTP emprunté au pool: {self.host}:{self.port}")
+                return True
+
             self.transport = paramiko.Transport((self.host, self.port))
             self.transport.connect(username=self.username, password=self.password)
             self.sftp = paramiko.SFTPClient.from_transport(self.transport)
@@ -36,7 +56,13 @@ class FTPFetcher:
             return False
 
     def disconnect(self):
-        """Déconnecte du serveur"""
+        """Déconnecte du serveur (ou rend le canal au pool)"""
+        if self.pooled:
+            sftp_pool.release(self.sftp)
+            self.sftp = None
+            logger.debug("Canal SFTP rendu au pool")
+            return
+
         if self.sftp:
             self.sftp.close()
         if self.transport:
@@ -58,29 +84,62 @@ class FTPFetcher:
             exclude_dirs = ['old']  # Par défaut, exclure le dossier 'old'
 
         try:
-            files = []
-            for entry in self.sftp.listdir_attr(remote_path):
-                # Ignorer les dossiers exclus
-                if S_ISDIR(entry.st_mode):
-                    if entry.filename in exclude_dirs:
-                        logger.debug(f"Dossier exclu: {entry.filename}")
-                    continue
-
-                # Ajouter uniquement les fichiers (pas les dossiers)
-                if not S_ISDIR(entry.st_mode):
-                    file_info = {
-                        'filename': entry.filename,
-                        'size': entry.st_size,
-                        'modified': datetime.fromtimestamp(entry.st_mtime)
-                    }
-                    files.append(file_info)
-
+            files = self._list_entries(remote_path, exclude_dirs)
             logger.info(f"{len(files)} fichier(s) trouvé(s) dans {remote_path} (dossiers exclus: {exclude_dirs})")
             return files
         except Exception as e:
             logger.error(f"Erreur lors du listage des fichiers: {e}")
             return []
 
+    def sync_directory(self, snapshot: DirectorySnapshot, exclude_dirs: List[str] = None,
+                       full_resync_interval: int = 300) -> SnapshotDiff:
+        """Met à jour un instantané du répertoire distant et retourne uniquement les différences
+
+        Si la date de modification du répertoire n'a pas changé depuis le dernier listage,
+        aucun listage n'est fait (un simple stat). Un listage complet est tout de même forcé
+        toutes les full_resync_interval secondes, car la modification d'un fichier existant
+        ne change pas la date du répertoire.
+
+        Lève une exception en cas d'erreur (l'instantané n'est alors pas modifié).
+        """
+        if not self.sftp:
+            raise ConnectionError("Pas de connexion SFTP active")
+
+        if exclude_dirs is None:
+            exclude_dirs = ['old']
+
+        remote_path = snapshot.remote_path
+        dir_mtime = self.sftp.stat(remote_path).st_mtime
+
+        if (snapshot.dir_mtime is not None
+                and dir_mtime == snapshot.dir_mtime
+                and time.time() - snapshot.listed_at < full_resync_interval):
+            logger.debug(f"Répertoire {remote_path} inchangé, listage ignoré")
+            return SnapshotDiff()
+
+        files = self._list_entries(remote_path, exclude_dirs)
+        diff = snapshot.apply(files, dir_mtime=dir_mtime)
+        logger.info(f"{len(files)} fichier(s) dans {remote_path} ({diff})")
+        return diff
+
+    def _list_entries(self, remote_path: str, exclude_dirs: List[str]) -> List[Dict[str, Any]]:
+        """Liste les fichiers (hors dossiers) d'un répertoire distant, lève une exception en cas d'erreur"""
+        files = []
+        for entry in self.sftp.listdir_attr(remote_path):
+            # Ignorer les dossiers exclus
+            if S_ISDIR(entry.st_mode):
+                if entry.filename in exclude_dirs:
+                    logger.debug(f"Dossier exclu: {entry.filename}")
+                continue
+
+            # Ajouter uniquement les fichiers (pas les dossiers)
+            files.append({
+                'filename': entry.filename,
+                'size': entry.st_size,
+                'modified': datetime.fromtimestamp(entry.st_mtime)
+            })
+        return files
+
     def download_file(self, remote_file: str, local_path: str) -> bool:
         """Télécharge un fichier depuis le serveur"""
         if not self.sftp:
@@ -98,6 +157,175 @@ class FTPFetcher:
             logger.error(f"Erreur lors du téléchargement de {remote_file}: {e}")
             return False
 
+    def download_files(self, transfers: List[Dict[str, Any]], max_workers: int = 4, retries: int = 2,
+                       progress_callback: Optional[Callable[[int, int, int, int], None]] = None) -> Dict[str, bool]:
+        """
+        Télécharge plusieurs fichiers en parallèle sur plusieurs canaux SFTP
+
+        Args:
+            transfers: Liste de dicts {'remote_file': str, 'local_path': str, 'size': int (optionnel)}
+            max_workers: Nombre maximum de téléchargements simultanés
+            retries: Nombre de nouvelles tentatives par fichier en cas d'échec
+            progress_callback: Appelé avec (fichiers terminés, fichiers total, octets reçus, octets total)
+                               depuis les threads de téléchargement
+
+        Returns:
+            Dict {remote_file: succès}
+        """
+        if not transfers:
+            return {}
+
+        if not self.sftp:
+            logger.error("Pas de connexion SFTP active")
+            return {t['remote_file']: False for t in transfers}
+
+        files_total = len(transfers)
+        progress_lock = threading.Lock()
+        # Octets reçus par fichier (la dernière valeur du callback paramiko fait foi, même après un retry)
+        bytes_by_file: Dict[str, int] = {}
+        sizes: Dict[str, int] = {t['remote_file']: t.get('size') or 0 for t in transfers}
+        state = {'files_done': 0}
+
+        def report():
+            if progress_callback:
+                progress_callback(state['files_done'], files_total,
+                                  sum(bytes_by_file.values()), sum(sizes.values()))
+
+        def transfer(item: Dict[str, Any]) -> bool:
+            remote_file = item['remote_file']
+            local_path = item['local_path']
+            Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+
+            def on_bytes(transferred: int, total: int):
+                with progress_lock:
+                    bytes_by_file[remote_file] = transferred
+                    if total and not sizes.get(remote_file):
+                        sizes[remote_file] = total
+                    report()
+
+            for attempt in range(retries + 1):
+                sftp = None
+                failed = False
+                try:
+                    sftp = self._open_worker_channel()
+                    sftp.get(remote_file, local_path, callback=on_bytes)
+                    return True
+                except Exception as e:
+                    failed = True
+                    if attempt < retries:
+                        logger.warning(f"Échec téléchargement {remote_file} (tentative {attempt + 1}/{retries + 1}): {e}")
+                        time.sleep(0.5 * (attempt + 1))
+                    else:
+                        logger.error(f"Erreur lors du téléchargement de {remote_file}: {e}")
+                finally:
+                    self._close_worker_channel(sftp, discard=failed)
+            return False
+
+        results: Dict[str, bool] = {}
+        workers = max(1, min(max_workers, files_total))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sftp-download") as executor:
+            futures = {executor.submit(transfer, item): item['remote_file'] for item in transfers}
+            for future in as_completed(futures):
+                remote_file = futures[future]
+                results[remote_file] = future.result()
+                with progress_lock:
+                    state['files_done'] += 1
+                    report()
+
+        success_count = sum(1 for ok in results.values() if ok)
+        logger.info(f"{success_count}/{files_total} fichier(s) téléchargé(s) en parallèle ({workers} canaux)")
+        return results
+
+    def fetch_cached(self, files: List[Dict[str, Any]], max_workers: int = 4,
+                     progress_callback: Optional[Callable[[int, int, int, int], None]] = None) -> Dict[str, Path]:
+        """
+        Retourne des copies locales des fichiers distants en passant par le cache disque
+
+        Les fichiers déjà en cache (même chemin, taille et date de modification) ne
+        génèrent aucun accès réseau; la connexion n'est ouverte que s'il reste des
+        fichiers à télécharger.
+
+        Args:
+            files: Liste de dicts {'remote_file': str, 'size': int, 'modified': datetime}
+                   (taille et date sont récupérées sur le serveur si absentes)
+
+        Returns:
+            Dict {remote_file: chemin local dans le cache} des fichiers disponibles
+        """
+        local_files: Dict[str, Path] = {}
+        misses = []
+
+        for file_info in files:
+            remote_file = file_info['remote_file']
+            if file_info.get('size') is not None and file_info.get('modified') is not None:
+                cached = file_cache.get(remote_file, file_info['size'], file_info['modified'])
+                if cached:
+                    local_files[remote_file] = cached
+                    continue
+            misses.append(dict(file_info))
+
+        if not misses:
+            logger.debug(f"{len(local_files)} fichier(s) servi(s) depuis le cache")
+            return local_files
+
+        connected_here = self.sftp is None
+        if connected_here and not self.connect():
+            return local_files
+
+        try:
+            transfers = []
+            for file_info in misses:
+                remote_file = file_info['remote_file']
+
+                if file_info.get('size') is None or file_info.get('modified') is None:
+                    attrs = self.sftp.stat(remote_file)
+                    file_info['size'] = attrs.st_size
+                    file_info['modified'] = datetime.fromtimestamp(attrs.st_mtime)
+                    cached = file_cache.get(remote_file, file_info['size'], file_info['modified'])
+                    if cached:
+                        local_files[remote_file] = cached
+                        continue
+
+                file_info['local_path'] = str(file_cache.reserve_path(remote_file, file_info['size'], file_info['modified']))
+                transfers.append(file_info)
+
+            results = self.download_files(transfers, max_workers=max_workers, progress_callback=progress_callback)
+
+            for file_info in transfers:
+                remote_file = file_info['remote_file']
+                if results.get(remote_file):
+                    cached = file_cache.commit(remote_file, file_info['size'], file_info['modified'], file_info['local_path'])
+                    if cached:
+                        local_files[remote_file] = cached
+                else:
+                    Path(file_info['local_path']).unlink(missing_ok=True)
+
+            logger.info(f"{len(files) - len(transfers)} fichier(s) en cache, {len(transfers)} téléchargé(s)")
+            return local_files
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des fichiers: {e}")
+            return local_files
+
+        finally:
+            if connected_here:
+                self.disconnect()
+
+    def _open_worker_channel(self) -> paramiko.SFTPClient:
+        """Ouvre un canal SFTP supplémentaire pour un thread de téléchargement"""
+        if self.pooled:
+            return sftp_pool.acquire(self.host, self.port, self.username, self.password)
+        return paramiko.SFTPClient.from_transport(self.transport)
+
+    def _close_worker_channel(self, sftp: Optional[paramiko.SFTPClient], discard: bool = False):
+        if sftp is None:
+            return
+        if self.pooled:
+            sftp_pool.release(sftp, discard=discard)
+        else:
+            sftp.close()
+
     def fetch_files_by_pattern(self, remote_path: str, file_patterns: List[str],
                               target_date: Optional[date] = None,
                               output_folder: str = "./temp") -> List[Dict[str, Any]]:
@@ -129,6 +357,7 @@ class FTPFetcher:
             # Lister tous les fichiers du répertoire
             all_files = self.list_files(remote_path)
 
+            matching_files = []
             for file_info in all_files:
                 filename = file_info['filename']
 
@@ -142,14 +371,18 @@ class FTPFetcher:
                     if file_date != target_date:
                         continue
 
-                # Télécharger le fichier
-                remote_file = f"{remote_path}/{filename}".replace('//', '/')
-                local_file = output_path / filename
+                file_info['remote_file'] = f"{remote_path}/{filename}".replace('//', '/')
+                file_info['local_path'] = str(output_path / filename)
+                matching_files.append(file_info)
+
+            # Télécharger les fichiers en parallèle
+            results = self.download_files(matching_files)
 
-                if self.download_file(remote_file, str(local_file)):
+            for file_info in matching_files:
+                if results.get(file_info['remote_file']):
                     downloaded_files.append({
-                        'filename': filename,
-                        'file_path': str(local_file),
+                        'filename': file_info['filename'],
+                        'file_path': file_info['local_path'],
                         'file_size': file_info['size'],
                         'modified_date': file_info['modified'],
                         'received_date': target_date,
@@ -165,12 +398,7 @@ class FTPFetcher:
 
     def _match_patterns(self, filename: str, patterns: List[str]) -> bool:
         """Vérifie si un nom de fichier correspond à un des patterns"""
-        import fnmatch
-
-        for pattern in patterns:
-            if fnmatch.fnmatch(filename, pattern):
-                return True
-        return False
+        return match_patterns(filename, patterns)
 
     def upload_file(self, local_file: str, remote_path: str) -> bool:
         """
@@ -227,6 +455,9 @@ class FTPFetcher:
             # Déplacer le fichier (renommer)
             self.sftp.rename(remote_file, destination)
 
+            # Le fichier n'existe plus à cet emplacement: retirer ses copies du cache
+            file_cache.invalidate(remote_file)
+
             logger.info(f"Fichier archivé: {remote_file} -> {destination}")
             return True
 
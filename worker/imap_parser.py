@@ -0,0 +1,298 @@
+"""
+Analyse des réponses FETCH IMAP (ENVELOPE, BODYSTRUCTURE, BODY[section])
+imaplib renvoie les réponses brutes: ce module les regroupe par message et les
+transforme en structures Python, pour ne télécharger que les pièces jointes utiles.
+"""
+
+import base64
+import quopri
+import re
+from dataclasses import dataclass
+from email.header import decode_header
+from itertools import takewhile
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from urllib.parse import unquote
+
+
+# Extensions des pièces jointes de commande
+ATTACHMENT_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+_TOKEN = re.compile(
+    rb'\s*(?:'
+    rb'(\()'                                    # début de liste
+    rb'|(\))'                                   # fin de liste
+    rb'|"((?:[^"\\]|\\.)*)"'                    # chaîne entre guillemets
+    rb'|\{(\d+)\}\s*$'                          # annonce de littéral (contenu dans le segment suivant)
+    rb'|([^\s()"\[]+(?:\[[^\]]*\](?:<[\d.]+>)?)?)'  # atome, ex: BODY[1.2]<0>
+    rb')'
+)
+_NOT_BASE64 = re.compile(rb'[^A-Za-z0-9+/]')
+
+
+class _Literal(bytes):
+    """Contenu d'un littéral IMAP ({n} suivi de n octets)"""
+
+
+@dataclass(frozen=True)
+class AttachmentPart:
+    """Pièce jointe décrite par BODYSTRUCTURE"""
+    section: str        # Numéro de section pour BODY[section], ex: "2" ou "1.2"
+    filename: str
+    encoding: str       # Content-Transfer-Encoding (base64, quoted-printable, 7bit...)
+    size: int           # Taille encodée en octets
+
+
+# ==================== RÉPONSES FETCH ====================
+
+def iter_fetch_responses(data: List[Any]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Regroupe la réponse d'imaplib (fetch / uid fetch) par message
+
+    Chaque message correspond à zéro ou plusieurs tuples (texte, littéral)
+    suivis d'une ligne de texte finale.
+
+    Yields:
+        (numéro de séquence, {'UID': 12, 'ENVELOPE': [...], 'BODY[2]': b'...'})
+    """
+    segments = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            segments.append(item[0])
+            segments.append(_Literal(item[1]))
+            continue
+
+        segments.append(item)
+        parsed = _parse(segments)
+        segments = []
+
+        if len(parsed) < 2 or not isinstance(parsed[1], list):
+            continue
+        try:
+            sequence = int(parsed[0])
+        except (TypeError, ValueError):
+            continue
+        yield sequence, _to_dict(parsed[1])
+
+
+def _parse(segments: List[bytes]) -> List[Any]:
+    """Transforme une réponse en listes imbriquées (atomes et chaînes en bytes, NIL en None)"""
+    stack: List[List[Any]] = [[]]
+    for segment in segments:
+        if isinstance(segment, _Literal):
+            stack[-1].append(bytes(segment))
+            continue
+
+        position = 0
+        while position < len(segment):
+            match = _TOKEN.match(segment, position)
+            if not match or match.end() == position:
+                break
+            position = match.end()
+            opening, closing, quoted, literal, atom = match.groups()
+
+            if opening:
+                child: List[Any] = []
+                stack[-1].append(child)
+                stack.append(child)
+            elif closing:
+                if len(stack) > 1:
+                    stack.pop()
+            elif quoted is not None:
+                stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted))
+            elif literal is not None:
+                continue
+            else:
+                stack[-1].append(None if atom.upper() == b'NIL' else atom)
+    return stack[0]
+
+
+def _to_dict(items: List[Any]) -> Dict[str, Any]:
+    result = {}
+    for key, value in zip(items[0::2], items[1::2]):
+        if not isinstance(key, bytes):
+            continue
+        name = key.decode('ascii', errors='ignore').upper()
+        if name == 'UID' and value is not None:
+            value = int(value)
+        result[name] = value
+    return result
+
+
+# ==================== ENVELOPE ====================
+
+def decode_text(value: Optional[bytes]) -> str:
+    """Décode une valeur d'en-tête (RFC 2047)"""
+    if not value:
+        return ""
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='ignore')
+
+    decoded_value = ""
+    for part, encoding in decode_header(value):
+        if isinstance(part, bytes):
+            decoded_value += part.decode(encoding or 'utf-8', errors='ignore')
+        else:
+            decoded_value += part
+    return decoded_value
+
+
+def envelope_sender(envelope: List[Any]) -> str:
+    """Expéditeur d'une ENVELOPE au format de l'en-tête From: 'Nom <adresse>'"""
+    if not envelope or len(envelope) < 3 or not envelope[2]:
+        return ""
+
+    name, _, mailbox, host = (list(envelope[2][0]) + [None] * 4)[:4]
+    address = decode_text(mailbox)
+    if host:
+        address = f"{address}@{decode_text(host)}"
+    name = decode_text(name)
+    return f"{name} <{address}>" if name else address
+
+
+def envelope_subject(envelope: List[Any]) -> str:
+    return decode_text(envelope[1]) if envelope and len(envelope) > 1 else ""
+
+
+def sender_matches(pattern: Optional[str], sender: str) -> bool:
+    """Même règle que le critère IMAP FROM: sous-chaîne, insensible à la casse (pas de filtre: tout correspond)"""
+    return not pattern or pattern.lower() in sender.lower()
+
+
+# ==================== BODYSTRUCTURE ====================
+
+def attachment_parts(structure: List[Any],
+                     extensions: Tuple[str, ...] = ATTACHMENT_EXTENSIONS) -> List[AttachmentPart]:
+    """Pièces jointes (avec Content-Disposition et nom de fichier) dont l'extension est attendue"""
+    parts = []
+    if not isinstance(structure, list) or not structure:
+        return parts
+
+    for section, part in _walk(structure, '', True):
+        filename = _part_filename(part)
+        if not filename or not filename.endswith(extensions):
+            continue
+        parts.append(AttachmentPart(
+            section=section,
+            filename=filename,
+            encoding=decode_text(part[5]).lower() if len(part) > 5 and part[5] else '7bit',
+            size=_to_int(part[6]) if len(part) > 6 else 0
+        ))
+    return parts
+
+
+def _walk(structure: List[Any], section: str, message_body: bool) -> Iterator[Tuple[str, List[Any]]]:
+    """Parcourt les parties terminales avec leur numéro de section (RFC 3501 §6.4.5)"""
+    if isinstance(structure[0], list):
+        children = takewhile(lambda child: isinstance(child, list), structure)
+        for number, child in enumerate(children, 1):
+            yield from _walk(child, f"{section}.{number}" if section else str(number), False)
+        return
+
+    if message_body:
+        section = f"{section}.1" if section else "1"
+    yield section, structure
+
+    # Message joint (message/rfc822): parcourir aussi son contenu
+    if _lower(structure[0]) == 'message' and _lower(structure[1]) == 'rfc822' \
+            and len(structure) > 8 and isinstance(structure[8], list):
+        yield from _walk(structure[8], section, True)
+
+
+def _part_filename(part: List[Any]) -> Optional[str]:
+    disposition = part[_disposition_index(part)] if len(part) > _disposition_index(part) else None
+    if not isinstance(disposition, list):
+        return None  # Pas de Content-Disposition
+
+    disposition_params = _params(disposition[1] if len(disposition) > 1 else None)
+    type_params = _params(part[2] if len(part) > 2 else None)
+
+    for params, name in ((disposition_params, 'filename'), (type_params, 'name')):
+        if f"{name}*" in params:
+            return _decode_rfc2231(params[f"{name}*"])
+        if name in params:
+            return decode_text(params[name].encode('utf-8', errors='ignore'))
+    return None
+
+
+def _decode_rfc2231(value: str) -> str:
+    """Paramètre étendu RFC 2231: charset'langue'valeur%XX"""
+    if value.count("'") < 2:
+        return unquote(value)
+    charset, _, encoded = value.split("'", 2)
+    try:
+        return unquote(encoded, encoding=charset or 'utf-8', errors='replace')
+    except LookupError:
+        return unquote(encoded, errors='replace')
+
+
+def _disposition_index(part: List[Any]) -> int:
+    main_type, sub_type = _lower(part[0]), _lower(part[1])
+    if main_type == 'text':
+        return 9  # + nombre de lignes
+    if main_type == 'message' and sub_type == 'rfc822':
+        return 11  # + envelope, body, nombre de lignes
+    return 8
+
+
+def _params(values: Optional[List[Any]]) -> Dict[str, str]:
+    if not isinstance(values, list):
+        return {}
+    return {
+        _lower(key): value.decode('utf-8', errors='ignore') if isinstance(value, bytes) else ''
+        for key, value in zip(values[0::2], values[1::2])
+    }
+
+
+def _lower(value: Any) -> str:
+    return value.decode('ascii', errors='ignore').lower() if isinstance(value, bytes) else ''
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+# ==================== CONTENU ====================
+
+class PartDecoder:
+    """Décodage incrémental d'une section reçue par morceaux (Content-Transfer-Encoding)"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._pending = b''
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == 'base64':
+            # Retours à la ligne ignorés, décodage par groupes complets de 4 caractères
+            data = self._pending + _NOT_BASE64.sub(b'', data)
+            usable = len(data) - len(data) % 4
+            self._pending = data[usable:]
+            return base64.b64decode(data[:usable])
+        if self.encoding == 'quoted-printable':
+            # Décodage par lignes complètes (une séquence =XX ne peut pas être coupée)
+            data = self._pending + data
+            cut = data.rfind(b'\n') + 1
+            self._pending = data[cut:]
+            return quopri.decodestring(data[:cut])
+        return data
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        if not pending:
+            return b''
+        if self.encoding == 'base64':
+            if len(pending) % 4 == 1:
+                return b''  # Caractère isolé: fin de section tronquée
+            # Remplissage final éventuellement manquant
+            return base64.b64decode(pending + b'=' * (-len(pending) % 4))
+        return quopri.decodestring(pending)
+
+
+def decode_part(payload: bytes, encoding: str) -> bytes:
+    """Décode le contenu complet d'une section selon son Content-Transfer-Encoding"""
+    decoder = PartDecoder(encoding)
+    return decoder.feed(payload) + decoder.flush()
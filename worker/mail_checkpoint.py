@@ -0,0 +1,95 @@
+"""
+Point de reprise de la collecte email, par boîte
+IMAP: UIDVALIDITY + plus grand UID traité. Exchange: date de réception du dernier
+message traité (+ identifiants reçus à cette même date).
+Les collectes suivantes, y compris plusieurs fois par jour, ne lisent que les nouveaux messages.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Union
+from loguru import logger
+
+
+class MailCheckpoint:
+    """Positions de collecte des boîtes email, sauvegardées sur disque"""
+
+    def __init__(self, checkpoint_file: Optional[str] = None):
+        """
+        Args:
+            checkpoint_file: Fichier JSON (env MAIL_CHECKPOINT_FILE, ./state/mail_checkpoints.json par défaut)
+        """
+        if checkpoint_file is None:
+            checkpoint_file = os.getenv("MAIL_CHECKPOINT_FILE", "./state/mail_checkpoints.json")
+        self.checkpoint_file = Path(checkpoint_file)
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    # ==================== IMAP ====================
+
+    def imap_position(self, mailbox: str, uidvalidity: int) -> Optional[int]:
+        """Dernier UID traité, ou None si inconnu ou si UIDVALIDITY a changé (UID réattribués)"""
+        position = self.positions.get(mailbox)
+        if not position or position.get('uidvalidity') != uidvalidity:
+            return None
+        return position.get('last_uid')
+
+    def set_imap_position(self, mailbox: str, uidvalidity: int, last_uid: int):
+        self.positions[mailbox] = {'uidvalidity': uidvalidity, 'last_uid': last_uid}
+
+    # ==================== EXCHANGE ====================
+
+    def exchange_position(self, mailbox: str) -> Optional[Dict[str, Any]]:
+        """{'last_received': datetime, 'ids': [identifiants reçus à cette date]} ou None"""
+        position = self.positions.get(mailbox)
+        if not position or not position.get('last_received'):
+            return None
+        return {
+            'last_received': datetime.fromisoformat(position['last_received']),
+            'ids': list(position.get('ids', []))
+        }
+
+    def set_exchange_position(self, mailbox: str, last_received: datetime, ids):
+        self.positions[mailbox] = {'last_received': last_received.isoformat(), 'ids': list(ids)}
+
+    # ==================== REPRISE ====================
+
+    def rewind(self, mailbox: str, position: Union[int, datetime]):
+        """Recule le point de reprise pour que le message à cette position soit relu (ex: échec d'upload)"""
+        current = self.positions.get(mailbox)
+        if not current:
+            return
+
+        if isinstance(position, datetime):
+            last_received = current.get('last_received')
+            if last_received is None or position <= datetime.fromisoformat(last_received):
+                current['last_received'] = position.isoformat()
+                current['ids'] = []
+        elif current.get('last_uid') is not None:
+            current['last_uid'] = min(current['last_uid'], int(position) - 1)
+
+    # ==================== PERSISTANCE ====================
+
+    def load(self):
+        """Charge les positions sauvegardées (aucune si le fichier est absent ou illisible)"""
+        if not self.checkpoint_file.exists():
+            return
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                self.positions = json.load(f).get('mailboxes', {})
+        except Exception as e:
+            logger.warning(f"Point de reprise email illisible, collecte complète: {e}")
+            self.positions = {}
+
+    def save(self):
+        """Sauvegarde les positions (remplacement atomique du fichier)"""
+        try:
+            self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.checkpoint_file.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'mailboxes': self.positions}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.checkpoint_file)
+        except Exception as e:
+            logger.error(f"Erreur sauvegarde du point de reprise email: {e}")
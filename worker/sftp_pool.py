@@ -0,0 +1,280 @@
+"""
+Pool de sessions SFTP partagé par tout le processus
+Évite de refaire la négociation SSH + l'authentification à chaque action
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+import paramiko
+
+
+class _PooledTransport:
+    """Connexion SSH (Transport) et canaux SFTP inactifs associés"""
+
+    def __init__(self, transport: paramiko.Transport):
+        self.transport = transport
+        self.idle_channels: List[Tuple[paramiko.SFTPClient, float]] = []
+        self.leased = 0
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        return self.transport is not None and self.transport.is_active()
+
+    def close(self):
+        for sftp, _ in self.idle_channels:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+        self.idle_channels.clear()
+        try:
+            self.transport.close()
+        except Exception:
+            pass
+
+
+class SFTPSessionPool:
+    """
+    Pool de sessions SFTP indexé par (hôte, port, utilisateur)
+
+    - Une seule connexion SSH par clé, plusieurs canaux SFTP multiplexés dessus
+    - Keepalive SSH pour garder la connexion ouverte entre deux actions
+    - Reconnexion transparente si la session est tombée
+    - Fermeture automatique des sessions inactives après idle_timeout secondes
+    """
+
+    def __init__(self, idle_timeout: int = 300, keepalive_interval: int = 30,
+                 max_idle_channels: int = 4):
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.max_idle_channels = max_idle_channels
+        self._sessions: Dict[Tuple[str, int, str], _PooledTransport] = {}
+        self._connecting: Dict[Tuple[str, int, str], threading.Event] = {}  # Connexions en cours d'ouverture
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ==================== ACQUISITION ====================
+
+    def acquire(self, host: str, port: int, username: str, password: str) -> paramiko.SFTPClient:
+        """
+        Retourne un canal SFTP prêt à l'emploi
+
+        Le canal doit être rendu avec release() une fois l'opération terminée.
+        Lève une exception si la connexion est impossible.
+        """
+        key = (host, int(port), username)
+        self._ensure_reaper()
+
+        reconnected = False
+        while True:
+            with self._lock:
+                session = self._sessions.get(key)
+
+                if session and not session.is_alive():
+                    logger.info(f"Session SFTP expirée pour {host}:{port}, reconnexion")
+                    session.close()
+                    del self._sessions[key]
+                    session = None
+
+                if session is not None:
+                    sftp = self._take_idle_channel(session)
+                    if sftp is not None:
+                        return sftp
+                    # Canal réservé: la session n'est pas fermée pendant son ouverture
+                    session.leased += 1
+                else:
+                    # Une seule connexion en cours par clé: les autres appelants l'attendent
+                    pending = self._connecting.get(key)
+                    owner = pending is None
+                    if owner:
+                        pending = self._connecting[key] = threading.Event()
+
+            if session is not None:
+                # Ouverture du canal hors verrou
+                try:
+                    sftp = paramiko.SFTPClient.from_transport(session.transport)
+                except Exception as e:
+                    with self._lock:
+                        session.leased = max(0, session.leased - 1)
+                        if reconnected:
+                            raise
+                        # Le transport semblait actif mais ne l'est plus: on reconnecte une fois
+                        logger.warning(f"Ouverture de canal SFTP impossible ({e}), reconnexion")
+                        if self._sessions.get(key) is session:
+                            del self._sessions[key]
+                        session.close()
+                    reconnected = True
+                    continue
+
+                with self._lock:
+                    session.last_used = time.monotonic()
+                return sftp
+
+            if not owner:
+                pending.wait()
+                continue
+
+            # Négociation SSH et authentification hors verrou (les autres hôtes restent disponibles)
+            try:
+                transport = self._open_transport(host, int(port), username, password)
+            except Exception:
+                with self._lock:
+                    del self._connecting[key]
+                pending.set()
+                raise
+
+            with self._lock:
+                self._sessions[key] = _PooledTransport(transport)
+                del self._connecting[key]
+            pending.set()
+
+    def release(self, sftp: Optional[paramiko.SFTPClient], discard: bool = False):
+        """Rend un canal au pool (ou le ferme si discard=True ou s'il est inutilisable)"""
+        if sftp is None:
+            return
+
+        with self._lock:
+            session = self._find_session(sftp)
+            if session is None:
+                # Session déjà fermée (timeout, close_all): fermer simplement le canal
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+                return
+
+            session.leased = max(0, session.leased - 1)
+            session.last_used = time.monotonic()
+
+            keep = (not discard
+                    and session.is_alive()
+                    and len(session.idle_channels) < self.max_idle_channels)
+
+            if keep:
+                session.idle_channels.append((sftp, time.monotonic()))
+            else:
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+    @contextmanager
+    def session(self, host: str, port: int, username: str, password: str):
+        """
+        Context manager retournant un canal SFTP du pool
+
+        Exemple:
+            >>> with sftp_pool.session(host, port, user, password) as sftp:
+            ...     sftp.listdir_attr(path)
+        """
+        sftp = self.acquire(host, port, username, password)
+        failed = False
+        try:
+            yield sftp
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # En cas d'erreur, ne pas remettre un canal potentiellement corrompu dans le pool
+            self.release(sftp, discard=failed)
+
+    # ==================== MAINTENANCE ====================
+
+    def close_idle(self):
+        """Ferme les sessions sans canal emprunté et inactives depuis plus de idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            for key in list(self._sessions.keys()):
+                session = self._sessions[key]
+
+                if not session.is_alive():
+                    session.close()
+                    del self._sessions[key]
+                    continue
+
+                if session.leased == 0 and now - session.last_used > self.idle_timeout:
+                    logger.info(f"Fermeture de la session SFTP inactive: {key[0]}:{key[1]}")
+                    session.close()
+                    del self._sessions[key]
+
+    def close_all(self):
+        """Ferme toutes les sessions du pool (à appeler à la fermeture de l'application)"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        self._stop_event.set()
+        logger.info("Pool SFTP fermé")
+
+    def invalidate(self, host: str, port: int, username: str):
+        """Force la fermeture d'une session (ex: identifiants modifiés dans les réglages)"""
+        with self._lock:
+            session = self._sessions.pop((host, int(port), username), None)
+            if session:
+                session.close()
+
+    # ==================== INTERNE ====================
+
+    def _open_transport(self, host: str, port: int, username: str, password: str) -> paramiko.Transport:
+        """Ouvre et authentifie une nouvelle connexion SSH"""
+        transport = paramiko.Transport((host, port))
+        try:
+            transport.connect(username=username, password=password)
+        except Exception:
+            transport.close()
+            raise
+        transport.set_keepalive(self.keepalive_interval)
+        logger.info(f"Nouvelle session SFTP ouverte: {host}:{port}")
+        return transport
+
+    def _take_idle_channel(self, session: _PooledTransport) -> Optional[paramiko.SFTPClient]:
+        """Réutilise un canal inactif s'il est toujours valide (appelé sous le verrou)"""
+        while session.idle_channels:
+            sftp, _ = session.idle_channels.pop()
+            if self._channel_is_usable(sftp):
+                session.leased += 1
+                session.last_used = time.monotonic()
+                return sftp
+            try:
+                sftp.close()
+            except Exception:
+                pass
+        return None
+
+    def _find_session(self, sftp: paramiko.SFTPClient) -> Optional[_PooledTransport]:
+        channel = sftp.get_channel()
+        transport = channel.get_transport() if channel else None
+        for session in self._sessions.values():
+            if session.transport is transport:
+                return session
+        return None
+
+    @staticmethod
+    def _channel_is_usable(sftp: paramiko.SFTPClient) -> bool:
+        channel = sftp.get_channel()
+        return channel is not None and not channel.closed
+
+    def _ensure_reaper(self):
+        """Démarre (une seule fois) le thread qui ferme les sessions inactives"""
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def reap():
+            while not self._stop_event.wait(min(self.idle_timeout, 60)):
+                try:
+                    self.close_idle()
+                except Exception as e:
+                    logger.error(f"Erreur nettoyage pool SFTP: {e}")
+
+        self._reaper = threading.Thread(target=reap, name="sftp-pool-reaper", daemon=True)
+        self._reaper.start()
+
+
+# Instance globale
+sftp_pool = SFTPSessionPool()